@@ -1,251 +1,414 @@
-# -------------------------------------------------------------------------------------------------------
-# BeersAspect.py
-# Version:  Python 2.7.5 / ArcGIS 10.2.2
-# Creation Date: 2015-06-04
-# Last Edit: 2015-07-31
-# Creator:  Kirsten R. Hazler
-#
-# Summary:
-#     Uses an input Digital Elevation Model (DEM) to derive aspect, and then the Beers transformation
-# of aspect, which ranges from 0 (most exposed) to 2 (most sheltered). Processing is done by USGS quads
-# or by other units defined by a polygon feature class. 
-
-#     The ASPECT function is first applied.  For cells with a flat slope, the aspect is undefined,
-# represented by the value -1.  The Beers aspect transformation is applied to all cells where aspect is 
-# defined.  
-
-#     A hydrography raster is then used to "burn in" water and wetland features, which are set to a
-# "neutral" value of 1. For all remaining cells where the undefined aspect is coded as -1, Beers aspect 
-# is derived from the focal mean of the smallest possible neighborhood around them.  The neighborhood is 
-# expanded as needed, up to user-specified limit, until a valid zonal mean value is obtained for Beers Aspect.  
-
-#     Once the neighborhood expansion limit has been reached, any remaining NoAspect cells are assigned
-# the neutral value of 1, since it follows that these cells are surrounded by many other cells with flat slopes.
-
-# Reference:
-#     Beers, Thomas W., Peter E. Dress, and Lee C. Wensel.  1966.  Notes and observations.  Aspect 
-# transformation in site productivity research.  Journal of Forestry 64:691-692.
-#
-# Note:  
-#     It's important to distinguish between "NoData" which is the boundary areas outside the DEM,
-# versus "NoAspect" (-1) cells within the DEM.  For focal mean to work properly, the NoAspect
-# cells need to be coded "NoData", so that the -1 value doesn't contaminate the mean.  Thus 
-# this script converts back and forth between -1 and NoData as needed.
-#
-# -------------------------------------------------------------------------------------------------------
-
-# Import required modules
-import arcpy
-from arcpy.sa import *
-arcpy.CheckOutExtension("Spatial")
-import os # provides access to operating system functionality such as file and directory paths
-import sys # provides access to Python system functions
-import traceback # used for error handling
-from datetime import datetime # for time-stamping
-
-# Script arguments to be input by user
-inDEM = arcpy.GetParameterAsText(0) # Input DEM
-   # Default: N:\SDM\ProcessedData\NED_Products\NED_mosaics.gdb\rd_NED30m
-inBurn = arcpy.GetParameterAsText(1) # Raster representing waterbodies to be "burned in"
-   # Default: N:\SDM\ProcessedData\SDM_Masks.gdb\rd_BeersBurn
-inBnd = arcpy.GetParameterAsText(2) # Polygon feature class determining outer processing boundary
-   # Default: N:\SDM\ProcessedData\SDM_ReferenceLayers.gdb\fc_bndSDM_buff5k
-inProcUnits = arcpy.GetParameterAsText(3) # Polygon feature class determining units to be processed
-   # Default : N:\SDM\ProcessedData\SDM_ReferenceLayers.gdb\fc_ned_1arcsec_g
-inFld = arcpy.GetParameterAsText(4) # Field containing the unit ID
-   # Default: FILE_ID
-nLimit = arcpy.GetParameter(5) # Limit to the neighborhood radius (in cells) used to interpolate Beers Aspect
-   # Default: 5
-outGDB = arcpy.GetParameterAsText(6) # Geodatabase to hold final products
-scratchGDB = arcpy.GetParameterAsText(7) # Geodatabase to hold intermediate products
-ProcLogFile = arcpy.GetParameterAsText(8) # Text file to contain processing results
-
-# Additional script parameters and environment settings
-arcpy.env.overwriteOutput = True # Set overwrite option so that existing data may be overwritten
-arcpy.env.snapRaster = inDEM
-CellSize = int(arcpy.GetRasterProperties_management (inDEM, 'CELLSIZEX').getOutput(0))
-LimitList = list() # List to hold processing results where neighborhood limit was reached
-FailList = list() # List to keep track of units where processing failed
-deg2rad = math.pi/180.0 # needed for conversion from degrees to radians for input to Cos function
-
-# Create and write to a log file.
-# If this log file already exists, it will be overwritten.  If it does not exist, it will be created.
-Log = open(ProcLogFile, 'w+') 
-FORMAT = '%Y-%m-%d %H:%M:%S'
-timestamp = datetime.now().strftime(FORMAT)
-Log.write("Process logging started %s \n\n" % timestamp)
-Log.write('Input parameters are...\n')
-Log.write('Input DEM: %s\n' % inDEM)
-Log.write('Input hydro burn raster: %s\n' % inBurn)
-Log.write('Input processing boundary: %s\n' % inBnd)
-Log.write('Input processing units: %s\n' % inProcUnits)
-Log.write('Processing unit ID field: %s\n' % inFld)
-Log.write('Neighborhood expansion limit: %s\n' % str(nLimit))
-Log.write('Output geodatabase: %s\n' % outGDB)
-Log.write('Scratch geodatabase: %s\n' % scratchGDB)
-Log.write('Processed unit(s): See below.\n')
-
-ProcUnits = arcpy.da.SearchCursor(inProcUnits, [inFld])
-
-for Unit in ProcUnits:
-   UnitID = Unit[0]
-   arcpy.AddMessage('Working on unit %s...' % UnitID)
-   Log.write('Processing unit: %s\n' % UnitID)
-     
-   # Make a feature class with the single unit's shape, buffer it, then clip it
-   where_clause = "%s = '%s'" %(inFld, UnitID) # Create the feature selection expression
-   arcpy.MakeFeatureLayer_management (inProcUnits, 'selectFC', where_clause) 
-   
-   buffFC = scratchGDB + os.sep + 'buffFC' + UnitID
-   buffDist = CellSize * nLimit
-   arcpy.Buffer_analysis ('selectFC', buffFC, buffDist)
-   
-   clipFC = scratchGDB + os.sep + 'clipFC'
-   arcpy.Clip_analysis (buffFC, inBnd, clipFC)
-   
-   # Clip the DEM to the above feature
-   clipDEM = scratchGDB + os.sep + 'clipDEM'
-   extent = arcpy.Describe(clipFC).extent
-   XMin = extent.XMin
-   YMin = extent.YMin
-   XMax = extent.XMax
-   YMax = extent.YMax
-   rectangle = '%s %s %s %s' %(XMin, YMin, XMax, YMax) 
-   arcpy.Clip_management (inDEM, rectangle, clipDEM, clipFC, '', 'ClippingGeometry', 'NO_MAINTAIN_EXTENT')
-   
-   # Set processing mask
-   arcpy.env.mask = clipDEM 
-   
-   try:
-      # Create Aspect in degrees
-      rdAspect = Aspect(clipDEM)
-      rdAspect.save(scratchGDB + os.sep + 'rdAspect_' + UnitID)
-      arcpy.AddMessage('Created aspect raster; saved to scratch geodatabase')
-
-      # Create Beers Aspect
-      # Set to -1 if Aspect = -1 (flat slope)
-      outBeers = outGDB + os.sep + 'rdBeers_' + UnitID
-      rdBeers = Con (rdAspect == -1, -1, (Cos((45 - rdAspect)*deg2rad) + 1))
-      rdBeers.save(scratchGDB + os.sep + 'InitBeers_' + UnitID) # This version is not overwritten later; saved just in case
-      rdBeers.save(outBeers) # This version will be overwritten repeatedly below
-      arcpy.AddMessage('Created initial Beers Aspect raster.')
-      
-      # Burn in the waterbodies, setting to neutral value of 1
-      arcpy.AddMessage('Burning in waterbodies...')
-      rdBeers = Con (IsNull(inBurn) == 0, 1, rdBeers)
-      burnBeers = scratchGDB + os.sep + 'BurnBeers_' + UnitID
-      rdBeers.save(burnBeers) # This version is not overwritten later; saved just in case
-      rdBeers.save(outBeers) # This version will be overwritten repeatedly below
-      
-      # Initialize a binary raster indicating where the NoAspect (-1) cells are: 1 if no aspect, otherwise 0
-      rdNoAspect = Con (rdBeers, 1, 0, 'VALUE = -1') 
-      rdNoAspect.save(scratchGDB + os.sep + 'InitNoAspect_' + UnitID) # This version is not overwritten later; saved just in case
-      rdNoAspect.save(scratchGDB + os.sep + 'rdNoAspect') # This version will be overwritten repeatedly below
-
-      # Get the number of cells with no aspect
-      rows = arcpy.SearchCursor (rdNoAspect, "Value = 1", "", "Count", "")
-      row = rows.next()
-      if row:
-         NumNulls = row.getValue("Count") # This yields the number of cells with no aspect
-         NumCells = 0 # Initialize number of cells for neighborhood statistics
-         arcpy.AddMessage('Now filling in NoAspect pixels with neighborhood means.  This will take some time...')
-      else:
-         NumNulls = 0
-            
-      while NumNulls > 0:
-      # Use expanding neighborhoods as needed to fill in cells with undefined aspect
-         arcpy.AddMessage('There are currently %s NoAspect cells in the Beers Aspect raster' %int(NumNulls))
-         
-         # Update neighborhood radius and decide whether to continue
-         NumCells += 1 
-         if NumCells > nLimit:
-            arcpy.AddWarning('Neighborhood size limit has been reached for %s.' % UnitID)
-            LimitList.append(UnitID)
-            arcpy.AddMessage('Assigning a neutral value (1) to all remaining NoAspect cells')
-            rdFinalBeers = Con(rdBeers, 1, rdBeers, 'VALUE = -1')
-            rdFinalBeers.save(outBeers)
-            break
-         neighborhood = NbrCircle(NumCells, "CELL")
-                  
-         # Establish the focal zone
-         Grow = int(NumCells)
-         FocalZone = Expand (rdNoAspect, Grow, [1]) # NoAspect cells (zone 1) grow outward
-         FocalZone.save(scratchGDB + os.sep + 'FocalZone')
-         
-         # Within focal zone, set values from the original burned Beers raster
-         # Outside focal zone, set to NoData to avoid excessive memory usage/processing time
-         FocalRaster1 = SetNull (FocalZone, burnBeers, 'VALUE = 0')
-         
-         # Set -1 values to NoData so they do not contaminate the neighborhood mean
-         FocalRaster = SetNull (FocalRaster1, FocalRaster1, 'VALUE = -1')  
-         FocalRaster.save(scratchGDB + os.sep + 'FocalRaster')
-                  
-         # arcpy.AddMessage('Calculating the focal mean')
-         MeanRaster1 = FocalStatistics (FocalRaster, neighborhood, 'MEAN', 'DATA')
-
-         # Convert nulls back to -1
-         MeanRaster = Con (IsNull(MeanRaster1), -1, MeanRaster1, 'VALUE = 1')
-         MeanRaster.save(scratchGDB + os.sep + 'MeanRaster')
-         
-         # Make a position raster; need to add one because positions are indexed from 1, not 0
-         PosRaster = Plus(rdNoAspect, 1)
-         PosRaster.save(scratchGDB + os.sep + 'PosRaster')
-         
-         # Update the Beers Aspect raster, with focal means assigned to NoAspect cells
-         rdBeers = Pick (PosRaster, [outBeers, MeanRaster]) 
-         rdBeers.save(scratchGDB + os.sep + 'Beers_%s_%s' % (UnitID, str(Grow))) # Keep track of series
-         rdBeers.save(outBeers)
-         
-         # Determine the number of remaining NoAspect cells
-         rdNoAspect = Con (rdBeers, 1, 0, 'VALUE = -1')
-         rows = arcpy.SearchCursor (rdNoAspect, "Value = 1", "", "Count", "")
-         row = rows.next()
-         if row:
-            NumNulls = row.getValue("Count")
-         else:
-            NumNulls = 0
-
-      else:
-         arcpy.AddMessage('There are no NoAspect cells remaining in the Beers Aspect raster.')
-      
-   except:
-      # Error handling code swiped from "A Python Primer for ArcGIS"
-      tb = sys.exc_info()[2]
-      tbinfo = traceback.format_tb(tb)[0]
-      pymsg = "PYTHON ERRORS:\nTraceback Info:\n" + tbinfo + "\nError Info:\n " + str(sys.exc_info()[1])
-      msgs = "ARCPY ERRORS:\n" + arcpy.GetMessages(2) + "\n"
-
-      arcpy.AddWarning('Unable to process unit %s' % UnitID)
-      FailList.append(UnitID)
-      arcpy.AddWarning(msgs)
-      arcpy.AddWarning(pymsg)
-      arcpy.AddMessage(arcpy.GetMessages(1))
-      
-# List the units where processing failed
-if FailList:
-   msg = '\nProcessing failed for some units: \n'
-   Log.write(msg)
-   arcpy.AddMessage('%s See the processing log, %s' % (msg, ProcLogFile))
-   for unit in FailList:
-      Log.write('\n   -%s' % unit)
-      arcpy.AddMessage(unit) 
-      
-# List the units where the neighborhood limit caused incomplete processing
-if LimitList:
-   msg1 = 'The neighborhood size limit was reached for some processing units.'
-   msg2 = 'The following units had a neutral value imposed for all remaining NoAspect cells.'
-   Log.write('\n' + msg1)
-   arcpy.AddMessage(msg1)
-   Log.write('\n' + msg2)
-   arcpy.AddMessage('%s These are also listed in the processing log, %s' % (msg2, ProcLogFile))
-   for unit in LimitList:
-      Log.write('\n   -%s' % unit)
-      arcpy.AddMessage(unit)  
-         
-timestamp = datetime.now().strftime(FORMAT)
-Log.write("\n\nProcess logging ended %s" % timestamp)   
-Log.close()
-
-
-
-
+# -------------------------------------------------------------------------------------------------------
+# BeersAspect.py
+# Version:  Python 2.7.5 / ArcGIS 10.2.2
+# Creation Date: 2015-06-04
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+#
+# Summary:
+#     Uses an input Digital Elevation Model (DEM) to derive aspect, and then the Beers transformation
+# of aspect, which ranges from 0 (most exposed) to 2 (most sheltered). Processing is done by USGS quads
+# or by other units defined by a polygon feature class. 
+
+#     The ASPECT function is first applied.  For cells with a flat slope, the aspect is undefined,
+# represented by the value -1.  The Beers aspect transformation is applied to all cells where aspect is 
+# defined.  
+
+#     A hydrography raster is then used to "burn in" water and wetland features, which are set to a
+# "neutral" value of 1. For all remaining cells where the undefined aspect is coded as -1, Beers aspect 
+# is derived from the focal mean of the smallest possible neighborhood around them.  The neighborhood is 
+# expanded as needed, up to user-specified limit, until a valid zonal mean value is obtained for Beers Aspect.  
+
+#     Once the neighborhood expansion limit has been reached, any remaining NoAspect cells are assigned
+# the neutral value of 1, since it follows that these cells are surrounded by many other cells with flat slopes.
+
+#     Setting the number of worker processes above 1 processes the units in parallel, in memory (see
+# libBeersParallel.py).
+#     With a single worker and a prefetch depth above 0, the array engine runs pipelined instead:  the burn mask is
+# read ahead, and chunk-store output (OutStore) written behind, while each unit is computed (see libBeersParallel.py).
+#     The NEAREST fill mode instead gives each NoAspect cell the value of the nearest valid cell (or a blend of the
+# FillK nearest), so no neutral values are imposed (see libBeersAspect.py).
+#     Intermediate products are only saved as the checkpoint policy says:  NONE, FINAL, STAGE or ITERATION.
+
+#     Rerunning with the same completion manifest skips the units whose inputs are unchanged (see libUnitManifest.py).
+
+#     All units are buffered and clipped to the boundary in one batch before processing starts (see libUnitPlan.py).
+# The burn raster is read once into a bit-packed mask next to the scratch geodatabase (see libBurnMask.py).
+
+#     The array engine can write to a single compact chunk store (OutStore) instead of one raster per unit (see
+# libChunkStore.py).
+
+#     Intermediates go to a private scratch workspace that is deleted at the end of the run, even if it fails; an
+# optional quota limits its size (see libScratch.py).
+
+#     Stage timings are written to <log name>_timing.jsonl, with a summary at the end of the log (see libInstrument.py).
+
+# Reference:
+#     Beers, Thomas W., Peter E. Dress, and Lee C. Wensel.  1966.  Notes and observations.  Aspect 
+# transformation in site productivity research.  Journal of Forestry 64:691-692.
+#
+# Note:  
+#     It's important to distinguish between "NoData" which is the boundary areas outside the DEM,
+# versus "NoAspect" (-1) cells within the DEM.  For focal mean to work properly, the NoAspect
+# cells need to be coded "NoData", so that the -1 value doesn't contaminate the mean.  Thus 
+# this script converts back and forth between -1 and NoData as needed.
+#
+# -------------------------------------------------------------------------------------------------------
+
+# Import required modules
+from libLazyImport import LazyImport, CheckOutExtension
+arcpy = LazyImport('arcpy') # Imported on first use, so that worker processes importing this script do not pay for it
+import math # needed for conversion from degrees to radians
+import numpy as np
+import os # provides access to operating system functionality such as file and directory paths
+import sys # provides access to Python system functions
+import traceback # used for error handling
+from datetime import datetime # for time-stamping
+from libRasterWindows import ArcRaster, ArcUnitWriter, Checkpointer, RasterBytes
+from libBeersParallel import UnitInputs, PlanUnitJobs, RunUnits
+from libUnitManifest import UnitManifest, Fingerprint
+from libInstrument import StageTimer, GetElapsedTime
+from libUnitPlan import BuildUnitPlan
+from libBurnMask import OpenBurnMask
+from libChunkStore import ChunkStoreWriter
+from libScratch import ScratchWorkspace, SweepStale
+
+def UnitFingerprint(clipDEM, clipGeom, burnMask, nLimit):
+   '''Fingerprints the inputs of one unit for the raster-algebra workflow:  the clipped DEM, the burn mask over the
+   unit's window, the buffered and clipped unit geometry, and nLimit.'''
+   demArray = arcpy.RasterToNumPyArray(clipDEM)
+   shapes = [clipGeom.WKT]
+   return Fingerprint(demArray, burnMask, shapes, nLimit, 'raster-algebra')
+
+def SaveRaster(raster, path):
+   '''Saves a raster, returning its size in bytes (see libRasterWindows.RasterBytes).'''
+   raster.save(path)
+   return RasterBytes(path)
+
+def OpenBurnCache(inBurn, scratchGDB, grid):
+   '''Returns the bit-packed burn mask for inBurn on the DEM grid, kept next to the scratch geodatabase and rebuilt only
+   when inBurn changes (see libBurnMask.py).'''
+   return OpenBurnMask(ArcRaster(inBurn), os.path.dirname(scratchGDB), grid)
+
+def ProcessUnitsRasterAlgebra(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, CellSize, Log, ckpt, scratch, manifest = None, timer = None):
+   '''Processes units one at a time with Spatial Analyst raster algebra.  Intermediates stay as temporary rasters in
+   the scratch workspace (a libScratch.ScratchWorkspace), which is cleared after each unit, unless the checkpoint
+   policy calls for saving them to scratchGDB.  Units already completed with the same inputs, according to
+   the manifest, are skipped.  Each unit's stages are timed with the StageTimer, if given.  Returns a tuple
+   (FailList, LimitList).'''
+   timer = timer if timer is not None else StageTimer()
+   # Spatial Analyst is only needed here, so it is imported and checked out on first use rather than at load
+   CheckOutExtension('Spatial')
+   from arcpy.sa import Aspect, Con, Cos, IsNull, NbrCircle, Expand, SetNull, FocalStatistics, Plus, Pick
+   LimitList = list() # List to hold processing results where neighborhood limit was reached
+   FailList = list() # List to keep track of units where processing failed
+   deg2rad = math.pi/180.0 # needed for conversion from degrees to radians for input to Cos function
+
+   # Read the units and the boundary once, and buffer and clip every unit up front
+   # Likewise, read the burn raster once, into a packed mask from which each unit takes its window
+   with timer.Stage('plan'):
+      grid = ArcRaster(inDEM).grid
+      plan = BuildUnitPlan(inProcUnits, inFld, inBnd, CellSize * nLimit, grid)
+      burnCache = OpenBurnCache(inBurn, scratchGDB, grid)
+
+   for unit in plan:
+      UnitID = unit.unitID
+      unitBytes = 4 * unit.window.nRows * unit.window.nCols if unit.overlaps else None
+      with timer.Stage('unit', unit = UnitID), scratch.Unit(UnitID, unitBytes) as unitScratch:
+         arcpy.AddMessage('Working on unit %s...' % UnitID)
+         Log.write('Processing unit: %s\n' % UnitID)
+         scratchBefore = scratch.BytesUsed()
+         unitWritten = 0
+     
+         # The unit's buffered and clipped geometry, and its extent snapped to the DEM cells, come from the unit plan
+         if not unit.overlaps:
+            arcpy.AddWarning('Unit %s does not overlap the processing boundary.' % UnitID)
+            FailList.append(UnitID)
+            continue
+         try:
+            with timer.Stage('clip'):
+               # Clip the DEM to the unit's buffered and clipped shape
+               clipDEM = unitScratch.Name('clipDEM')
+               arcpy.Clip_management (inDEM, unit.Rectangle(), clipDEM, unit.geometry, '', 'ClippingGeometry', 'NO_MAINTAIN_EXTENT')
+               burnMask = burnCache.ReadMask(unit.window)
+   
+            # Skip the unit if it was completed in an earlier run and its inputs have not changed
+            if manifest is not None:
+               fingerprint = UnitFingerprint(clipDEM, unit.geometry, burnMask, nLimit)
+               if manifest.IsCurrent(UnitID, fingerprint):
+                  arcpy.AddMessage('Unit %s is unchanged since the last run; skipping.' % UnitID)
+                  Log.write('   Skipped; unchanged since last run\n')
+                  if manifest.Get(UnitID).get('limitReached'):
+                     LimitList.append(UnitID)
+                  continue
+
+            # Set processing mask
+            arcpy.env.mask = clipDEM 
+   
+            with timer.Stage('aspect'):
+               # Create Aspect in degrees
+               rdAspect = Aspect(clipDEM)
+               if ckpt.Wants('STAGE'):
+                  unitWritten += SaveRaster(rdAspect, scratchGDB + os.sep + 'rdAspect_' + UnitID)
+               arcpy.AddMessage('Created aspect raster')
+
+               # Create Beers Aspect
+               # Set to -1 if Aspect = -1 (flat slope)
+               outBeers = outGDB + os.sep + 'rdBeers_' + UnitID
+               rdBeers = Con (rdAspect == -1, -1, (Cos((45 - rdAspect)*deg2rad) + 1))
+               if ckpt.Wants('STAGE'):
+                  unitWritten += SaveRaster(rdBeers, scratchGDB + os.sep + 'InitBeers_' + UnitID)
+               arcpy.AddMessage('Created initial Beers Aspect raster.')
+      
+            with timer.Stage('burn'):
+               # Burn in the waterbodies, setting to neutral value of 1
+               arcpy.AddMessage('Burning in waterbodies...')
+               burnRaster = arcpy.NumPyArrayToRaster(burnMask.astype(np.uint8), arcpy.Point(*grid.LowerLeft(unit.window)),
+                                                     grid.cellSize, grid.cellSize, 0) # Non-water cells become NoData
+               rdBeers = Con (IsNull(burnRaster) == 0, 1, rdBeers)
+               burnBeers = rdBeers # Kept for the focal means below
+               if ckpt.Wants('STAGE'):
+                  unitWritten += SaveRaster(rdBeers, scratchGDB + os.sep + 'BurnBeers_' + UnitID)
+      
+            # Initialize a binary raster indicating where the NoAspect (-1) cells are: 1 if no aspect, otherwise 0
+            rdNoAspect = Con (rdBeers, 1, 0, 'VALUE = -1') 
+            if ckpt.Wants('STAGE'):
+               unitWritten += SaveRaster(rdNoAspect, scratchGDB + os.sep + 'InitNoAspect_' + UnitID)
+
+            # Get the number of cells with no aspect
+            rows = arcpy.SearchCursor (rdNoAspect, "Value = 1", "", "Count", "")
+            row = rows.next()
+            if row:
+               NumNulls = row.getValue("Count") # This yields the number of cells with no aspect
+               NumCells = 0 # Initialize number of cells for neighborhood statistics
+               arcpy.AddMessage('Now filling in NoAspect pixels with neighborhood means.  This will take some time...')
+            else:
+               NumNulls = 0
+            
+            while NumNulls > 0:
+            # Use expanding neighborhoods as needed to fill in cells with undefined aspect
+               arcpy.AddMessage('There are currently %s NoAspect cells in the Beers Aspect raster' %int(NumNulls))
+         
+               # Update neighborhood radius and decide whether to continue
+               NumCells += 1 
+               if NumCells > nLimit:
+                  arcpy.AddWarning('Neighborhood size limit has been reached for %s.' % UnitID)
+                  LimitList.append(UnitID)
+                  arcpy.AddMessage('Assigning a neutral value (1) to all remaining NoAspect cells')
+                  rdBeers = Con(rdBeers, 1, rdBeers, 'VALUE = -1')
+                  break
+               with timer.Stage('fill radius', radius = NumCells):
+                  neighborhood = NbrCircle(NumCells, "CELL")
+                  
+                  # Establish the focal zone
+                  Grow = int(NumCells)
+                  FocalZone = Expand (rdNoAspect, Grow, [1]) # NoAspect cells (zone 1) grow outward
+         
+                  # Within focal zone, set values from the original burned Beers raster
+                  # Outside focal zone, set to NoData to avoid excessive memory usage/processing time
+                  FocalRaster1 = SetNull (FocalZone, burnBeers, 'VALUE = 0')
+         
+                  # Set -1 values to NoData so they do not contaminate the neighborhood mean
+                  FocalRaster = SetNull (FocalRaster1, FocalRaster1, 'VALUE = -1')  
+                  
+                  # arcpy.AddMessage('Calculating the focal mean')
+                  MeanRaster1 = FocalStatistics (FocalRaster, neighborhood, 'MEAN', 'DATA')
+
+                  # Convert nulls back to -1
+                  MeanRaster = Con (IsNull(MeanRaster1), -1, MeanRaster1, 'VALUE = 1')
+         
+                  # Make a position raster; need to add one because positions are indexed from 1, not 0
+                  PosRaster = Plus(rdNoAspect, 1)
+         
+                  # Update the Beers Aspect raster, with focal means assigned to NoAspect cells
+                  rdBeers = Pick (PosRaster, [rdBeers, MeanRaster]) 
+                  if ckpt.Wants('ITERATION'):
+                     unitWritten += SaveRaster(rdBeers, scratchGDB + os.sep + 'Beers_%s_%s' % (UnitID, str(Grow))) # Keep track of series
+         
+                  # Determine the number of remaining NoAspect cells
+                  rdNoAspect = Con (rdBeers, 1, 0, 'VALUE = -1')
+                  rows = arcpy.SearchCursor (rdNoAspect, "Value = 1", "", "Count", "")
+                  row = rows.next()
+                  if row:
+                     NumNulls = row.getValue("Count")
+                  else:
+                     NumNulls = 0
+
+            else:
+               arcpy.AddMessage('There are no NoAspect cells remaining in the Beers Aspect raster.')
+
+            with timer.Stage('save'):
+               # Only the final version is written to the output geodatabase
+               unitWritten += SaveRaster(rdBeers, outBeers)
+            if manifest is not None:
+               manifest.Record(UnitID, fingerprint, limitReached = UnitID in LimitList)
+      
+         except:
+            # Error handling code swiped from "A Python Primer for ArcGIS"
+            tb = sys.exc_info()[2]
+            tbinfo = traceback.format_tb(tb)[0]
+            pymsg = "PYTHON ERRORS:\nTraceback Info:\n" + tbinfo + "\nError Info:\n " + str(sys.exc_info()[1])
+            msgs = "ARCPY ERRORS:\n" + arcpy.GetMessages(2) + "\n"
+
+            arcpy.AddWarning('Unable to process unit %s' % UnitID)
+            FailList.append(UnitID)
+            arcpy.AddWarning(msgs)
+            arcpy.AddWarning(pymsg)
+            arcpy.AddMessage(arcpy.GetMessages(1))
+
+         Log.write('   Bytes written: %s\n' % (unitWritten + max(0, scratch.BytesUsed() - scratchBefore)))
+         scratch.Check() # Stops the run if scratch has outgrown its quota
+
+   arcpy.env.mask = None # The last unit's clipped DEM is deleted with its scratch
+   return FailList, LimitList
+
+def ProcessUnitsArray(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, CellSize, Log, ckpt, manifest, nWorkers, scratch, timer = None, OutStore = None, Prefetch = 0, FillMode = 'RADIUS', FillK = 1):
+   '''Processes units in memory with the NumPy engine, fanned out to nWorkers processes, or pipelined in one process with
+   up to Prefetch units read ahead and written behind.  Results go to rdBeers_<unit> rasters in outGDB, or to a quantized
+   chunk store (libChunkStore.py) if OutStore is given.  NoAspect cells are filled as FillMode says (see
+   libBeersAspect.py).  Returns a tuple (FailList, LimitList).'''
+   # Rasterize the processing boundary once, snapped to the DEM, so that workers can mask their windows by reading it
+   bndRaster = scratch.Name('rdBnd')
+   arcpy.PolygonToRaster_conversion (inBnd, arcpy.Describe(inBnd).OIDFieldName, bndRaster, 'CELL_CENTER', '', CellSize)
+
+   dem = ArcRaster(inDEM)
+   burnCache = OpenBurnCache(inBurn, scratchGDB, dem.grid)
+   inputs = UnitInputs(dem, dem.grid, nLimit, burnCache, ArcRaster(bndRaster), ckpt, FillMode, FillK)
+   # The same unit plan as the raster-algebra mode:  each unit's window covers its buffered geometry clipped to the boundary
+   jobs = PlanUnitJobs(BuildUnitPlan(inProcUnits, inFld, inBnd, CellSize * nLimit, dem.grid))
+   if OutStore:
+      # An existing store is updated, so that a resumed run keeps the units it skips
+      writer = ChunkStoreWriter(OutStore, dem.grid, 0.0, 2.0, append = manifest is not None) # Beers aspect ranges from 0 to 2
+   else:
+      writer = ArcUnitWriter(outGDB, 'rdBeers_', dem.grid, arcpy.Describe(inDEM).spatialReference)
+   if nWorkers > 1:
+      arcpy.AddMessage('Processing %s units with %s worker processes...' % (len(jobs), nWorkers))
+   else:
+      arcpy.AddMessage('Processing %s units, with NumPy reads and writes up to %s units ahead in the background...' % (len(jobs), Prefetch))
+   return RunUnits(jobs, inputs, writer, nWorkers, Log, manifest, timer, Prefetch)
+
+def BeersAspect(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, ProcLogFile, nWorkers = 1, CheckpointPolicy = 'NONE', ManifestFile = None, OutStore = None, ScratchQuotaGB = None, Prefetch = 0, FillMode = 'RADIUS', FillK = 1):
+   # Additional script parameters and environment settings
+   arcpy.env.overwriteOutput = True # Set overwrite option so that existing data may be overwritten
+   arcpy.env.snapRaster = inDEM
+   CellSize = int(arcpy.GetRasterProperties_management (inDEM, 'CELLSIZEX').getOutput(0))
+   nWorkers = int(nWorkers or 1)
+   Prefetch = int(Prefetch or 0)
+   FillMode = (FillMode or 'RADIUS').upper()
+   FillK = int(FillK or 1)
+   # Array-mode checkpoints are written as .npy files next to the scratch geodatabase, since worker processes cannot share a geodatabase
+   ckpt = Checkpointer(CheckpointPolicy, os.path.join(os.path.dirname(scratchGDB), 'BeersCheckpoints'))
+   manifest = None
+   if ManifestFile:
+      manifest = UnitManifest(ManifestFile)
+
+   # Create and write to a log file.
+   # If this log file already exists, it will be overwritten.  If it does not exist, it will be created.
+   Log = open(ProcLogFile, 'w+') 
+   FORMAT = '%Y-%m-%d %H:%M:%S'
+   timestamp = datetime.now().strftime(FORMAT)
+   Log.write("Process logging started %s \n\n" % timestamp)
+   Log.write('Input parameters are...\n')
+   Log.write('Input DEM: %s\n' % inDEM)
+   Log.write('Input hydro burn raster: %s\n' % inBurn)
+   Log.write('Input processing boundary: %s\n' % inBnd)
+   Log.write('Input processing units: %s\n' % inProcUnits)
+   Log.write('Processing unit ID field: %s\n' % inFld)
+   Log.write('Neighborhood expansion limit: %s\n' % str(nLimit))
+   Log.write('Output geodatabase: %s\n' % outGDB)
+   Log.write('Scratch geodatabase: %s\n' % scratchGDB)
+   Log.write('Worker processes: %s\n' % str(nWorkers))
+   Log.write('Pipelined prefetch depth: %s\n' % str(Prefetch))
+   Log.write('NoAspect fill mode: %s\n' % (FillMode if FillMode == 'RADIUS' else '%s (%s nearest)' % (FillMode, FillK)))
+   Log.write('Checkpoint policy: %s\n' % ckpt.policy)
+   Log.write('Completion manifest: %s\n' % (ManifestFile or 'None'))
+   Log.write('Output chunk store: %s\n' % (OutStore or 'None'))
+   Log.write('Scratch quota (GB): %s\n' % (ScratchQuotaGB or 'None'))
+   Log.write('Processed unit(s): See below.\n')
+
+   # Stage timings go to a JSON-lines file next to the log, and a summary at the end of the log
+   timer = StageTimer()
+   TimingFile = os.path.splitext(ProcLogFile)[0] + '_timing.jsonl'
+   Log.write('Stage timing records: %s\n' % TimingFile)
+   tStart = datetime.now()
+
+   # Intermediates go to a private workspace next to the scratch geodatabase, so that concurrent runs cannot collide,
+   # and it is deleted when processing ends, even on failure.  Workspaces left by killed runs are removed first.
+   scratchRoot = os.path.dirname(scratchGDB)
+   freed = SweepStale(scratchRoot)
+   if freed:
+      Log.write('Removed %s bytes of scratch data left by earlier runs\n' % freed)
+   quota = int(float(ScratchQuotaGB) * 2**30) if ScratchQuotaGB else None
+   with ScratchWorkspace(scratchRoot, tag = 'Beers', quota = quota) as scratch:
+      if nWorkers > 1 or Prefetch > 0 or FillMode != 'RADIUS':
+         FailList, LimitList = ProcessUnitsArray(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, CellSize, Log, ckpt, manifest, nWorkers, scratch, timer, OutStore, Prefetch, FillMode, FillK)
+      else:
+         if OutStore:
+            arcpy.AddWarning('The output chunk store is only written by the array engine (more than 1 worker, prefetch, or NEAREST fill); ignoring it.')
+         FailList, LimitList = ProcessUnitsRasterAlgebra(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, CellSize, Log, ckpt, scratch, manifest, timer)
+   Log.write('Peak scratch usage: %s bytes\n' % scratch.peakBytes)
+   timer.WriteJSONLines(TimingFile, append = False)
+
+   # List the units where processing failed
+   if FailList:
+      msg = '\nProcessing failed for some units: \n'
+      Log.write(msg)
+      arcpy.AddMessage('%s See the processing log, %s' % (msg, ProcLogFile))
+      for unit in FailList:
+         Log.write('\n   -%s' % unit)
+         arcpy.AddMessage(unit) 
+      
+   # List the units where the neighborhood limit caused incomplete processing
+   if LimitList:
+      msg1 = 'The neighborhood size limit was reached for some processing units.'
+      msg2 = 'The following units had a neutral value imposed for all remaining NoAspect cells.'
+      Log.write('\n' + msg1)
+      arcpy.AddMessage(msg1)
+      Log.write('\n' + msg2)
+      arcpy.AddMessage('%s These are also listed in the processing log, %s' % (msg2, ProcLogFile))
+      for unit in LimitList:
+         Log.write('\n   -%s' % unit)
+         arcpy.AddMessage(unit)
+
+   Log.write('\n\nTotal processing time: %s\n' % GetElapsedTime(tStart, datetime.now()))
+   Log.write(timer.Summary())
+
+   timestamp = datetime.now().strftime(FORMAT)
+   Log.write("\n\nProcess logging ended %s" % timestamp)   
+   Log.close()
+
+# Script arguments to be input by user
+def main():
+   inDEM = arcpy.GetParameterAsText(0) # Input DEM
+      # Default: N:\SDM\ProcessedData\NED_Products\NED_mosaics.gdb\rd_NED30m
+   inBurn = arcpy.GetParameterAsText(1) # Raster representing waterbodies to be "burned in"
+      # Default: N:\SDM\ProcessedData\SDM_Masks.gdb\rd_BeersBurn
+   inBnd = arcpy.GetParameterAsText(2) # Polygon feature class determining outer processing boundary
+      # Default: N:\SDM\ProcessedData\SDM_ReferenceLayers.gdb\fc_bndSDM_buff5k
+   inProcUnits = arcpy.GetParameterAsText(3) # Polygon feature class determining units to be processed
+      # Default : N:\SDM\ProcessedData\SDM_ReferenceLayers.gdb\fc_ned_1arcsec_g
+   inFld = arcpy.GetParameterAsText(4) # Field containing the unit ID
+      # Default: FILE_ID
+   nLimit = arcpy.GetParameter(5) # Limit to the neighborhood radius (in cells) used to interpolate Beers Aspect
+      # Default: 5
+   outGDB = arcpy.GetParameterAsText(6) # Geodatabase to hold final products
+   scratchGDB = arcpy.GetParameterAsText(7) # Geodatabase to hold intermediate products
+   ProcLogFile = arcpy.GetParameterAsText(8) # Text file to contain processing results
+   nWorkers = arcpy.GetParameter(9) # Number of worker processes; 1 runs the raster-algebra workflow
+      # Default: 1
+   CheckpointPolicy = arcpy.GetParameterAsText(10) # Intermediates to save: NONE, FINAL, STAGE or ITERATION
+      # Default: NONE
+   ManifestFile = arcpy.GetParameterAsText(11) # Optional completion manifest; units unchanged since the last run are skipped
+   OutStore = arcpy.GetParameterAsText(12) # Optional folder for compact uint16 chunked output instead of rdBeers_<unit> rasters
+   ScratchQuotaGB = arcpy.GetParameterAsText(13) # Optional limit on scratch data; the run stops if it is exceeded
+   Prefetch = arcpy.GetParameter(14) # With 1 worker, units to read ahead and write behind in the background; 0 runs the raster-algebra workflow
+      # Default: 0
+   FillMode = arcpy.GetParameterAsText(15) # How NoAspect cells are filled: RADIUS (expanding focal mean up to nLimit) or NEAREST
+      # Default: RADIUS
+   FillK = arcpy.GetParameter(16) # NEAREST mode: number of nearest valid values to blend by inverse distance
+      # Default: 1
+
+   BeersAspect(inDEM, inBurn, inBnd, inProcUnits, inFld, nLimit, outGDB, scratchGDB, ProcLogFile, nWorkers, CheckpointPolicy, ManifestFile, OutStore, ScratchQuotaGB, Prefetch, FillMode, FillK)
+
+if __name__ == '__main__':
+   main()
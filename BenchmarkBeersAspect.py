@@ -0,0 +1,311 @@
+# ----------------------------------------------------------------------------------------
+# BenchmarkBeersAspect.py
+# Version:  Python 2.7 / 3.x with NumPy (no arcpy needed)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Benchmarks the NumPy engine for the Beers aspect workflow (libBeersAspect.py) on synthetic
+# DEMs, so that changes to the workflow can be measured as faster or slower.  The aspect,
+# Beers transform, burn-in and NoAspect fill stages are each timed, across a grid of DEM
+# sizes and nLimit values, and reported as throughput in cells per second with peak memory.
+
+# Usage Tips:
+# Synthetic DEMs are smooth random terrain with flat plateaus covering roughly the requested
+# fraction of cells, water features covering roughly the requested burn fraction, and a
+# NoData border of the requested shape ('none', 'rect', 'circle' or 'ragged').  The same
+# seed always gives the same DEM, so results are comparable between runs.  The fractions
+# actually obtained (of cells with data) are recorded with each result.
+#     Each case is run several times and the fastest run is kept.  Results are appended to a
+# JSON-lines file, one line per case, tagged with a run ID, the git commit and the platform;
+# CompareRuns reports the change in throughput between two runs.  Stages too fast for the
+# clock to time are reported as n/a.
+#     CompareFillModes (--fill-modes) times the NEAREST fill mode, with k = 1 and with
+# inverse-distance blends, against the capped expanding mean (RADIUS) on the same DEMs, and
+# reports how closely the two agree on the cells the capped mean managed to fill.  Its
+# results go to the same file, with kind 'fillModes' so that CompareRuns passes over them.
+
+# Dependencies:
+# libBeersAspect.py, libInstrument.py, libConvergence.py
+
+# Syntax:
+# python BenchmarkBeersAspect.py --sizes 512 2048 --nlimits 1 5 10 --out bench.jsonl
+# python BenchmarkBeersAspect.py --compare bench.jsonl
+# python BenchmarkBeersAspect.py --fill-modes --sizes 1024 --nlimits 5 20 --flat 0.3 --k 1 4
+# ----------------------------------------------------------------------------------------
+
+import os, json, time, platform, subprocess, argparse
+from datetime import datetime
+import numpy as np
+from libBeersAspect import HornAspect, BeersTransform, BurnBeers, FillNoAspect, FillNoAspectNearest, NOASPECT, ENGINE_VERSION
+from libInstrument import PeakRSS
+from libConvergence import DilateMask
+
+try:
+   import tracemalloc # Python 3.4+; NumPy reports its allocations to it
+except ImportError:
+   tracemalloc = None
+
+# time.time can be too coarse to time the fastest stages on small DEMs (e.g. 15 ms steps on Windows)
+_Clock = getattr(time, 'perf_counter', time.time)
+
+BORDERS = ('none', 'rect', 'circle', 'ragged')
+
+def SmoothField(nRows, nCols, scale, rng):
+   '''Returns a smooth random field with features roughly scale cells across, scaled to zero
+   mean and unit standard deviation.'''
+   noise = rng.standard_normal((nRows, nCols))
+   fy = np.fft.fftfreq(nRows)[:, None]
+   fx = np.fft.rfftfreq(nCols)[None, :]
+   lowpass = np.exp(-(fx**2 + fy**2) * (scale**2) * 2)
+   field = np.fft.irfft2(np.fft.rfft2(noise) * lowpass, s = (nRows, nCols))
+   return (field - field.mean()) / (field.std() or 1.0)
+
+def BorderMask(nRows, nCols, border, rng):
+   '''Returns a boolean mask of NoData cells forming a border of the given shape.'''
+   mask = np.zeros((nRows, nCols), dtype = bool)
+   if border == 'none':
+      return mask
+   if border == 'rect':
+      m = max(1, min(nRows, nCols) // 20)
+      mask[:m, :] = mask[-m:, :] = True
+      mask[:, :m] = mask[:, -m:] = True
+      return mask
+   y, x = np.mgrid[0:nRows, 0:nCols]
+   r = np.hypot((y - nRows / 2.0) / (nRows / 2.0), (x - nCols / 2.0) / (nCols / 2.0))
+   if border == 'circle':
+      return r > 0.95
+   if border == 'ragged':
+      # A circle with an irregular, fractal-looking edge, like a clipped watershed boundary
+      wobble = 0.15 * SmoothField(nRows, nCols, min(nRows, nCols) / 16.0, rng)
+      return r > 0.85 + wobble
+   raise ValueError('Border must be one of %s' % (BORDERS,))
+
+def SyntheticDEM(nRows, nCols, flatFraction = 0.1, burnFraction = 0.05, border = 'none', seed = 0):
+   '''Generates a synthetic DEM for benchmarking.  Returns a tuple (dem, burn, nodata) of a
+   float32 elevation array (meters) and boolean burn and NoData masks.'''
+   rng = np.random.RandomState(seed)
+   scale = max(nRows, nCols) / 8.0
+   dem = 300.0 + 100.0 * SmoothField(nRows, nCols, scale, rng) + 5.0 * SmoothField(nRows, nCols, scale / 16.0, rng)
+   if flatFraction > 0:
+      # Plateaus:  level the highest parts of an independent field to a constant elevation
+      plateau = SmoothField(nRows, nCols, scale / 4.0, rng)
+      flat = plateau > np.percentile(plateau, 100.0 * (1 - flatFraction))
+      # Only plateau interiors are flat (a cell needs 8 level neighbors), so grow by a cell
+      flat = DilateMask(flat, 1)
+      dem[flat] = np.round(dem[flat].mean())
+   burn = np.zeros((nRows, nCols), dtype = bool)
+   if burnFraction > 0:
+      water = SmoothField(nRows, nCols, scale / 6.0, rng)
+      burn = water > np.percentile(water, 100.0 * (1 - burnFraction))
+   nodata = BorderMask(nRows, nCols, border, rng)
+   dem = dem.astype(np.float32)
+   dem[nodata] = np.nan
+   return dem, burn & ~nodata, nodata
+
+def _TimeStage(func, repeats):
+   '''Runs func repeats times and returns (result, best seconds, peak bytes allocated).  The
+   peak is measured on one extra run, so that tracing does not slow the timed runs.'''
+   best = None
+   for i in range(repeats):
+      t0 = _Clock()
+      result = func()
+      elapsed = _Clock() - t0
+      best = elapsed if best is None else min(best, elapsed)
+   peak = None
+   if tracemalloc is not None:
+      tracemalloc.start()
+      func()
+      peak = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+   return result, best, peak
+
+def BenchmarkCase(size, nLimit, flatFraction = 0.1, burnFraction = 0.05, border = 'none', repeats = 3, seed = 0, cellSize = 30.0):
+   '''Benchmarks each stage on one synthetic DEM of size x size cells.  Returns a result
+   dictionary with seconds, cells per second and peak memory per stage.'''
+   dem, burn, nodata = SyntheticDEM(size, size, flatFraction, burnFraction, border, seed)
+   nCells = dem.size
+   stages = dict()
+
+   aspect, t, peak = _TimeStage(lambda: HornAspect(dem, cellSize, nodata), repeats)
+   stages['aspect'] = (t, peak)
+   beers, t, peak = _TimeStage(lambda: BeersTransform(aspect), repeats)
+   stages['beers'] = (t, peak)
+   burned, t, peak = _TimeStage(lambda: BurnBeers(beers, burn), repeats)
+   stages['burn'] = (t, peak)
+   (filled, radius, limitReached), t, peak = _TimeStage(lambda: FillNoAspect(burned, nLimit), repeats)
+   stages['fill'] = (t, peak)
+
+   result = {'kind': 'stages', 'size': size, 'cells': nCells, 'nLimit': nLimit, 'border': border, 'seed': seed,
+             'flatFraction': flatFraction, 'burnFraction': burnFraction,
+             'actualFlat': float(np.mean(aspect[~nodata] == NOASPECT)),
+             'actualBurn': float(np.mean(burn[~nodata])),
+             'actualNoData': float(np.mean(nodata)),
+             'fillRadius': int(radius), 'limitReached': bool(limitReached),
+             'repeats': repeats, 'peakRSS': PeakRSS()}
+   total = 0.0
+   for name, (t, peak) in stages.items():
+      total += t
+      result[name + 'Seconds'] = t
+      result[name + 'CellsPerSecond'] = nCells / t if t > 0 else None
+      result[name + 'PeakBytes'] = peak
+   result['totalSeconds'] = total
+   result['totalCellsPerSecond'] = nCells / total if total > 0 else None
+   return result
+
+def _GitCommit():
+   '''Returns the current git commit of this script's folder, or None.'''
+   try:
+      out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                    cwd = os.path.dirname(os.path.abspath(__file__)),
+                                    stderr = open(os.devnull, 'w'))
+      return out.decode('ascii').strip()
+   except Exception:
+      return None
+
+def _RunInfo():
+   '''Returns the fields that tag every result of a run.'''
+   # The process ID keeps runs started within the same second apart
+   return {'run': '%s-%s' % (datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid()),
+           'commit': _GitCommit(),
+           'engine': ENGINE_VERSION,
+           'python': platform.python_version(),
+           'numpy': np.__version__,
+           'machine': '%s %s' % (platform.system(), platform.machine())}
+
+def _Append(outFile, result):
+   with open(outFile, 'a') as f:
+      f.write(json.dumps(result, sort_keys = True) + '\n')
+
+def _Mcells(rate):
+   '''Formats a throughput in millions of cells per second, or n/a for a stage too fast to time.'''
+   return '%8.2f' % (rate / 1e6) if rate else '%8s' % 'n/a'
+
+def RunBenchmarks(sizes, nLimits, outFile = None, flatFraction = 0.1, burnFraction = 0.05, border = 'none', repeats = 3, seed = 0):
+   '''Benchmarks every combination of size and nLimit, printing a line per case and
+   appending the results to outFile (JSON lines) if given.  Returns the list of results.'''
+   runInfo = _RunInfo()
+   results = list()
+   for size in sizes:
+      for nLimit in nLimits:
+         result = BenchmarkCase(size, nLimit, flatFraction, burnFraction, border, repeats, seed)
+         result.update(runInfo)
+         results.append(result)
+         print('%5s x %-5s nLimit %-3s  aspect %s  beers %s  burn %s  fill %s  total %s Mcells/s  (flat %.1f%%, radius %s)' % (
+               size, size, nLimit,
+               _Mcells(result['aspectCellsPerSecond']), _Mcells(result['beersCellsPerSecond']),
+               _Mcells(result['burnCellsPerSecond']), _Mcells(result['fillCellsPerSecond']),
+               _Mcells(result['totalCellsPerSecond']), 100 * result['actualFlat'], result['fillRadius']))
+         if outFile:
+            _Append(outFile, result)
+   return results
+
+def LoadResults(path, kind = 'stages'):
+   '''Reads the results of one kind ('stages' from RunBenchmarks, or 'fillModes' from
+   CompareFillModes) from a results file into a dictionary of {run ID: [results]}, and the
+   list of run IDs in file order.'''
+   runs = dict()
+   order = list()
+   with open(path) as f:
+      for line in f:
+         if line.strip():
+            result = json.loads(line)
+            if result.get('kind', 'stages') != kind:
+               continue
+            if result['run'] not in runs:
+               order.append(result['run'])
+            runs.setdefault(result['run'], list()).append(result)
+   return runs, order
+
+def CompareRuns(path, runA = None, runB = None):
+   '''Prints the ratio of throughput in runB to runA for each case the two runs share.  By
+   default the last two runs in the file are compared.'''
+   runs, order = LoadResults(path)
+   if runA is None or runB is None:
+      if len(order) < 2:
+         print('Need at least two runs to compare')
+         return
+      runA, runB = order[-2], order[-1]
+   key = lambda r: (r['size'], r['nLimit'], r['border'], r['flatFraction'], r['burnFraction'], r['seed'])
+   before = dict((key(r), r) for r in runs[runA])
+   print('Speedup of run %s (%s) over run %s (%s):' % (runB, runs[runB][0]['commit'], runA, runs[runA][0]['commit']))
+   for r in runs[runB]:
+      b = before.get(key(r))
+      if b is None:
+         continue
+      ratios = ['%s %.2fx' % (stage, r[stage + 'CellsPerSecond'] / b[stage + 'CellsPerSecond'])
+                for stage in ('aspect', 'beers', 'burn', 'fill', 'total')
+                if r.get(stage + 'CellsPerSecond') and b.get(stage + 'CellsPerSecond')]
+      print('%5s x %-5s nLimit %-3s  %s' % (r['size'], r['size'], r['nLimit'], '  '.join(ratios)))
+
+def CompareFillModes(sizes, nLimits, ks = (1, 4), flatFraction = 0.3, burnFraction = 0.05, border = 'ragged', repeats = 3, seed = 0,
+                     outFile = None):
+   '''Compares the NEAREST fill (for each k) with the capped RADIUS fill on synthetic DEMs,
+   printing a line per case and appending the results to outFile (JSON lines, tagged with
+   kind 'fillModes') if given.  Agreement is measured on the NoAspect cells that RADIUS
+   filled from data, i.e. not those given the neutral value at the limit.  Returns a list of
+   result dictionaries.'''
+   runInfo = _RunInfo()
+   results = list()
+   for size in sizes:
+      dem, burn, nodata = SyntheticDEM(size, size, flatFraction, burnFraction, border, seed)
+      beers = BurnBeers(BeersTransform(HornAspect(dem, 30.0, nodata)), burn)
+      gaps = beers == NOASPECT
+      for nLimit in nLimits:
+         (capped, radius, limitReached), tCapped, peak = _TimeStage(lambda: FillNoAspect(beers, nLimit), repeats)
+         # The cells RADIUS filled from data, rather than with the neutral value
+         reached = gaps & ~_Unreached(beers, nLimit)
+         for k in ks:
+            (nearest, farthest, _), tNearest, peak = _TimeStage(lambda: FillNoAspectNearest(beers, None, k), repeats)
+            diff = np.abs(nearest[reached].astype(np.float64) - capped[reached])
+            result = {'kind': 'fillModes', 'size': size, 'nLimit': nLimit, 'k': k, 'border': border, 'seed': seed,
+                      'flatFraction': flatFraction, 'burnFraction': burnFraction, 'repeats': repeats, 'flatCells': int(gaps.sum()),
+                      'cappedSeconds': tCapped, 'nearestSeconds': tNearest,
+                      'speedup': tCapped / tNearest if tNearest > 0 else None,
+                      'neutralCells': int((gaps & ~reached).sum()), 'farthest': int(farthest),
+                      'meanAbsDiff': float(diff.mean()) if diff.size else None,
+                      'rmse': float(np.sqrt((diff ** 2).mean())) if diff.size else None,
+                      'within01': float(np.mean(diff <= 0.1)) if diff.size else None}
+            result.update(runInfo)
+            results.append(result)
+            print('%5s x %-5s nLimit %-3s k %-2s  capped %7.3f s  nearest %7.3f s (%.2fx)  neutral %8s  farthest %5s  |diff| %.3f  rmse %.3f  within 0.1 %.1f%%' % (
+                  size, size, nLimit, k, tCapped, tNearest, result['speedup'] or 0, result['neutralCells'],
+                  result['farthest'], result['meanAbsDiff'] or 0, result['rmse'] or 0, 100 * (result['within01'] or 0)))
+            if outFile:
+               _Append(outFile, result)
+   return results
+
+def _Unreached(beers, nLimit):
+   '''Returns a mask of the NoAspect cells with no valid cell within nLimit (those the
+   capped fill sets to the neutral value).'''
+   # Valid cells become 0, so the probe fills to 0 wherever there is data within reach, and to 1 elsewhere
+   valid = ~np.isnan(beers) & (beers != NOASPECT)
+   probe = np.where(valid, np.float32(0.0), np.where(beers == NOASPECT, np.float32(NOASPECT), np.nan)).astype(np.float32)
+   filled, radius, limitReached = FillNoAspect(probe, nLimit)
+   return (beers == NOASPECT) & (filled == 1.0)
+
+def main():
+   parser = argparse.ArgumentParser(description = 'Benchmark the Beers aspect engine on synthetic DEMs')
+   parser.add_argument('--sizes', type = int, nargs = '+', default = [512, 1024, 2048])
+   parser.add_argument('--nlimits', type = int, nargs = '+', default = [1, 5, 10, 20])
+   parser.add_argument('--flat', type = float, default = 0.1, help = 'Fraction of flat (NoAspect) cells')
+   parser.add_argument('--burn', type = float, default = 0.05, help = 'Fraction of water (burned) cells')
+   parser.add_argument('--border', choices = BORDERS, default = 'ragged', help = 'Shape of the NoData border')
+   parser.add_argument('--repeats', type = int, default = 3)
+   parser.add_argument('--seed', type = int, default = 0)
+   parser.add_argument('--out', default = 'BeersBenchmark.jsonl', help = 'JSON-lines file the results are appended to')
+   parser.add_argument('--compare', metavar = 'FILE', help = 'Compare the last two runs in FILE instead of benchmarking')
+   parser.add_argument('--fill-modes', action = 'store_true', help = 'Compare the NEAREST and RADIUS fill modes instead')
+   parser.add_argument('--k', type = int, nargs = '+', default = [1, 4], help = 'Values blended in NEAREST mode')
+   args = parser.parse_args()
+
+   if args.compare:
+      CompareRuns(args.compare)
+   elif args.fill_modes:
+      CompareFillModes(args.sizes, args.nlimits, args.k, args.flat, args.burn, args.border, args.repeats, args.seed, args.out)
+   else:
+      RunBenchmarks(args.sizes, args.nlimits, args.out, args.flat, args.burn, args.border, args.repeats, args.seed)
+
+if __name__ == '__main__':
+   main()
@@ -2,82 +2,90 @@
 # CombineNHDPolygons.py
 # Version:  ArcGIS 10.2 / Python 2.7
 # Creation Date:  2015-07-10
-# Last Edit:  2015-07-10
+# Last Edit:  2026-10-16
 # Creator:  Kirsten R. Hazler
 #
 # Summary:  Combines NHDArea and NHDWaterbody into a single polygon feature class.  Why aren't 
 #           these combined as a single feature class to begin with?  I do not know.
 #
 # Usage Tips:
+#           Both sources are read once and streamed into NHD_Polys through a single insert
+#           cursor, with SourceFC set on the fly and the FType subtypes and FCode domains in place
+#           (see libNHDMerge.py).  No temporary feature classes are created.
+#
+#           In the same pass, the FCode, FType, SourceFC, area and extent of every output
+#           feature are written to a columnar attribute store beside out_GDB, named after it
+#           (<out_GDB name>_NHD_Polys_Attributes; see libNHDAttributes.py).  Downstream steps, such as the
+#           burn-raster build, can select features by subtype, source and extent from it
+#           without scanning the geodatabase.  In batch mode each output has its own store.
+#
+#           Batch mode:  if in_GDB is a folder of NHD geodatabases, or a semicolon-delimited
+#           list of them, they are processed concurrently in a pool of worker processes.
+#           Each input gets its own <name>_NHD.gdb in the output folder, optionally appended
+#           into a single combined feature class, and a per-input summary of row counts,
+#           elapsed time and errors is written to NHD_BatchSummary.csv in the output folder.
 # 
 # Required Arguments:
+#           in_GDB:  Input NHD geodatabase (batch mode:  folder or list of geodatabases)
+#           out_GDB:  Output geodatabase (batch mode:  output folder)
+#
+# Optional Arguments (batch mode only):
+#           nWorkers:  Number of worker processes (default 4)
+#           combinedFC:  Feature class into which all outputs are appended
 # ------------------------------------------------------------------------------------------
 
 # Import required standard modules
 import arcpy, os, sys, traceback
+from libNHDMerge import MergeNHDPolygons, CombineNHDBatch, AttributeStorePath
+
+def CombineNHDPolygons(in_GDB, out_GDB):
+   '''Combines NHDArea and NHDWaterbody from in_GDB into out_GDB\\NHD_Polys.  Returns a dict of row counts by source.'''
+   # Environment settings and derived variables
+   arcpy.env.overwriteOutput = True
+   nhdMerged = out_GDB + os.sep + 'NHD_Polys'
+   attrStore = AttributeStorePath(nhdMerged)
+
+   # Merge feature classes in one pass, adding the SourceFC attribute and the FType subtypes
+   # and domains removed by the Merge tool
+   arcpy.AddMessage('Merging NHD polygon feature classes to output %s...' % nhdMerged)
+   counts = MergeNHDPolygons(in_GDB, nhdMerged, attrStore)
+   for sourceFC in sorted(counts):
+      arcpy.AddMessage('%s features from %s' % (counts[sourceFC], sourceFC))
+   arcpy.AddMessage('Attribute store written to %s' % attrStore)
+   return counts
+
+def main():
+   # Script arguments to be input by user
+   in_GDB = arcpy.GetParameterAsText(0) # Input NHD geodatabase, or folder/list of them for batch mode
+   out_GDB = arcpy.GetParameterAsText(1) # Output geodatabase, or output folder for batch mode
+   nWorkers = arcpy.GetParameter(2) # Batch mode: number of worker processes
+      # Default: 4
+   combinedFC = arcpy.GetParameterAsText(3) # Batch mode: optional single combined output
 
-# Script arguments to be input by user
-in_GDB = arcpy.GetParameterAsText(0) # Input NHD geodatabase
-out_GDB = arcpy.GetParameterAsText(1) # Output geodatabase
+   try:
+      batch = ';' in in_GDB or (os.path.isdir(in_GDB) and not in_GDB.lower().endswith('.gdb'))
+      if batch:
+         arcpy.env.overwriteOutput = True
+         summaryFile = os.path.join(out_GDB, 'NHD_BatchSummary.csv')
+         CombineNHDBatch(in_GDB, out_GDB, int(nWorkers or 4), combinedFC or None, summaryFile)
+         arcpy.AddMessage('Batch summary written to %s' % summaryFile)
+      else:
+         CombineNHDPolygons(in_GDB, out_GDB)
 
-# Environment settings and derived variables
-arcpy.env.overwriteOutput = True
-nhdArea = in_GDB + os.sep + 'Hydrography' + os.sep + 'NHDArea'
-nhdWB = in_GDB + os.sep + 'Hydrography' + os.sep + 'NHDWaterbody'
-nhdMerged = out_GDB + os.sep + 'NHD_Polys'
+   except:
+     # Error handling code swiped from "A Python Primer for ArcGIS"
+      tb = sys.exc_info()[2]
+      tbinfo = traceback.format_tb(tb)[0]
+      pymsg = "PYTHON ERRORS:\nTraceback Info:\n" + tbinfo + "\nError Info:\n " + str(sys.exc_info()[1])
+      msgs = "ARCPY ERRORS:\n" + arcpy.GetMessages(2) + "\n"
 
-try:
-   # Copy NHD feature classes to output GDB
-   arcpy.AddMessage('Copying NHD polygon feature classes to output %s...' % nhdMerged)
-   arcpy.FeatureClassToFeatureClass_conversion (nhdArea, out_GDB, 'tmpArea')
-   arcpy.FeatureClassToFeatureClass_conversion (nhdWB, out_GDB, 'tmpWB')
-   
-   # Add and populate the SourceFC field
-   arcpy.AddMessage('Adding source feature class attribute...')
-   fcList = [['tmpArea', 'NHDArea'],['tmpWB', 'NHDWaterbody']]
-   for Item in fcList:
-      fc = out_GDB + os.sep + Item[0]
-      sourceFC = Item[1]
-      arcpy.AddField_management (fc, 'SourceFC', 'TEXT', '', '', 12, '', '', '', '')
-      expression = "'%s'" % sourceFC
-      arcpy.CalculateField_management (fc, 'SourceFC', expression, 'PYTHON')
-      
-   # Merge feature classes
-   arcpy.AddMessage('Merging feature classes')
-   arcpy.Merge_management ([out_GDB + os.sep + 'tmpArea', out_GDB + os.sep + 'tmpWB'], nhdMerged)
-   
-   # Add missing subtypes removed by Merge tool, and reattach their domains
-   # It's possible this section may need modification in the future
-   arcpy.AddMessage('Adding missing subtypes and reattaching domains...')
-   TypeList = [[493, 'Estuary', 'Estuary FCode'],
-             [378, 'Ice Mass', 'Ice Mass FCode'],
-             [390, 'LakePond', 'LakePond FCode'],
-             [361, 'Playa', 'Playa FCode'], 
-             [436, 'Reservoir', 'Reservoir FCode'],
-             [466, 'SwampMarsh', 'SwampMarsh FCode']]
-   for Type in TypeList:
-      arcpy.AddSubtype_management (nhdMerged, Type[0], Type[1])
-      arcpy.AssignDomainToField_management (nhdMerged, 'FCode', Type[2], Type[0])
-      arcpy.AssignDomainToField_management(nhdMerged,'FCode', Type[2], "'%s: %s'" % (Type[0], Type[1]))
-   
-# Cleanup   
-   arcpy.AddMessage('Deleting temp data...')
-   for Item in fcList:
-      fc = out_GDB + os.sep + Item[0]
-      arcpy.Delete_management (fc)
-        
-except:
-  # Error handling code swiped from "A Python Primer for ArcGIS"
-   tb = sys.exc_info()[2]
-   tbinfo = traceback.format_tb(tb)[0]
-   pymsg = "PYTHON ERRORS:\nTraceback Info:\n" + tbinfo + "\nError Info:\n " + str(sys.exc_info()[1])
-   msgs = "ARCPY ERRORS:\n" + arcpy.GetMessages(2) + "\n"
+      arcpy.AddError(msgs)
+      arcpy.AddError(pymsg)
+      arcpy.AddMessage(arcpy.GetMessages(1))
 
-   arcpy.AddError(msgs)
-   arcpy.AddError(pymsg)
-   arcpy.AddMessage(arcpy.GetMessages(1))
+      print msgs
+      print pymsg
+      print arcpy.AddMessage(arcpy.GetMessages(1))
 
-   print msgs
-   print pymsg
-   print arcpy.AddMessage(arcpy.GetMessages(1))
-   
\ No newline at end of file
+if __name__ == '__main__':
+   main()
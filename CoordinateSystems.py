@@ -1,16 +1,82 @@
 # Working with coordinate systems
 
 import arcpy, os
+from libDescribeCache import DatasetStamp
 
 def printMsg(msg):
    arcpy.AddMessage(msg)
    print msg
 
-def ProjectToMatch (fcTarget, fcTemplate):
-   """Project a target feature class to match the coordinate system of a template feature class"""
+# Caches for ProjectToMatch, which is often called in loops over many layers against the same template.
+# Spatial references are keyed by dataset path and modification stamp, so an edited dataset is looked up again.
+# In a file geodatabase the stamp covers the whole geodatabase (see libDescribeCache.DatasetStamp), so writing one
+# feature class looks its neighbours up again too; datasets without a stamp (e.g. in .sde or .mdb) are not cached.
+# Transformation lists depend only on the pair of spatial references.
+_srCache = dict()
+_transCache = dict()
+_prjRecord = dict() # Re-projected outputs made in this session: fcTarget_prj -> (fcTarget stamp, fcTarget_prj stamp, template name)
+_cacheStats = {'srHits': 0, 'srMisses': 0, 'transHits': 0, 'transMisses': 0, 'prjSkipped': 0}
+
+def GetSpatialReference(dataset):
+   '''Returns the spatial reference of a dataset, from the cache if the dataset is unchanged since it was last described'''
+   key = (os.path.normcase(os.path.abspath(dataset)), DatasetStamp(dataset))
+   if key[1] is not None and key in _srCache:
+      _cacheStats['srHits'] += 1
+      return _srCache[key]
+   _cacheStats['srMisses'] += 1
+   sr = arcpy.Describe(dataset).spatialReference
+   if key[1] is not None:
+      _srCache[key] = sr
+   return sr
+
+def GetTransformations(srFrom, srTo):
+   '''Returns the list of applicable geographic transformations between two spatial references, from the cache if possible'''
+   key = (srFrom.exportToString(), srTo.exportToString())
+   if key in _transCache:
+      _cacheStats['transHits'] += 1
+   else:
+      _cacheStats['transMisses'] += 1
+      _transCache[key] = arcpy.ListTransformations(srFrom, srTo)
+   return _transCache[key]
+
+def CacheStats():
+   '''Returns a copy of the cache hit/miss counts, and the number of re-projections skipped as up to date'''
+   stats = dict(_cacheStats)
+   stats['srCached'] = len(_srCache)
+   stats['transCached'] = len(_transCache)
+   return stats
+
+def ClearCache():
+   '''Empties the caches and resets the statistics'''
+   _srCache.clear()
+   _transCache.clear()
+   _prjRecord.clear()
+   for key in _cacheStats:
+      _cacheStats[key] = 0
+
+def _IsUpToDate(fcTarget, fcTarget_prj, srTemplate):
+   '''Decides whether an existing re-projected output can be reused: it must have the template's coordinate system,
+   and be newer than its source (or have been made from the source's current version in this session)'''
+   if not arcpy.Exists(fcTarget_prj):
+      return False
+   if GetSpatialReference(fcTarget_prj).Name != srTemplate.Name:
+      return False
+   stampTarget = DatasetStamp(fcTarget)
+   stampPrj = DatasetStamp(fcTarget_prj)
+   if stampTarget is None or stampPrj is None:
+      return False
+   if stampPrj[0] > stampTarget[0]: # Modification times
+      return True
+   # File systems with coarse times can give the output the same stamp as its source, so rely on the session record
+   return _prjRecord.get(fcTarget_prj) == (stampTarget, stampPrj, srTemplate.Name)
+
+def ProjectToMatch (fcTarget, fcTemplate, geoTrans = None):
+   """Project a target feature class to match the coordinate system of a template feature class.  If the datums differ,
+   geoTrans names the geographic transformation to use; by default the first one listed by ArcGIS is used.
+   For point data or large batches of coordinates, see libProjections for a NumPy-based alternative."""
    # Get the spatial reference of your target and template feature classes
-   srTarget = arcpy.Describe(fcTarget).spatialReference # This yields an object, not a string
-   srTemplate = arcpy.Describe(fcTemplate).spatialReference 
+   srTarget = GetSpatialReference(fcTarget) # This yields an object, not a string
+   srTemplate = GetSpatialReference(fcTemplate)
 
    # Get the geographic coordinate system of your target and template feature classes
    gcsTarget = srTarget.GCS # This yields an object, not a string
@@ -21,23 +87,32 @@ def ProjectToMatch (fcTarget, fcTemplate):
       printMsg('Coordinate systems match; no need to do anything.')
       return fcTarget
    else:
-      printMsg('Coordinate systems do not match; proceeding with re-projection.')
       if fcTarget[-3:] == 'shp':
          fcTarget_prj = fcTarget[:-4] + "_prj.shp"
       else:
          fcTarget_prj = fcTarget + "_prj"
+      if _IsUpToDate(fcTarget, fcTarget_prj, srTemplate):
+         _cacheStats['prjSkipped'] += 1
+         printMsg('Re-projected data %s is already up to date; skipping re-projection.' % fcTarget_prj)
+         return fcTarget_prj
+      printMsg('Coordinate systems do not match; proceeding with re-projection.')
       if gcsTarget.Name == gcsTemplate.Name:
          printMsg('Datums are the same; no geographic transformation needed.')
          arcpy.Project_management (fcTarget, fcTarget_prj, srTemplate)
       else:
          printMsg('Datums do not match; re-projecting with geographic transformation')
          # Get the list of applicable geographic transformations
-         # This is a stupid long list
-         transList = arcpy.ListTransformations(srTarget,srTemplate) 
-         # Extract the first item in the list, assumed the appropriate one to use
-         geoTrans = transList[0]
+         # This is a stupid long list, so it is cached
+         transList = GetTransformations(srTarget, srTemplate)
+         if geoTrans is None:
+            # Extract the first item in the list, assumed the appropriate one to use
+            geoTrans = transList[0]
+         elif geoTrans not in transList:
+            raise ValueError('Transformation %s does not apply between %s and %s' % (geoTrans, gcsTarget.Name, gcsTemplate.Name))
+         printMsg('Using geographic transformation %s' % geoTrans)
          # Now perform reprojection with geographic transformation
          arcpy.Project_management (fcTarget, fcTarget_prj, srTemplate, geoTrans)
+      _prjRecord[fcTarget_prj] = (DatasetStamp(fcTarget), DatasetStamp(fcTarget_prj), srTemplate.Name)
       printMsg("Re-projected data is %s." % fcTarget_prj)
       return fcTarget_prj
       
@@ -51,8 +126,9 @@ def main():
    
    # Include the desired function run statement(s) below
    ProjectToMatch (fcTarget, fcTemplate)
+   printMsg('Cache statistics: %s' % CacheStats())
    
    # End of user input
    
 if __name__ == '__main__':
-   main()
\ No newline at end of file
+   main()
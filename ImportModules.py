@@ -20,6 +20,12 @@ import arcpy # Gets functionality of standard ArcGIS toolboxes.
 import arcpy
 from arcpy.sa import *
 arcpy.CheckOutExtension("Spatial")
+# In toolboxes, or scripts run with worker processes, this costs time at every load even if no tool is run.
+# To defer the import and the license checkout until they are actually needed, see libLazyImport.py:
+from libLazyImport import LazyImport, RequiresExtension
+sa = LazyImport('arcpy.sa') # Imported on first use, e.g. sa.Aspect(inDEM)
+# ...and decorate the function that uses it with @RequiresExtension('Spatial')
+# To see what each import costs, run:  python libLazyImport.py arcpy numpy
 
 import os # Miscellaneous operating system interfaces
 # Provides access to operating system functionality such as file and directory paths.
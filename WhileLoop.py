@@ -41,3 +41,6 @@ else:
    # Go on to the next step
    
 # The "else" part is optional; see here: https://stackoverflow.com/questions/3295938/else-clause-on-python-while-statement
+
+# For an array-based version that only recomputes cells next to those that changed, and keeps
+# per-iteration change counts and timings instead of saving every iteration, see libConvergence.py.
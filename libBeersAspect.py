@@ -0,0 +1,403 @@
+# ----------------------------------------------------------------------------------------
+# libBeersAspect.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# NumPy engine for the Beers aspect workflow in BeersAspect_BAK6.py.  Operates on plain
+# arrays, so it can be used and tested without arcpy.
+
+# Usage Tips:
+# Arrays are laid out the way arcpy.RasterToNumPyArray returns them:  row 0 is the
+# northern edge.  NoData is represented as NaN in float32 outputs, and NoAspect (flat)
+# cells are coded -1, matching the conventions of the raster-algebra workflow.
+
+#     Aspect follows the ArcGIS ASPECT tool (Horn 3x3 kernel).  Where a neighbor is NoData
+# or falls outside the array, the center cell's elevation is substituted for it.
+
+#     NoAspect cells are filled either by expanding radius (FillNoAspect, RADIUS mode) or
+# from the nearest valid cells (FillNoAspectNearest, NEAREST mode).  On the synthetic DEMs of
+# BenchmarkBeersAspect.py --fill-modes (30% flat), NEAREST with k = 1 takes about 1.5 times
+# as long as RADIUS with nLimit = 10 at 256 x 256 cells, and under half as long at 2048 x
+# 2048; blending k = 4 values costs 1.5 to 3 times as much as k = 1.
+
+# Dependencies:
+# numpy
+# ----------------------------------------------------------------------------------------
+
+import numpy as np
+
+NOASPECT = -1.0 # Code for cells with a flat slope (undefined aspect)
+ENGINE_VERSION = '1.0' # Change whenever results change, so that resumed runs recompute all units
+
+def _ValidDEM(dem, nodata = None):
+   '''Returns the DEM as float32 with NaN in NoData cells.'''
+   z = np.array(dem, dtype = np.float32, copy = True)
+   if nodata is not None:
+      z[np.asarray(nodata, dtype = bool)] = np.nan
+   return z
+
+def HornGradients(dem, cellSize, nodata = None):
+   '''Computes the Horn (1981) east-west and north-south elevation gradients (dz/dx, dz/dy)
+   for each cell of a DEM array.  Returns float32 arrays with NaN in NoData cells.'''
+   z = _ValidDEM(dem, nodata)
+   nRows, nCols = z.shape
+   pad = np.full((nRows + 2, nCols + 2), np.nan, dtype = np.float32)
+   pad[1:-1, 1:-1] = z
+
+   def nbr(dr, dc):
+      # Neighbor elevations, with the center value substituted for NoData/off-edge neighbors
+      n = pad[1 + dr:1 + dr + nRows, 1 + dc:1 + dc + nCols]
+      return np.where(np.isnan(n), z, n)
+
+   a, b, c = nbr(-1, -1), nbr(-1, 0), nbr(-1, 1)
+   d, f = nbr(0, -1), nbr(0, 1)
+   g, h, i = nbr(1, -1), nbr(1, 0), nbr(1, 1)
+
+   denom = np.float32(8.0 * cellSize)
+   dzdx = ((c + 2*f + i) - (a + 2*d + g)) / denom
+   dzdy = ((g + 2*h + i) - (a + 2*b + c)) / denom
+   return dzdx, dzdy
+
+def HornAspect(dem, cellSize, nodata = None):
+   '''Computes aspect in compass degrees (0-360, clockwise from north), equivalent to the
+   ArcGIS ASPECT tool.  Flat cells are coded -1; NoData cells are NaN.'''
+   dzdx, dzdy = HornGradients(dem, cellSize, nodata)
+   a = np.degrees(np.arctan2(dzdy, -dzdx)).astype(np.float32)
+   aspect = np.float32(90.0) - a
+   aspect[a > 90.0] += np.float32(360.0)
+   aspect[(dzdx == 0) & (dzdy == 0)] = NOASPECT
+   return aspect
+
+def BeersTransform(aspect):
+   '''Applies the Beers transformation, cos(45 - aspect) + 1, to an aspect array in degrees.
+   NoAspect (-1) and NoData (NaN) cells are passed through.'''
+   aspect = np.asarray(aspect, dtype = np.float32)
+   beers = np.cos(np.radians(np.float32(45.0) - aspect)) + np.float32(1.0)
+   beers[aspect == NOASPECT] = NOASPECT
+   return beers.astype(np.float32)
+
+def BeersAspect(dem, cellSize, nodata = None):
+   '''Derives Beers aspect (0 = most exposed, 2 = most sheltered) directly from a DEM array
+   in a single vectorized pass, without materializing the aspect raster.  Flat cells are
+   coded -1; NoData cells are NaN.'''
+   dzdx, dzdy = HornGradients(dem, cellSize, nodata)
+   # The math angle a = atan2(dz/dy, -dz/dx) relates to compass aspect by aspect = 90 - a,
+   # so (45 - aspect) reduces to (a - 45).
+   beers = np.cos(np.arctan2(dzdy, -dzdx) - np.float32(np.pi/4)) + np.float32(1.0)
+   beers = beers.astype(np.float32)
+   beers[(dzdx == 0) & (dzdy == 0)] = NOASPECT
+   return beers
+
+def BurnBeers(beers, burn):
+   '''Burns in water and wetland features, setting Beers aspect to the neutral value of 1
+   wherever the boolean burn mask is True and the DEM has data.'''
+   burned = np.array(beers, dtype = np.float32, copy = True)
+   burned[np.asarray(burn, dtype = bool) & ~np.isnan(burned)] = 1.0
+   return burned
+
+def CircleSpans(radius):
+   '''Returns the (row offset, half-width) spans making up a circular neighborhood of the
+   given radius in cells, equivalent to NbrCircle(radius, "CELL").'''
+   spans = list()
+   for dy in range(-radius, radius + 1):
+      spans.append((dy, int(np.floor(np.sqrt(radius*radius - dy*dy)))))
+   return spans
+
+def FillNoAspect(beers, nLimit, region = None, callback = None):
+   '''Fills NoAspect (-1) cells with the mean of valid burned Beers values in the smallest
+   circular neighborhood, up to a radius of nLimit cells, that contains any.  Cells still
+   unfilled at the limit are assigned the neutral value of 1.  Equivalent to the expanding
+   Expand/FocalStatistics/Pick loop of the raster-algebra workflow.
+
+   Circular sums and counts are taken from row-wise summed-area tables, so each pass only
+   touches the cells that are still unfilled.
+
+   If region is given as a (row slice, column slice) pair, only NoAspect cells within it are
+   filled; the rest of the array serves as context and its NoAspect cells are left as -1.
+
+   If callback is given, it is called as callback(radius, filled) after each radius.
+
+   Returns a tuple (filled, radius, limitReached), where radius is the largest neighborhood
+   radius used and limitReached is True if any cells had the neutral value imposed.'''
+   src = np.asarray(beers, dtype = np.float32)
+   filled = src.copy()
+   if region is None:
+      ys, xs = np.nonzero(src == NOASPECT)
+   else:
+      rows, cols = region
+      ys, xs = np.nonzero(src[rows, cols] == NOASPECT)
+      ys += rows.start or 0
+      xs += cols.start or 0
+   if ys.size == 0:
+      return filled, 0, False
+
+   # Row-wise prefix sums of valid values and of valid-cell counts, padded by nLimit cells
+   # so that neighborhoods reaching past the array edges need no special handling.
+   R = int(nLimit)
+   valid = ~np.isnan(src) & (src != NOASPECT)
+   nRows, nCols = src.shape
+   sums = np.zeros((nRows + 2*R, nCols + 2*R + 1), dtype = np.float64)
+   counts = np.zeros((nRows + 2*R, nCols + 2*R + 1), dtype = np.int32)
+   sums[R:R + nRows, R + 1:R + 1 + nCols] = np.where(valid, src, 0)
+   counts[R:R + nRows, R + 1:R + 1 + nCols] = valid
+   np.cumsum(sums, axis = 1, out = sums)
+   np.cumsum(counts, axis = 1, out = counts)
+
+   radius = 0
+   while ys.size > 0 and radius < R:
+      radius += 1
+      s = np.zeros(ys.size, dtype = np.float64)
+      n = np.zeros(ys.size, dtype = np.int32)
+      for dy, w in CircleSpans(radius):
+         row = ys + R + dy
+         right = xs + R + w + 1
+         left = xs + R - w
+         s += sums[row, right] - sums[row, left]
+         n += counts[row, right] - counts[row, left]
+      hit = n > 0
+      filled[ys[hit], xs[hit]] = (s[hit] / n[hit]).astype(np.float32)
+      ys, xs = ys[~hit], xs[~hit]
+      if callback is not None:
+         callback(radius, filled)
+
+   limitReached = ys.size > 0
+   if limitReached:
+      filled[ys, xs] = 1.0
+   return filled, radius, limitReached
+
+def _ColumnNearest(valid):
+   '''First pass of the distance transform:  for every cell, the row of the nearest True cell
+   in the same column (-1 if none; the upper one on ties) and the squared distance to it
+   (infinite if none).  Running maxima and minima of row numbers, down and up each column,
+   give the nearest True cell above and below.  Returns a tuple (g2, nearRow).'''
+   nRows, nCols = valid.shape
+   big = nRows + nCols + 1 # Farther than any real distance
+   r = np.arange(nRows, dtype = np.int32)[:, None]
+   above = np.where(valid, r, np.int32(-big))
+   np.maximum.accumulate(above, axis = 0, out = above)
+   below = np.where(valid[::-1], r[::-1], np.int32(2 * big))
+   np.minimum.accumulate(below, axis = 0, out = below)
+   below = below[::-1]
+   up, down = r - above, below - r
+   nearRow = np.where(down < up, below, above).astype(np.int64)
+   offset = np.minimum(up, down).astype(np.float64)
+   g2 = offset * offset
+   g2[offset >= big] = np.inf
+   nearRow[np.isinf(g2)] = -1
+   return g2, nearRow
+
+def _RowEnvelope(g2, nearRow):
+   '''Second pass of the distance transform, over whole rows:  the lower envelope of the
+   parabolas (x - q)^2 + g2[q] along each row.  Returns a tuple (dist2, rows, cols).'''
+   nRows, nCols = g2.shape
+   # The envelope is kept as a stack per row (columns v, boundaries z), with the top of each
+   # stack cached in 1-D arrays
+   rowIdx = np.arange(nRows)
+   h = np.ascontiguousarray((g2 + np.arange(nCols)[None, :] ** 2).T) # h[q] = g2[:, q] + q^2, by column
+   v = np.zeros((nRows, nCols), dtype = np.int64) # Columns of the parabolas in the envelope
+   z = np.full((nRows, nCols + 1), np.inf) # Boundaries between them
+   k = np.full(nRows, -1, dtype = np.int64) # Index of the top parabola; -1 if none yet
+   topV = np.zeros(nRows, dtype = np.int64)
+   topH = np.zeros(nRows, dtype = np.float64)
+   topZ = np.zeros(nRows, dtype = np.float64)
+   for q in range(nCols):
+      hq = h[q]
+      live = np.isfinite(hq)
+      first = live & (k < 0)
+      if first.any():
+         k[first] = 0
+         v[first, 0] = q
+         z[first, 0] = -np.inf
+         topV[first], topH[first], topZ[first] = q, hq[first], -np.inf
+         live &= ~first
+      rows = np.nonzero(live)[0]
+      while rows.size:
+         s = (hq[rows] - topH[rows]) / (2.0 * (q - topV[rows]))
+         drop = s <= topZ[rows]
+         if drop.any():
+            # The new parabola hides the top one entirely:  pop it and try again
+            d = rows[drop]
+            k[d] -= 1
+            topV[d] = v[d, k[d]]
+            topH[d] = h[topV[d], d]
+            topZ[d] = z[d, k[d]]
+            keep, s = rows[~drop], s[~drop]
+            rows = d
+         else:
+            keep, rows = rows, rows[:0]
+         k[keep] += 1
+         v[keep, k[keep]] = q
+         z[keep, k[keep]] = s
+         topV[keep], topH[keep], topZ[keep] = q, hq[keep], s
+   has = k >= 0
+   z[rowIdx[has], k[has] + 1] = np.inf
+
+   # Parabola j of a row is lowest over the columns q with z[j] < q <= z[j + 1]
+   dist2 = np.full((nRows, nCols), np.inf)
+   rows = np.full((nRows, nCols), -1, dtype = np.int64)
+   cols = np.full((nRows, nCols), -1, dtype = np.int64)
+   if has.any():
+      inEnvelope = np.arange(nCols)[None, :] <= k[has, None]
+      edges = np.floor(np.clip(z[has], -1, nCols - 1))
+      counts = (edges[:, 1:] - edges[:, :-1]).astype(np.int64)
+      vq = np.repeat(v[has][inEnvelope], counts[inEnvelope]).reshape(-1, nCols)
+      r = rowIdx[has][:, None]
+      dist2[has] = (np.arange(nCols)[None, :] - vq) ** 2 + g2[r, vq]
+      rows[has] = nearRow[r, vq]
+      cols[has] = vq
+   return dist2, rows, cols
+
+def NearestValid(valid, rowsWanted = None):
+   '''Exact Euclidean distance transform of a boolean array:  for every cell, the squared
+   distance (in cells) to the nearest True cell, and that cell's row and column.  Uses the
+   two-pass algorithm of Felzenszwalb and Huttenlocher (2012):  nearest along each column,
+   then the lower envelope of parabolas along each row, with the work vectorized across
+   columns and rows respectively.  Cells with no True cell anywhere get an infinite
+   distance and indices of -1.  If rowsWanted (row numbers) is given, the second pass is
+   only run on those rows, and the others are left infinite.  Returns a tuple (dist2,
+   rows, cols).'''
+   valid = np.asarray(valid, dtype = bool)
+   g2, nearRow = _ColumnNearest(valid)
+   if rowsWanted is None:
+      return _RowEnvelope(g2, nearRow)
+   wanted = np.unique(np.asarray(rowsWanted, dtype = np.int64))
+   full = (np.full(valid.shape, np.inf), np.full(valid.shape, -1, dtype = np.int64),
+           np.full(valid.shape, -1, dtype = np.int64))
+   for out, part in zip(full, _RowEnvelope(g2[wanted], nearRow[wanted])):
+      out[wanted] = part
+   return full
+
+def NearestValidAt(valid, ys, xs):
+   '''The distance transform of NearestValid, for the given cells only.  Each cell's row is
+   searched outward from the cell, a column on each side at a time, for all cells at once;
+   a cell is done as soon as no column farther out could be nearer, so the work follows
+   the distance to the nearest True cell rather than the width of the array.  Once the
+   cells left would cost more to search than the lower envelope of their rows (in wide
+   gaps), they are finished with the envelope instead.  Returns a tuple (dist2, rows, cols)
+   of 1-D arrays, one entry per cell.'''
+   valid = np.asarray(valid, dtype = bool)
+   nRows, nCols = valid.shape
+   g2, nearRow = _ColumnNearest(valid)
+   ys = np.asarray(ys, dtype = np.int64)
+   xs = np.asarray(xs, dtype = np.int64)
+   dist2 = g2[ys, xs]
+   cols = xs.copy()
+   # The cells still searching, with their best distance and column so far
+   idx = np.nonzero(dist2 > 0)[0]
+   ay, ax, ad, ac = ys[idx], xs[idx], dist2[idx], cols[idx]
+   flat = g2.ravel()
+   o = 0
+   while idx.size:
+      # Cells still searching at o will likely need o more columns; stop when that outweighs the envelope
+      if o > 0 and idx.size * o > np.count_nonzero(np.bincount(ay, minlength = nRows)) * nCols:
+         break
+      o += 1
+      for side in (-o, o):
+         q = ax + side
+         d2 = o * o + flat[ay * nCols + np.clip(q, 0, nCols - 1)]
+         d2[(q < 0) | (q >= nCols)] = np.inf
+         # A column on the left is the leftmost yet, so it wins ties, as in the envelope
+         better = d2 <= ad if side < 0 else d2 < ad
+         ad = np.where(better, d2, ad)
+         ac = np.where(better, q, ac)
+      # Columns farther than o can be no nearer than (o + 1)^2; equal ones may still be farther left
+      done = ad < (o + 1) ** 2
+      dist2[idx[done]] = ad[done]
+      cols[idx[done]] = ac[done]
+      left = ~done
+      idx, ay, ax, ad, ac = idx[left], ay[left], ax[left], ad[left], ac[left]
+   if idx.size:
+      rowsLeft = np.unique(ay)
+      envDist2, envRows, envCols = _RowEnvelope(g2[rowsLeft], nearRow[rowsLeft])
+      at = (np.searchsorted(rowsLeft, ay), ax)
+      dist2[idx] = envDist2[at]
+      cols[idx] = envCols[at]
+   found = np.isfinite(dist2)
+   rows = np.where(found, nearRow[ys, np.where(found, cols, 0)], -1)
+   cols[~found] = -1
+   return dist2, rows, cols
+
+def FillNoAspectNearest(beers, region = None, k = 1, power = 2.0):
+   '''Fills NoAspect (-1) cells with the value of the nearest valid Beers aspect cell, by
+   exact Euclidean distance, however far away it is.  The distance transform searches out
+   from the cells to fill (NearestValidAt), so narrow gaps are cheap, and in wide ones the
+   work is at most linear in the rows holding them, so no radius limit is needed.
+
+   With k > 1, each cell instead gets the inverse-distance-weighted mean (weights
+   1 / distance^power) of the k nearest of the candidate cells found by the distance
+   transform for the cell and its eight neighbors.  This is a close approximation of the
+   true k nearest that keeps the cost linear.
+
+   Region is as in FillNoAspect.  Returns a tuple (filled, radius, limitReached), where
+   radius is the largest distance to a nearest valid cell, rounded up, and limitReached is
+   True only if there were no valid cells at all, in which case the neutral value of 1 is
+   imposed.'''
+   src = np.asarray(beers, dtype = np.float32)
+   filled = src.copy()
+   if region is None:
+      ys, xs = np.nonzero(src == NOASPECT)
+   else:
+      rows, cols = region
+      ys, xs = np.nonzero(src[rows, cols] == NOASPECT)
+      ys += rows.start or 0
+      xs += cols.start or 0
+   if ys.size == 0:
+      return filled, 0, False
+   valid = ~np.isnan(src) & (src != NOASPECT)
+   if not valid.any():
+      filled[ys, xs] = 1.0
+      return filled, 0, True
+
+   if k <= 1:
+      dist2, nearRows, nearCols = NearestValidAt(valid, ys, xs)
+      radius = int(np.ceil(np.sqrt(dist2.max())))
+      filled[ys, xs] = src[nearRows, nearCols]
+      return filled, radius, False
+
+   # Candidates:  the nearest valid cells of the target and of its eight neighbors, found once
+   # for each distinct cell
+   nRows, nCols = src.shape
+   nbrs = list()
+   for dy in (-1, 0, 1):
+      for dx in (-1, 0, 1):
+         nbrs.append(np.clip(ys + dy, 0, nRows - 1) * nCols + np.clip(xs + dx, 0, nCols - 1))
+   nbrs = np.column_stack(nbrs)
+   cells, at = np.unique(nbrs, return_inverse = True)
+   at = at.reshape(nbrs.shape)
+   dist2, nearRows, nearCols = NearestValidAt(valid, cells // nCols, cells % nCols)
+   radius = int(np.ceil(np.sqrt(dist2[at[:, 4]].max()))) # Column 4 is the target itself
+   cand = (nearRows * nCols + nearCols)[at]
+   # Linear indices of the candidate cells, one row per target, sorted so that repeats are adjacent
+   cand = np.sort(cand, axis = 1)
+   cy, cx = cand // nCols, cand % nCols
+   d2 = (cy - ys[:, None]).astype(np.float64) ** 2 + (cx - xs[:, None]) ** 2
+   repeat = np.zeros(cand.shape, dtype = bool)
+   repeat[:, 1:] = cand[:, 1:] == cand[:, :-1]
+   d2[repeat] = np.inf
+   order = np.argsort(d2, axis = 1, kind = 'mergesort')[:, :int(k)]
+   cand = np.take_along_axis(cand, order, axis = 1)
+   d2 = np.take_along_axis(d2, order, axis = 1)
+   weights = np.where(np.isinf(d2), 0.0, d2 ** (-power / 2.0))
+   values = src.ravel()[cand].astype(np.float64)
+   filled[ys, xs] = ((weights * values).sum(axis = 1) / weights.sum(axis = 1)).astype(np.float32)
+   return filled, radius, False
+
+FILL_MODES = ('RADIUS', 'NEAREST')
+
+def BeersAspectUnit(dem, cellSize, nLimit, nodata = None, burn = None, region = None, fillMode = 'RADIUS', fillK = 1):
+   '''Runs the full per-unit workflow on arrays:  Beers aspect, burn-in of water features,
+   and NoAspect gap-filling (restricted to region, if given), either by expanding radius up
+   to nLimit (RADIUS) or from the nearest valid cells (NEAREST, blending fillK of them).
+   Returns a tuple (beers, limitReached); units for which limitReached is True belong on the
+   LimitList.'''
+   beers = BeersAspect(dem, cellSize, nodata)
+   if burn is not None:
+      beers = BurnBeers(beers, burn)
+   if fillMode == 'NEAREST':
+      beers, radius, limitReached = FillNoAspectNearest(beers, region, fillK)
+   else:
+      beers, radius, limitReached = FillNoAspect(beers, nLimit, region)
+   return beers, limitReached
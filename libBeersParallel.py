@@ -0,0 +1,376 @@
+# ----------------------------------------------------------------------------------------
+# libBeersParallel.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Runs the Beers aspect workflow on many processing units, either serially or fanned out
+# to a pool of worker processes.  Each worker reads its own buffered window of the inputs
+# (with a halo of nLimit cells), runs the NumPy engine in libBeersAspect.py, and returns
+# the interior cells of its unit.  The parent process writes the results and collects the
+# FailList and LimitList for the processing log.
+
+# Usage Tips:
+# Nothing is written to a shared scratch workspace, so units do not collide with each
+# other.  Workers receive only paths and window definitions; see libRasterWindows.py for
+# the readers and writers.
+#     When called from a script tool, the script must guard its entry point with
+# "if __name__ == '__main__':" so that worker processes can import it safely.
+
+#     With a single process, RunUnits can instead pipeline the units (prefetch > 0):  a
+# background thread reads the inputs of the next units while the current one is computed,
+# and another writes the finished ones (see libPrefetch.py).  The overlap statistics are
+# written to the log.  Only readers and writers that declare themselves thread-safe (the
+# NumPy-based ones) are moved to the background, and the choice is made for each input:
+# with ArcRaster DEM and boundary rasters and a burn mask cache (libBurnMask.py), as
+# BeersAspect uses them, the burn windows are read ahead while the DEM and boundary
+# windows are read on the main thread just before each unit.  An ArcUnitWriter likewise
+# writes on the main thread, and a ChunkStoreWriter in the background.
+
+#     In NEAREST fill mode, NoAspect cells take the nearest valid values found within the
+# unit's buffered window, so nLimit sets only how far beyond the unit they are sought.
+
+#     Given a UnitManifest (libUnitManifest.py), units whose inputs are unchanged since they
+# were last completed are skipped.  The fingerprint covers the DEM, boundary and burn
+# windows, the unit's extent, nLimit and ENGINE_VERSION.
+
+# Dependencies:
+# libBeersAspect.py, libRasterWindows.py, libUnitManifest.py, libInstrument.py, libPrefetch.py,
+# libProcessPool.py
+# ----------------------------------------------------------------------------------------
+
+import os, sys, time, traceback
+import multiprocessing
+import numpy as np
+from libRasterWindows import Checkpointer
+from libUnitManifest import Fingerprint
+from libInstrument import StageTimer, FormatSeconds
+from libPrefetch import Prefetcher, BackgroundWriter, OverlapStats, ThreadSafe
+from libProcessPool import SetExecutable, ClosePool
+from libBeersAspect import BeersAspect, BurnBeers, FillNoAspect, FillNoAspectNearest, FILL_MODES, NOASPECT, ENGINE_VERSION
+
+def printMsg(msg):
+   '''Prints a message, and also passes it to the geoprocessor if arcpy is in use.'''
+   arcpy = sys.modules.get('arcpy')
+   if arcpy is not None:
+      arcpy.AddMessage(msg)
+   print(msg)
+
+def printWrng(msg):
+   '''Prints a warning, and also passes it to the geoprocessor if arcpy is in use.'''
+   arcpy = sys.modules.get('arcpy')
+   if arcpy is not None:
+      arcpy.AddWarning(msg)
+   print('Warning: %s' % msg)
+
+class UnitJob(object):
+   '''A processing unit:  the interior window to be output, and the buffered window to be
+   read.  Window is None if the unit does not overlap the grid (or the boundary).'''
+   def __init__(self, unitID, interior, window):
+      self.unitID = unitID
+      self.interior = interior
+      self.window = window
+      self.previous = None # Fingerprint from an earlier run, if any
+
+class UnitResult(object):
+   '''What a worker hands back for one unit.'''
+   def __init__(self, job):
+      self.unitID = job.unitID
+      self.interior = job.interior
+      self.block = None
+      self.limitReached = False
+      self.nBytes = 0
+      self.fingerprint = None
+      self.skipped = False
+      self.err = None
+      self.stages = list() # Timing records from libInstrument.StageTimer
+
+class UnitInputs(object):
+   '''Inputs shared by all units:  DEM, optional burn and boundary rasters (any reader from
+   libRasterWindows.py), the reference grid, the neighborhood limit, an optional
+   Checkpointer deciding which intermediates are persisted, and the NoAspect fill mode
+   (RADIUS or NEAREST, with fillK nearest values blended; see libBeersAspect.py).'''
+   def __init__(self, dem, grid, nLimit, burn = None, bnd = None, checkpoint = None, fillMode = 'RADIUS', fillK = 1):
+      self.dem = dem
+      self.grid = grid
+      self.nLimit = int(nLimit)
+      self.burn = burn
+      self.bnd = bnd
+      self.checkpoint = checkpoint or Checkpointer('NONE')
+      if fillMode not in FILL_MODES:
+         raise ValueError('Fill mode must be one of %s' % (FILL_MODES,))
+      self.fillMode = fillMode
+      self.fillK = int(fillK)
+
+def PlanUnitJobs(plan):
+   '''Builds a UnitJob for each unit of a unit plan (libUnitPlan.BuildUnitPlan, given the
+   DEM grid and a buffer of nLimit cells).  The window read is the one covering the unit's
+   buffered and clipped geometry, and the interior is the unit's own window within it;
+   interior cells beyond the boundary are masked anyway.  Units that do not overlap the
+   boundary get no window.'''
+   jobs = list()
+   for unit in plan:
+      interior = None
+      if unit.window is not None and unit.interior is not None:
+         interior = unit.interior.Intersect(unit.window)
+      if interior is None:
+         jobs.append(UnitJob(unit.unitID, None, None))
+      else:
+         jobs.append(UnitJob(unit.unitID, interior, unit.window))
+   return jobs
+
+def BuildUnitJobs(units, grid, nLimit):
+   '''Builds a UnitJob for each (unitID, extent) pair, with a halo of nLimit cells.  For
+   processing units read from a feature class, use PlanUnitJobs instead.'''
+   jobs = list()
+   for unitID, (xMin, yMin, xMax, yMax) in units:
+      interior = grid.WindowForExtent(xMin, yMin, xMax, yMax)
+      if interior is None:
+         jobs.append(UnitJob(unitID, None, None))
+      else:
+         jobs.append(UnitJob(unitID, interior, interior.Expand(int(nLimit), grid)))
+   return jobs
+
+INPUT_NAMES = ('dem', 'bnd', 'burn')
+
+class UnitData(object):
+   '''The buffered windows of the inputs read for one unit, and the timing records of the
+   read.'''
+   def __init__(self, dem = None, bnd = None, burn = None, stages = None):
+      self.dem = dem
+      self.bnd = bnd
+      self.burn = burn
+      self.stages = stages or list()
+
+def SplitInputs(inputs):
+   '''Returns two lists of input names (from INPUT_NAMES):  the inputs that are safe to
+   read on a background thread, and those that must be read on the main thread (see
+   libPrefetch.ThreadSafe).  Missing inputs are in neither.'''
+   present = [name for name in INPUT_NAMES if getattr(inputs, name) is not None]
+   background = [name for name in present if ThreadSafe(getattr(inputs, name))]
+   return background, [name for name in present if name not in background]
+
+def ReadUnit(job, inputs, timer = None, names = INPUT_NAMES, data = None):
+   '''Reads the buffered window of the named inputs for one unit (all of them by default),
+   into data if given.  Returns a UnitData.'''
+   if job.window is None:
+      raise ValueError('Unit %s does not overlap the DEM or the processing boundary' % job.unitID)
+   timer = timer if timer is not None else StageTimer()
+   data = data if data is not None else UnitData()
+   nRecords = len(timer.records)
+   with timer.Stage('read', unit = job.unitID):
+      for name in names:
+         source = getattr(inputs, name)
+         if source is None:
+            continue
+         if name == 'dem':
+            data.dem = source.Read(job.window, inputs.grid)
+         else:
+            setattr(data, name, source.ReadMask(job.window, inputs.grid))
+   data.stages.extend(timer.records[nRecords:])
+   return data
+
+def ProcessUnit(job, inputs, timer = None, data = None):
+   '''Reads the buffered window for one unit (unless its UnitData is given, already read)
+   and runs the Beers aspect workflow on it in memory, persisting intermediates only as the
+   checkpoint policy requires.  If the inputs match the job's previous fingerprint, the
+   unit is skipped.  Each stage is timed with a StageTimer (libInstrument.py), whose records
+   are returned on the result.  Returns a UnitResult.'''
+   if job.window is None:
+      raise ValueError('Unit %s does not overlap the DEM or the processing boundary' % job.unitID)
+   result = UnitResult(job)
+   timer = timer or StageTimer()
+   result.stages = timer.records
+   ckpt = inputs.checkpoint
+   bytesBefore = ckpt.bytesWritten
+   UnitID = job.unitID
+
+   if data is not None:
+      timer.Extend(data.stages) # Read ahead of time, outside the unit stage
+   with timer.Stage('unit', unit = UnitID):
+      if data is None:
+         data = ReadUnit(job, inputs, timer)
+      dem, bnd, burn = data.dem, data.bnd, data.burn
+      with timer.Stage('fingerprint'):
+         # The default fill mode adds nothing, so that manifests from before fill modes stay current
+         mode = () if inputs.fillMode == 'RADIUS' else (inputs.fillMode, inputs.fillK)
+         result.fingerprint = Fingerprint(dem, bnd, burn, job.interior.Tuple(), job.window.Tuple(),
+                                          inputs.nLimit, ENGINE_VERSION, *mode)
+      if result.fingerprint == job.previous:
+         result.skipped = True
+         return result
+
+      with timer.Stage('aspect'):
+         nodata = np.isnan(dem)
+         if bnd is not None:
+            nodata |= ~bnd
+         beers = BeersAspect(dem, inputs.grid.cellSize, nodata)
+         ckpt.Save('InitBeers_%s' % UnitID, beers, 'STAGE')
+      with timer.Stage('burn'):
+         if burn is not None:
+            beers = BurnBeers(beers, burn)
+            ckpt.Save('BurnBeers_%s' % UnitID, beers, 'STAGE')
+         if ckpt.Wants('STAGE'):
+            ckpt.Save('InitNoAspect_%s' % UnitID, (beers == NOASPECT).astype(np.uint8), 'STAGE')
+
+      # Each radius is timed from the end of the previous callback, so that iteration
+      # checkpoints are not counted against the next radius
+      mark = [time.time(), os.times()]
+      def saveIteration(radius, filled):
+         now = os.times()
+         timer.Record('fill radius', time.time() - mark[0],
+                      (now[0] + now[1]) - (mark[1][0] + mark[1][1]), radius = radius)
+         ckpt.Save('Beers_%s_%s' % (UnitID, radius), filled, 'ITERATION')
+         mark[:] = [time.time(), os.times()]
+
+      with timer.Stage('fill'):
+         region = job.interior.RelativeTo(job.window)
+         if inputs.fillMode == 'NEAREST':
+            beers, radius, result.limitReached = FillNoAspectNearest(beers, region, inputs.fillK)
+         else:
+            mark[:] = [time.time(), os.times()]
+            beers, radius, result.limitReached = FillNoAspect(beers, inputs.nLimit, region, saveIteration)
+      ckpt.Save('rdBeers_%s' % UnitID, beers, 'FINAL')
+      result.block = beers[region]
+   result.nBytes = ckpt.bytesWritten - bytesBefore
+   return result
+
+def _RunJob(task, data = None, err = None, names = ()):
+   '''Worker entry point.  Errors are returned rather than raised, so one bad unit does not
+   bring down the pool.  Data and err are the prefetched inputs and read error, if any;
+   the inputs named in names are then read here, on the calling thread.'''
+   job, inputs = task
+   try:
+      if err is not None:
+         raise IOError(err)
+      if data is not None and names:
+         data = ReadUnit(job, inputs, names = names, data = data)
+      return ProcessUnit(job, inputs, data = data)
+   except Exception:
+      result = UnitResult(job)
+      result.err = err or traceback.format_exc()
+      return result
+
+def RunUnits(jobs, inputs, writer, nWorkers = 1, Log = None, manifest = None, timer = None, prefetch = 0):
+   '''Processes all jobs, in a pool of nWorkers processes if nWorkers > 1, and writes each
+   unit's interior cells with writer.  Units are written and logged in the order they
+   finish, along with the bytes written for each (checkpoints plus output).  With one
+   process and prefetch > 0, reading and writing run on background threads, up to prefetch
+   units ahead of (and behind) the unit being computed:  each input that is thread-safe
+   (see libPrefetch.ThreadSafe) is read in the background, and the others are read on the
+   main thread just before the unit is computed; the writer likewise.  If a UnitManifest is given,
+   unchanged units are skipped and finished units are recorded in it.  If a StageTimer is
+   given, the workers' timing records are added to it, along with the time taken to write
+   each unit.  If the run fails or is interrupted, the worker pool is stopped at once rather
+   than left to finish the remaining units.  Returns a tuple (FailList, LimitList).'''
+   FailList = list()
+   LimitList = list()
+   timer = timer if timer is not None else StageTimer()
+   if manifest is not None:
+      for job in jobs:
+         job.previous = manifest.Fingerprint(job.unitID)
+   tasks = [(job, inputs) for job in jobs]
+   pool = stats = None
+   background = False # Whether writes go to a background thread
+   if nWorkers > 1:
+      SetExecutable()
+      pool = multiprocessing.Pool(nWorkers)
+      results = pool.imap_unordered(_RunJob, tasks)
+   elif prefetch:
+      stats = OverlapStats()
+      ahead, onMain = SplitInputs(inputs)
+      if ahead:
+         reads = Prefetcher(tasks, lambda task: ReadUnit(task[0], task[1], names = ahead), prefetch, stats)
+         results = (_RunJob(task, data, err, onMain) for task, data, err in reads)
+      else:
+         results = (_RunJob(task) for task in tasks)
+      if onMain:
+         printMsg('Read through arcpy, so on the main thread:  %s' % ', '.join(onMain))
+      if ThreadSafe(writer):
+         writer = BackgroundWriter(writer, prefetch, stats)
+         background = True
+      else:
+         printMsg('Output is written through arcpy, so it is written on the main thread')
+   else:
+      results = (_RunJob(task) for task in tasks)
+
+   counts = {'bytes': 0, 'skipped': 0}
+   pending = dict() # Results waiting for a background write, by key
+   def Finish(result):
+      '''Logs a unit once it is written, and records it in FailList, LimitList and the
+      manifest.'''
+      unitID = result.unitID
+      counts['bytes'] += result.nBytes
+      if Log is not None:
+         Log.write('Processing unit: %s\n' % unitID)
+         for record in result.stages:
+            if record['stage'] == 'unit':
+               Log.write('   Elapsed time: %s\n' % FormatSeconds(record['wall']))
+         Log.write('   Bytes written: %s\n' % result.nBytes)
+      if result.err is not None:
+         printWrng('Unable to process unit %s' % unitID)
+         printWrng(result.err)
+         FailList.append(unitID)
+         return
+      printMsg('Finished unit %s' % unitID)
+      if result.limitReached:
+         printWrng('Neighborhood size limit has been reached for %s.' % unitID)
+         LimitList.append(unitID)
+      if manifest is not None:
+         manifest.Record(unitID, result.fingerprint, limitReached = bool(result.limitReached))
+
+   def FinishWritten(done):
+      for key, nBytes, err, seconds in done:
+         result = pending.pop(key)
+         result.nBytes += nBytes
+         result.err = err
+         timer.Record('write', seconds, unit = result.unitID)
+         Finish(result)
+
+   writer.Open()
+   failed = True
+   try:
+      for key, result in enumerate(results):
+         unitID = result.unitID
+         timer.Extend(result.stages)
+         if result.skipped:
+            counts['skipped'] += 1
+            if Log is not None:
+               Log.write('Skipped unit: %s (unchanged since last run)\n' % unitID)
+            if manifest.Get(unitID).get('limitReached'):
+               LimitList.append(unitID)
+            continue
+         if result.err is None and background:
+            # Written in the background, and finished once the write completes
+            pending[key] = result
+            writer.Submit(key, unitID, result.interior, result.block)
+            result.block = None
+            FinishWritten(writer.Completed())
+            continue
+         if result.err is None:
+            try:
+               with timer.Stage('write', unit = unitID):
+                  result.nBytes += writer.Write(unitID, result.interior, result.block)
+            except Exception:
+               result.err = traceback.format_exc()
+         Finish(result)
+      failed = False
+   finally:
+      if pool is not None:
+         ClosePool(pool, terminate = failed)
+      done = writer.Close()
+   if background:
+      FinishWritten(done)
+   if stats is not None:
+      stats.Stop()
+   nSkipped = counts['skipped']
+   if nSkipped:
+      printMsg('Skipped %s units that were unchanged since the last run' % nSkipped)
+   if Log is not None:
+      Log.write('Units skipped as unchanged: %s\n' % nSkipped)
+      Log.write('Total bytes written for all units: %s\n' % counts['bytes'])
+      if stats is not None:
+         Log.write(stats.Summary())
+   return FailList, LimitList
@@ -0,0 +1,118 @@
+# ----------------------------------------------------------------------------------------
+# libBeersStream.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Streams the Beers aspect workflow over a DEM too large to hold in memory.  The DEM is
+# read through a memory map in fixed-size tiles, each with a halo of nLimit + 1 cells, and
+# each tile's interior is written straight into a memory-mapped output file.  Peak memory
+# depends on the tile size, not the DEM size.
+
+# Usage Tips:
+# The halo covers both the 3x3 aspect kernel and the widest fill neighborhood, so tiled
+# output is identical to processing the whole DEM at once.
+#     The DEM and burn inputs are readers from libRasterWindows.py; NpyRaster and RawRaster
+# need no arcpy.  Output paths ending in .npy get a .npy header, anything else is written
+# as a headerless float32 file.  For compact output, pass a ChunkStoreWriter
+# (libChunkStore.py) for the range 0 to 2 instead of a path, ideally with tileSize a
+# multiple of its chunk size.  A writer that stores a fixed range of values (one with a
+# Range method, as ChunkStoreWriter has) must cover the range of its output, or a
+# ValueError is raised before anything is written.
+#     StreamTerrain does the same for any set of terrain derivatives (slope, aspect, Beers
+# aspect, hillshade, curvature), computing them all from one read of each tile with the
+# fused engine in libTerrain.py.  Its Beers aspect is the raw transform, with flat cells
+# still -1; it is not burned in or filled.  The range of each derivative is given by
+# libTerrain.DerivativeRange; curvature and percent-rise slope are unbounded, so they can
+# only go to float outputs.
+
+# Syntax:
+# StreamBeersAspect(NpyRaster(demPath, grid), outPath, nLimit, tileSize, burn)
+# StreamTerrain(NpyRaster(demPath, grid), {'slope': slopePath, 'hillshade': hsPath}, tileSize)
+# ----------------------------------------------------------------------------------------
+
+import numpy as np
+from libBeersAspect import BeersAspectUnit
+from libTerrain import TerrainEngine, DerivativeRange
+from libRasterWindows import Window, NpyMosaicWriter
+
+def TileWindows(grid, tileSize):
+   '''Yields non-overlapping square tiles covering the grid, in row-major order.'''
+   for r0 in range(0, grid.nRows, tileSize):
+      for c0 in range(0, grid.nCols, tileSize):
+         yield Window(r0, c0, min(tileSize, grid.nRows - r0), min(tileSize, grid.nCols - c0))
+
+def CheckOutput(outPath, valueRange, name = 'output'):
+   '''Raises a ValueError if outPath is a writer that stores a fixed range of values (one
+   with a Range method) not covering valueRange, the range of the values to be written
+   (None if unbounded).  Paths and other writers store any float32 value.'''
+   if not hasattr(outPath, 'Range'):
+      return
+   vmin, vmax = outPath.Range()
+   tolerance = getattr(outPath, 'maxError', 0.0)
+   if valueRange is None:
+      raise ValueError('%s is unbounded, so it cannot go to a writer that stores values from %s to %s' % (name, vmin, vmax))
+   if vmin > valueRange[0] + tolerance or vmax < valueRange[1] - tolerance:
+      raise ValueError('%s ranges from %s to %s, but its writer stores values from %s to %s' %
+                       ((name,) + tuple(valueRange) + (vmin, vmax)))
+
+def OpenOutput(outPath, grid):
+   '''Opens an output:  a writer, or a path for a float32 file on the grid (see
+   libRasterWindows.NpyMosaicWriter).  Returns the open writer.'''
+   if hasattr(outPath, 'Write'):
+      return outPath.Open()
+   return NpyMosaicWriter(outPath, grid).Open()
+
+def StreamBeersAspect(dem, outPath, nLimit, tileSize = 1024, burn = None):
+   '''Derives Beers aspect for the whole DEM tile by tile, writing to outPath, which may
+   also be a writer such as a libChunkStore.ChunkStoreWriter.  Returns the list of tile
+   windows in which the neighborhood limit was reached.'''
+   grid = dem.grid
+   halo = int(nLimit) + 1
+   CheckOutput(outPath, (0.0, 2.0), 'Beers aspect') # Filled, so without NoAspect cells
+   writer = OpenOutput(outPath, grid)
+   LimitList = list()
+   try:
+      for tile in TileWindows(grid, int(tileSize)):
+         window = tile.Expand(halo, grid)
+         block = dem.Read(window, grid)
+         burnMask = None
+         if burn is not None:
+            burnMask = burn.ReadMask(window, grid)
+         region = tile.RelativeTo(window)
+         beers, limitReached = BeersAspectUnit(block, grid.cellSize, nLimit, np.isnan(block), burnMask, region)
+         writer.Write(tile, tile, beers[region])
+         if limitReached:
+            LimitList.append(tile)
+   finally:
+      writer.Close()
+   return LimitList
+
+def StreamTerrain(dem, outputs, tileSize = 1024, **options):
+   '''Derives terrain derivatives for the whole DEM tile by tile, in a single pass per tile.
+   Outputs is a dictionary of {derivative: outPath or writer}, with derivatives from
+   libTerrain.DERIVATIVES; options are those of libTerrain.TerrainEngine (zFactor, azimuth,
+   altitude, slopeUnits).  A writer that stores a fixed range must cover the derivative's
+   range (see CheckOutput).  Returns the list of derivatives written.'''
+   grid = dem.grid
+   tileSize = int(tileSize)
+   halo = 1 # The 3x3 kernel needs one cell on each side
+   engine = TerrainEngine((tileSize + 2 * halo, tileSize + 2 * halo), grid.cellSize, list(outputs), **options)
+   for name, outPath in outputs.items():
+      CheckOutput(outPath, DerivativeRange(name, engine.slopeUnits), name)
+   writers = dict()
+   try:
+      for name, outPath in outputs.items():
+         writers[name] = OpenOutput(outPath, grid)
+      for tile in TileWindows(grid, tileSize):
+         window = tile.Expand(halo, grid)
+         region = tile.RelativeTo(window)
+         results = engine.Compute(dem.Read(window, grid))
+         for name, writer in writers.items():
+            writer.Write(tile, tile, results[name][region])
+   finally:
+      for writer in writers.values():
+         writer.Close()
+   return sorted(writers)
@@ -0,0 +1,182 @@
+# ----------------------------------------------------------------------------------------
+# libBurnMask.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# A cache of the hydrography burn raster as a bit-packed presence mask, 8 cells per byte,
+# stored as a memory-mappable .npy file on the DEM grid.  The burn-in step only needs to
+# know where water features are, so the burn raster is read once to build the cache, and
+# each unit then slices its window from the cache instead of reading the raster again.
+
+# Usage Tips:
+# The cache is a .npy file of uint8, one row per grid row, with the columns packed 8 to a
+# byte (most significant bit first, as np.packbits does).  A JSON sidecar (.json) records
+# the grid, the source raster and its modification stamp.
+#     OpenBurnMask keeps its caches in a folder, each named after a fingerprint of the
+# source, its modification stamp and the grid (BurnMask_<fingerprint>.npy).  A changed
+# source or a different grid gets a new file, so a cache is never rewritten while another
+# run has it memory-mapped.  Caches are built under a temporary name and renamed into
+# place, so concurrent runs never see a partial one; two runs building the same cache at
+# once just produce the same file twice.  Older caches of the same source and grid are
+# deleted where the system allows (not while another run on Windows has them open).  If
+# the source has no modification stamp (e.g. an SDE raster), each run builds its own
+# cache.
+#     BurnMaskCache is a reader like those in libRasterWindows.py (ReadMask), so it can be
+# used directly as the burn input to libBeersParallel and libBeersStream.  It holds only
+# paths, and opens its memory map in whichever process uses it.
+
+# Dependencies:
+# numpy, libRasterWindows.py, libDescribeCache.py (for the modification stamp)
+
+# Syntax:
+# burn = OpenBurnMask(ArcRaster(inBurn), cacheFolder, demGrid)
+# mask = burn.ReadMask(window)
+# ----------------------------------------------------------------------------------------
+
+import os, json, glob, uuid
+import numpy as np
+from libRasterWindows import Window, RasterGrid
+from libDescribeCache import DatasetStamp
+from libUnitManifest import Fingerprint
+
+CACHE_VERSION = 1
+_BITCOUNT = np.unpackbits(np.arange(256, dtype = np.uint8)[:, None], axis = 1).sum(axis = 1).astype(np.int64)
+
+def _GridTuple(grid):
+   return [grid.xMin, grid.yMax, grid.cellSize, grid.nRows, grid.nCols]
+
+def _Sidecar(cachePath):
+   return os.path.splitext(cachePath)[0] + '.json'
+
+def _Replace(temp, target):
+   '''Renames temp to target, replacing it.  Returns False if target could not be replaced
+   (on Windows, while another process has it open).'''
+   try:
+      if hasattr(os, 'replace'):
+         os.replace(temp, target)
+      else:
+         if os.name == 'nt' and os.path.exists(target):
+            os.remove(target) # Python 2 on Windows cannot rename over an existing file
+         os.rename(temp, target)
+      return True
+   except OSError:
+      os.remove(temp)
+      return False
+
+def BuildBurnMask(source, cachePath, grid, stripRows = 512):
+   '''Reads the burn raster (any reader with ReadMask) over the whole grid in strips of
+   stripRows rows, and writes the packed presence mask to cachePath, by way of a temporary
+   file.  Returns a BurnMaskCache.'''
+   nBytes = (grid.nCols + 7) // 8
+   temp = '%s.%d.%s.tmp' % (os.path.splitext(cachePath)[0], os.getpid(), uuid.uuid4().hex[:8])
+   packed = np.lib.format.open_memmap(temp + '.npy', mode = 'w+', dtype = np.uint8, shape = (grid.nRows, nBytes))
+   for row0 in range(0, grid.nRows, stripRows):
+      strip = Window(row0, 0, min(stripRows, grid.nRows - row0), grid.nCols)
+      packed[row0:row0 + strip.nRows] = np.packbits(source.ReadMask(strip, grid), axis = 1)
+   packed.flush()
+   del packed
+   info = {'version': CACHE_VERSION, 'grid': _GridTuple(grid),
+           'source': getattr(source, 'path', None), 'stamp': _SourceStamp(source)}
+   with open(temp + '.json', 'w') as f:
+      json.dump(info, f)
+   # The mask goes into place before its sidecar, so a cache with a sidecar is always complete
+   _Replace(temp + '.npy', cachePath)
+   _Replace(temp + '.json', _Sidecar(cachePath))
+   return BurnMaskCache(cachePath)
+
+def _SourceStamp(source):
+   path = getattr(source, 'path', None)
+   return DatasetStamp(path) if path else None
+
+def IsCurrent(source, cachePath, grid):
+   '''Returns True if the cache exists and was built from the source, unchanged since, on
+   the same grid.'''
+   sidecar = _Sidecar(cachePath)
+   if not (os.path.exists(cachePath) and os.path.exists(sidecar)):
+      return False
+   try:
+      with open(sidecar) as f:
+         info = json.load(f)
+   except ValueError:
+      return False
+   stamp = _SourceStamp(source)
+   return (info.get('version') == CACHE_VERSION and stamp is not None and info.get('stamp') == list(stamp)
+           and info.get('source') == getattr(source, 'path', None)
+           and np.allclose(info.get('grid'), _GridTuple(grid)))
+
+def CachePath(source, cacheFolder, grid):
+   '''Returns the cache file for the burn raster on the given grid:  a name in cacheFolder
+   fingerprinting the source, its modification stamp and the grid.'''
+   stamp = _SourceStamp(source)
+   key = Fingerprint(CACHE_VERSION, getattr(source, 'path', None), stamp, _GridTuple(grid),
+                     uuid.uuid4().hex if stamp is None else None)
+   return os.path.join(cacheFolder, 'BurnMask_%s.npy' % key[:16])
+
+def OpenBurnMask(source, cacheFolder, grid, stripRows = 512):
+   '''Returns a BurnMaskCache for the burn raster on the given grid, from cacheFolder,
+   building it first if there is no current cache.  Older caches of the same source and
+   grid are then deleted, where possible.'''
+   cachePath = CachePath(source, cacheFolder, grid)
+   if IsCurrent(source, cachePath, grid):
+      return BurnMaskCache(cachePath)
+   cache = BuildBurnMask(source, cachePath, grid, stripRows)
+   for old in glob.glob(os.path.join(cacheFolder, 'BurnMask_*.json')):
+      if old == _Sidecar(cachePath) or old.endswith('.tmp.json'):
+         continue # This cache, or one being built
+      try:
+         with open(old) as f:
+            info = json.load(f)
+         if info.get('source') == getattr(source, 'path', None) and np.allclose(info.get('grid'), _GridTuple(grid)):
+            os.remove(os.path.splitext(old)[0] + '.npy')
+            os.remove(old)
+      except (IOError, OSError, ValueError, TypeError):
+         pass # In use elsewhere, or not ours
+   return cache
+
+class BurnMaskCache(object):
+   '''Reads windows of a packed burn mask.'''
+   threadSafe = True # NumPy only, so it can be used from a background thread (see libPrefetch.py)
+   def __init__(self, cachePath):
+      self.path = cachePath
+      with open(_Sidecar(cachePath)) as f:
+         self.grid = RasterGrid(*json.load(f)['grid'])
+      self._packed = None
+
+   def __getstate__(self):
+      # Memory maps are not passed to worker processes; each opens its own
+      state = dict(self.__dict__)
+      state['_packed'] = None
+      return state
+
+   def Packed(self):
+      '''Returns the whole packed mask as a read-only memory map.'''
+      if self._packed is None:
+         self._packed = np.load(self.path, mmap_mode = 'r')
+      return self._packed
+
+   def ReadPacked(self, window):
+      '''Returns (bytes, offset):  a view of the packed rows and byte columns covering the
+      window, without copying, and the bit offset of the window's first column within
+      the first byte.'''
+      rows, cols = window.Slices()
+      b0 = window.col0 // 8
+      b1 = (window.col0 + window.nCols + 7) // 8
+      return self.Packed()[rows, b0:b1], window.col0 - 8 * b0
+
+   def ReadMask(self, window, grid = None):
+      '''Returns a boolean array that is True where the window has burn features.  Only the
+      bytes covering the window are read and unpacked.'''
+      packed, offset = self.ReadPacked(window)
+      bits = np.unpackbits(packed, axis = 1)
+      return bits[:, offset:offset + window.nCols].view(bool)
+
+   def Count(self, window = None):
+      '''Returns the number of burn cells in a window, or in the whole grid.'''
+      if window is None:
+         # Padding bits at the end of each row are zero, so whole bytes can be counted
+         packed = self.Packed()
+         return sum(int(_BITCOUNT[packed[r:r + 4096]].sum()) for r in range(0, packed.shape[0], 4096))
+      return int(np.count_nonzero(self.ReadMask(window)))
@@ -0,0 +1,272 @@
+# ----------------------------------------------------------------------------------------
+# libChunkStore.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# A compact output format for bounded rasters such as Beers aspect (0 to 2):  values are
+# quantized to uint16 or uint8 with a stated error bound, and stored as a folder of square,
+# zlib-compressed chunks, in the manner of a zarr array.  Any window can be read by
+# decompressing only the chunks it touches.
+
+# Usage Tips:
+# The store is a folder holding .meta.json (grid, chunk size, dtype, scale, offset and the
+# maximum quantization error) and one file per chunk, named <chunk row>.<chunk column>.
+# Chunks that were never written read as NoData.  A new store replaces only an existing
+# store (or an empty folder) at its path; any other folder is left alone and is an error.
+# The largest code of the dtype is reserved for NoData.
+#     The range of values (vmin, vmax) must be given when a store is created:  for Beers
+# aspect 0 to 2, for slope in degrees 0 to 90, and so on.  Writing a value outside the
+# range (by more than the quantization error) raises a ValueError rather than storing the
+# nearest end of the range.  For uint16 over 0-2 the maximum error is about 0.000015; for
+# uint8 about 0.004.  Give precision (the largest acceptable error) instead of dtype to get
+# the smallest dtype that meets it.
+#     Each chunk is written to a temporary file and renamed into place, so chunks can be
+# written concurrently by several processes, as long as no two write the same chunk.
+# Windows aligned to chunk edges touch only their own chunks; other windows update the
+# chunks they share with their neighbors, so those writes must not run concurrently (e.g.
+# write from the parent process, as libBeersParallel.RunUnits does).
+
+# Dependencies:
+# numpy
+
+# Syntax:
+# writer = ChunkStoreWriter(path, grid, 0.0, 2.0, precision = 0.001).Open(); writer.Write(id, window, block)
+# block = ChunkStore(path).Read(window)
+# ----------------------------------------------------------------------------------------
+
+import os, json, zlib, shutil
+from collections import OrderedDict
+import numpy as np
+from libRasterWindows import Window, RasterGrid
+
+_META = '.meta.json'
+_DTYPES = ('uint8', 'uint16')
+
+def Quantization(vmin, vmax, dtype = None, precision = None):
+   '''Returns (dtype, scale, maxError) for storing values in [vmin, vmax] as integer codes,
+   with the largest code reserved for NoData.  If precision is given, the smallest dtype
+   whose maximum error is within it is chosen; otherwise the default is uint16.  The error
+   includes the rounding of decoded values to float32.'''
+   if dtype is None and precision is None:
+      dtype = 'uint16'
+   if dtype is None:
+      for dtype in _DTYPES:
+         scale = (vmax - vmin) / float(np.iinfo(dtype).max - 1)
+         if _MaxError(vmin, vmax, scale) <= precision:
+            break
+      else:
+         raise ValueError('No integer type stores values with precision %s' % precision)
+   if dtype not in _DTYPES:
+      raise ValueError('dtype must be one of %s' % (_DTYPES,))
+   scale = (vmax - vmin) / float(np.iinfo(dtype).max - 1)
+   return dtype, scale, _MaxError(vmin, vmax, scale)
+
+def _MaxError(vmin, vmax, scale):
+   return scale / 2 + float(np.finfo(np.float32).eps) * max(abs(vmin), abs(vmax))
+
+def IsChunkStore(path):
+   '''Returns True if path is a folder holding chunk-store metadata.'''
+   try:
+      with open(os.path.join(path, _META)) as f:
+         meta = json.load(f)
+   except (IOError, OSError, ValueError):
+      return False
+   return isinstance(meta, dict) and 'chunkSize' in meta and 'grid' in meta
+
+class ChunkStore(object):
+   '''Reads windows from a chunk store.  Recently used chunks are kept decompressed, so
+   repeated reads of nearby windows are served from memory.'''
+   threadSafe = True # NumPy only, so it can be used from a background thread (see libPrefetch.py)
+   def __init__(self, path, cacheChunks = 64):
+      self.path = path
+      with open(os.path.join(path, _META)) as f:
+         self.meta = json.load(f)
+      self.grid = RasterGrid(*self.meta['grid'])
+      self.chunkSize = int(self.meta['chunkSize'])
+      self.dtype = np.dtype(self.meta['dtype'])
+      self.scale = float(self.meta['scale'])
+      self.offset = float(self.meta['offset'])
+      self.maxError = float(self.meta['maxError'])
+      self.nodataCode = np.iinfo(self.dtype).max
+      self.cacheChunks = cacheChunks
+      self._cache = OrderedDict()
+
+   def __getstate__(self):
+      state = dict(self.__dict__)
+      state['_cache'] = OrderedDict()
+      return state
+
+   def _ChunkPath(self, cr, cc):
+      return os.path.join(self.path, '%d.%d' % (cr, cc))
+
+   def _ChunkShape(self, cr, cc):
+      cs = self.chunkSize
+      return (min(cs, self.grid.nRows - cr * cs), min(cs, self.grid.nCols - cc * cs))
+
+   def ReadChunk(self, cr, cc):
+      '''Returns the integer codes of one chunk (read-only; all NoData if never written).'''
+      key = (cr, cc)
+      codes = self._cache.pop(key, None)
+      if codes is None:
+         shape = self._ChunkShape(cr, cc)
+         try:
+            with open(self._ChunkPath(cr, cc), 'rb') as f:
+               data = zlib.decompress(f.read())
+            codes = np.frombuffer(data, dtype = self.dtype).reshape(shape)
+         except (IOError, OSError):
+            codes = np.full(shape, self.nodataCode, dtype = self.dtype)
+            codes.flags.writeable = False
+      self._cache[key] = codes
+      while len(self._cache) > self.cacheChunks:
+         self._cache.popitem(last = False)
+      return codes
+
+   def _Chunks(self, window):
+      '''Yields (cr, cc, chunk slices, window slices) for each chunk a window touches.'''
+      cs = self.chunkSize
+      r1 = window.row0 + window.nRows
+      c1 = window.col0 + window.nCols
+      for cr in range(window.row0 // cs, (r1 - 1) // cs + 1):
+         for cc in range(window.col0 // cs, (c1 - 1) // cs + 1):
+            rr0, rr1 = max(window.row0, cr * cs), min(r1, (cr + 1) * cs)
+            cc0, cc1 = max(window.col0, cc * cs), min(c1, (cc + 1) * cs)
+            yield (cr, cc,
+                   (slice(rr0 - cr * cs, rr1 - cr * cs), slice(cc0 - cc * cs, cc1 - cc * cs)),
+                   (slice(rr0 - window.row0, rr1 - window.row0), slice(cc0 - window.col0, cc1 - window.col0)))
+
+   def ReadCodes(self, window):
+      '''Returns the integer codes for a window.'''
+      codes = np.empty((window.nRows, window.nCols), dtype = self.dtype)
+      for cr, cc, inChunk, inWindow in self._Chunks(window):
+         codes[inWindow] = self.ReadChunk(cr, cc)[inChunk]
+      return codes
+
+   def Decode(self, codes):
+      '''Converts integer codes to float32 values, with NaN for NoData.'''
+      values = (codes * self.scale + self.offset).astype(np.float32)
+      values[codes == self.nodataCode] = np.nan
+      return values
+
+   def Read(self, window, grid = None):
+      '''Returns a window as float32, with NaN in NoData cells.  The store is assumed to be
+      on the reference grid, as with NpyRaster.'''
+      return self.Decode(self.ReadCodes(window))
+
+   def ReadMask(self, window, grid = None):
+      '''Returns a boolean array that is True wherever the window has data.'''
+      return self.ReadCodes(window) != self.nodataCode
+
+   def Range(self):
+      '''Returns the range of values (vmin, vmax) the store can hold.'''
+      return (self.offset, self.offset + self.scale * (self.nodataCode - 1))
+
+   def ToArray(self):
+      '''Returns the whole raster as float32.'''
+      return self.Read(Window(0, 0, self.grid.nRows, self.grid.nCols))
+
+   def Size(self):
+      '''Returns the total size of the store on disk, in bytes.'''
+      return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
+
+class ChunkStoreWriter(ChunkStore):
+   '''Writes unit results into a chunk store, quantizing values in the range [vmin, vmax].
+   Has the same Open, Write and Close methods as the writers in libRasterWindows.py, so it
+   can be passed to RunUnits.  With append = True an existing store is updated rather than
+   replaced; it must have been created with the same grid and range.'''
+   def __init__(self, path, grid, vmin, vmax, chunkSize = 256, dtype = None, precision = None,
+                level = 6, append = False):
+      if not vmax > vmin:
+         raise ValueError('The range %s to %s is empty' % (vmin, vmax))
+      self.path = path
+      self.newGrid = grid
+      self.newChunkSize = int(chunkSize)
+      self.dtypeName, scale, maxError = Quantization(vmin, vmax, dtype, precision)
+      self.newMeta = {'grid': [grid.xMin, grid.yMax, grid.cellSize, grid.nRows, grid.nCols],
+                      'chunkSize': self.newChunkSize, 'dtype': self.dtypeName,
+                      'scale': scale, 'offset': float(vmin), 'maxError': maxError,
+                      'compressor': 'zlib', 'level': int(level)}
+      self.maxError = maxError
+      self.level = int(level)
+      self.append = append
+      self.cacheChunks = 64
+      self._cache = OrderedDict()
+
+   def Open(self):
+      metaPath = os.path.join(self.path, _META)
+      if self.append and os.path.exists(metaPath):
+         with open(metaPath) as f:
+            meta = json.load(f)
+         if not np.allclose(meta['grid'], self.newMeta['grid']):
+            raise ValueError('%s does not match the grid %s' % (self.path, self.newGrid))
+         if not np.allclose([meta['offset'], meta['scale']], [self.newMeta['offset'], self.newMeta['scale']]):
+            raise ValueError('%s was created for a different range of values' % self.path)
+      else:
+         if os.path.exists(self.path):
+            if not IsChunkStore(self.path) and (not os.path.isdir(self.path) or os.listdir(self.path)):
+               raise ValueError('%s exists and is not a chunk store; it will not be replaced' % self.path)
+            shutil.rmtree(self.path)
+         os.makedirs(self.path)
+         with open(metaPath, 'w') as f:
+            json.dump(self.newMeta, f, indent = 1)
+      ChunkStore.__init__(self, self.path, self.cacheChunks)
+      return self
+
+   def Range(self):
+      '''Returns the range of values (vmin, vmax) the store holds, as declared when the
+      writer was made (an existing store it appends to must match).'''
+      top = np.iinfo(self.dtypeName).max - 1
+      return (self.newMeta['offset'], self.newMeta['offset'] + self.newMeta['scale'] * top)
+
+   def Encode(self, values):
+      '''Converts values to integer codes, with NoData for NaN.  Raises a ValueError if any
+      value is outside the store's range by more than the quantization error.'''
+      top = self.nodataCode - 1
+      with np.errstate(invalid = 'ignore'):
+         codes = np.round((values - self.offset) / self.scale)
+         nOutside = np.count_nonzero((codes < 0) | (codes > top) | np.isinf(values))
+      if nOutside:
+         vmin, vmax = self.Range()
+         raise ValueError('%s values are outside the range %s to %s of %s' % (nOutside, vmin, vmax, self.path))
+      codes = np.clip(codes, 0, top) # NaN aside, codes are already in range
+      codes = np.where(np.isnan(values), self.nodataCode, codes)
+      return codes.astype(self.dtype)
+
+   def WriteChunk(self, cr, cc, codes):
+      '''Compresses and writes one chunk of codes, replacing it atomically.  Returns the
+      number of bytes written.'''
+      data = zlib.compress(np.ascontiguousarray(codes, dtype = self.dtype).tobytes(), self.level)
+      target = self._ChunkPath(cr, cc)
+      temp = '%s.%d.tmp' % (target, os.getpid())
+      with open(temp, 'wb') as f:
+         f.write(data)
+      if hasattr(os, 'replace'):
+         os.replace(temp, target)
+      else:
+         if os.name == 'nt' and os.path.exists(target):
+            os.remove(target) # Python 2 on Windows cannot rename over an existing file
+         os.rename(temp, target)
+      self._cache.pop((cr, cc), None)
+      return len(data)
+
+   def Write(self, unitID, window, block):
+      '''Writes a block of values; NaN cells leave what is already stored.  Returns the
+      number of bytes written.'''
+      codes = self.Encode(np.asarray(block, dtype = np.float32))
+      nBytes = 0
+      for cr, cc, inChunk, inWindow in self._Chunks(window):
+         part = codes[inWindow]
+         full = part.shape == self._ChunkShape(cr, cc)
+         if full and not np.any(part == self.nodataCode):
+            chunk = part
+         else:
+            chunk = np.array(self.ReadChunk(cr, cc))
+            chunk[inChunk] = np.where(part == self.nodataCode, chunk[inChunk], part)
+         nBytes += self.WriteChunk(cr, cc, chunk)
+      return nBytes
+
+   def Close(self):
+      self._cache.clear()
+      return self.path
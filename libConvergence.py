@@ -0,0 +1,128 @@
+# ----------------------------------------------------------------------------------------
+# libConvergence.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Array version of the WhileLoop.py recipe:  repeat a processing step until the raster
+# stops changing or the maximum number of iterations is reached.  Instead of recomputing
+# the whole raster on every pass, only the "frontier" - cells within reach of a cell that
+# changed on the previous pass - is recomputed.
+
+# Usage Tips:
+# The step function is called as step(current, ys, xs) and must return the new values for
+# the cells at rows ys and columns xs, computed only from the current array and only from
+# cells within nbrRadius of each cell (e.g. a 3x3 focal operation has nbrRadius = 1).  If
+# nothing within that reach changed, a cell's value cannot change either, which is what
+# makes it safe to skip.  Updates are simultaneous, as with raster algebra.
+#     Per-iteration change counts, numbers of cells evaluated and timings are kept on the
+# returned ConvergenceResult.  Nothing is written to disk unless a callback does it.
+
+# Syntax:
+# result = IterateToConvergence(inArray, FocalMeanStep(1), MaxIter = 10)
+# ----------------------------------------------------------------------------------------
+
+import time
+import numpy as np
+
+class ConvergenceResult(object):
+   '''Output of IterateToConvergence:  the final array, whether it converged, and for each
+   iteration the number of changed cells, the number of cells evaluated, and seconds taken.'''
+   def __init__(self, array):
+      self.array = array
+      self.converged = False
+      self.changes = list()
+      self.evaluated = list()
+      self.timings = list()
+
+   @property
+   def iterations(self):
+      return len(self.changes)
+
+   def Summary(self):
+      '''Returns a multi-line text summary, one line per iteration.'''
+      lines = ['Iteration %s: %s cells changed of %s evaluated (%.3f seconds)' % (i + 1, c, e, t)
+               for i, (c, e, t) in enumerate(zip(self.changes, self.evaluated, self.timings))]
+      status = 'Converged' if self.converged else 'Stopped at the iteration limit'
+      lines.append('%s after %s iterations' % (status, self.iterations))
+      return '\n'.join(lines)
+
+def DilateMask(mask, radius):
+   '''Grows a boolean mask by radius cells in every direction (a square neighborhood).'''
+   if radius <= 0:
+      return mask.copy()
+   grown = mask.copy()
+   # Grow along rows, then along columns; the square neighborhood is separable.
+   for step in range(1, radius + 1):
+      grown[step:, :] |= mask[:-step, :]
+      grown[:-step, :] |= mask[step:, :]
+   rows = grown.copy()
+   for step in range(1, radius + 1):
+      grown[:, step:] |= rows[:, :-step]
+      grown[:, :-step] |= rows[:, step:]
+   return grown
+
+def _Changed(old, new, tol):
+   '''Flags values that differ by more than tol.  NaN counts as equal to NaN.'''
+   if old.dtype.kind != 'f':
+      return np.abs(new - old) > tol if tol else new != old
+   with np.errstate(invalid = 'ignore'):
+      changed = np.abs(new - old) > tol
+   return changed | (np.isnan(old) != np.isnan(new))
+
+def IterateToConvergence(inArray, step, MaxIter = 10, nbrRadius = 1, tol = 0, callback = None):
+   '''Applies step repeatedly until no cells change (by more than tol) or MaxIter passes
+   have been run.  The first pass evaluates every cell; later passes evaluate only cells
+   within nbrRadius of a cell that changed.  If given, callback(i, array) is called after
+   each pass, e.g. to save the series.  Returns a ConvergenceResult.'''
+   current = np.array(inArray, copy = True)
+   result = ConvergenceResult(current)
+   ys, xs = np.nonzero(np.ones(current.shape, dtype = bool))
+   i = 1 # initialize an iteration counter
+   while i <= MaxIter:
+      t0 = time.time()
+      old = current[ys, xs]
+      new = np.asarray(step(current, ys, xs), dtype = current.dtype)
+      changed = _Changed(old, new, tol)
+      current[ys[changed], xs[changed]] = new[changed]
+      nChanged = int(np.count_nonzero(changed))
+
+      result.changes.append(nChanged)
+      result.evaluated.append(int(ys.size))
+      if callback is not None:
+         callback(i, current)
+      if nChanged == 0:
+         result.timings.append(time.time() - t0)
+         result.converged = True
+         break
+
+      # The next frontier is every cell that could see one of the changed cells
+      mask = np.zeros(current.shape, dtype = bool)
+      mask[ys[changed], xs[changed]] = True
+      ys, xs = np.nonzero(DilateMask(mask, nbrRadius))
+      result.timings.append(time.time() - t0)
+      i += 1 # increment the iteration counter by 1
+   return result
+
+def FocalMeanStep(radius = 1):
+   '''Returns a step function computing the mean of the square neighborhood of the given
+   radius around each cell, ignoring NaN and cells beyond the array edges.  A typical
+   smoothing step for IterateToConvergence (with nbrRadius = radius).'''
+   def step(current, ys, xs):
+      nRows, nCols = current.shape
+      total = np.zeros(ys.size, dtype = np.float64)
+      count = np.zeros(ys.size, dtype = np.int32)
+      for dy in range(-radius, radius + 1):
+         for dx in range(-radius, radius + 1):
+            r, c = ys + dy, xs + dx
+            inside = (r >= 0) & (r < nRows) & (c >= 0) & (c < nCols)
+            vals = np.full(ys.size, np.nan)
+            vals[inside] = current[r[inside], c[inside]]
+            ok = ~np.isnan(vals)
+            total[ok] += vals[ok]
+            count += ok
+      with np.errstate(invalid = 'ignore', divide = 'ignore'):
+         return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+   return step
@@ -0,0 +1,220 @@
+# ----------------------------------------------------------------------------------------
+# libDescribeCache.py
+# Version:  Python 2.7 / 3.x (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Memoized dataset metadata (Describe, field lists, raster properties) for Python toolbox
+# validation.  updateParameters and updateMessages run on every parameter edit, so calling
+# Describe on a network path there makes the tool dialog freeze on every keystroke.  With
+# this cache, repeated calls for the same unchanged dataset are answered from memory.
+
+# Usage Tips:
+# Entries are keyed by path and modification stamp, so an edited dataset is described again.
+# The stamp of a file geodatabase dataset covers the whole geodatabase, found by listing its
+# folder, so writing any dataset in it describes the others again too; the internal layout
+# of the geodatabase is undocumented, so it is not relied on to narrow this down.
+# Checking the stamp is itself a file system call, so within stampTTL seconds of the last
+# check an entry is trusted without looking at the disk at all.  Datasets without a stamp
+# (e.g. in .mdb or .sde geodatabases) are described again once stampTTL has passed; call
+# Invalidate(path) after writing one to see the change at once.  The cache holds at most
+# maxSize datasets, discarding the least recently used.
+#     Metadata comes from a provider:  ArcMetadataProvider (the default) uses arcpy, while
+# StandInProvider serves metadata registered in advance, for testing without arcpy.
+
+# Syntax:
+# info = CachedDescribe(path); fields = CachedFields(path)
+# cache = MetadataCache(StandInProvider({...}), maxSize = 64)
+# ----------------------------------------------------------------------------------------
+
+import os, time
+from collections import OrderedDict
+
+class DatasetInfo(object):
+   '''The metadata that validation code typically needs from Describe.'''
+   def __init__(self, path, dataType = None, spatialReference = None, extent = None, fields = None,
+                shapeType = None, cellSize = None, bandCount = None, width = None, height = None):
+      self.path = path
+      self.dataType = dataType
+      self.spatialReference = spatialReference # Name of the coordinate system
+      self.extent = extent # (XMin, YMin, XMax, YMax)
+      self.fields = fields or list() # [(name, type)]
+      self.shapeType = shapeType
+      self.cellSize = cellSize
+      self.bandCount = bandCount
+      self.width = width
+      self.height = height
+
+   def FieldNames(self):
+      return [name for name, fieldType in self.fields]
+
+   def __repr__(self):
+      return 'DatasetInfo(%r, %r)' % (self.path, self.dataType)
+
+class ArcMetadataProvider(object):
+   '''Gets metadata with arcpy, which is imported on first use.'''
+   def Exists(self, path):
+      import arcpy
+      return bool(arcpy.Exists(path))
+
+   def Describe(self, path):
+      import arcpy
+      d = arcpy.Describe(path)
+      sr = getattr(d, 'spatialReference', None)
+      ext = getattr(d, 'extent', None)
+      return DatasetInfo(path,
+                         dataType = d.dataType,
+                         spatialReference = sr.name if sr is not None else None,
+                         extent = (ext.XMin, ext.YMin, ext.XMax, ext.YMax) if ext is not None else None,
+                         fields = [(f.name, f.type) for f in getattr(d, 'fields', list())],
+                         shapeType = getattr(d, 'shapeType', None),
+                         cellSize = getattr(d, 'meanCellWidth', None),
+                         bandCount = getattr(d, 'bandCount', None),
+                         width = getattr(d, 'width', None),
+                         height = getattr(d, 'height', None))
+
+   def RasterProperty(self, path, name):
+      import arcpy
+      return arcpy.GetRasterProperties_management(path, name).getOutput(0)
+
+class StandInProvider(object):
+   '''Serves metadata registered in advance, in place of arcpy.  Datasets is a dictionary of
+   {path: DatasetInfo}; raster properties may be given as {path: {name: value}}.  Calls
+   counts how many times each method has been called, to check what the cache saves.'''
+   def __init__(self, datasets = None, rasterProperties = None):
+      self.datasets = dict(datasets or dict())
+      self.rasterProperties = dict(rasterProperties or dict())
+      self.calls = {'Exists': 0, 'Describe': 0, 'RasterProperty': 0}
+
+   def Exists(self, path):
+      self.calls['Exists'] += 1
+      return path in self.datasets
+
+   def Describe(self, path):
+      self.calls['Describe'] += 1
+      if path not in self.datasets:
+         raise IOError('"%s" does not exist or is not supported' % path)
+      return self.datasets[path]
+
+   def RasterProperty(self, path, name):
+      self.calls['RasterProperty'] += 1
+      return self.rasterProperties[path][name]
+
+def _FileStamp(paths):
+   '''Returns (latest modification time, total size) of the files that exist, or None if
+   none do.  The size catches rewrites within the resolution of the file times.'''
+   stats = [os.stat(p) for p in paths if os.path.isfile(p)]
+   if not stats:
+      return None
+   return (max(st.st_mtime for st in stats), sum(st.st_size for st in stats))
+
+def DatasetStamp(path):
+   '''Returns a modification stamp for a dataset:  for a file, the file and its sidecars; for
+   a folder-based dataset (e.g. an ESRI grid), the files in it; and for a dataset in a file
+   geodatabase, all of the geodatabase's files except its locks, so that any edit to the
+   geodatabase changes the stamp of every dataset in it.  Returns None if the dataset's
+   files cannot be found, including for datasets in personal (.mdb) and enterprise (.sde)
+   geodatabases, whose container does not change in step with their data.'''
+   if os.path.isfile(path):
+      base = os.path.splitext(path)[0]
+      return _FileStamp([path] + [base + ext for ext in ('.shp', '.shx', '.dbf', '.prj', '.aux.xml', '.tfw')])
+   if os.path.isdir(path) and not path.lower().endswith('.gdb'):
+      return _FileStamp([os.path.join(path, f) for f in os.listdir(path)]) or (os.path.getmtime(path), 0)
+   gdb = path
+   while gdb and not gdb.lower().endswith('.gdb'):
+      parent = os.path.dirname(gdb)
+      if parent == gdb:
+         return None
+      gdb = parent
+   if not gdb or not os.path.isdir(gdb):
+      return None
+   # Lock files come and go whenever the geodatabase is read, so they are left out
+   return _FileStamp([os.path.join(gdb, f) for f in os.listdir(gdb) if not f.lower().endswith('.lock')])
+
+class MetadataCache(object):
+   '''A bounded LRU cache of dataset metadata, keyed by path and modification stamp.'''
+   def __init__(self, provider = None, maxSize = 256, stampTTL = 2.0):
+      self.provider = provider or ArcMetadataProvider()
+      self.maxSize = maxSize
+      self.stampTTL = stampTTL
+      self._entries = OrderedDict() # path -> [stamp, time checked, {item: value}]
+      self.hits = 0
+      self.misses = 0
+
+   def _Entry(self, path):
+      '''Returns the cached items for a path, discarding them if the dataset has changed.'''
+      key = os.path.normcase(os.path.abspath(path)) if os.path.isabs(path) else path
+      now = time.time()
+      entry = self._entries.pop(key, None)
+      if entry is not None and now - entry[1] > self.stampTTL:
+         stamp = DatasetStamp(path)
+         if stamp is None or stamp != entry[0]:
+            entry = None
+         else:
+            entry[1] = now
+      if entry is None:
+         entry = [DatasetStamp(path), now, dict()]
+      self._entries[key] = entry # Most recently used goes to the end
+      while len(self._entries) > self.maxSize:
+         self._entries.popitem(last = False)
+      return entry[2]
+
+   def _Get(self, path, item, fetch):
+      items = self._Entry(path)
+      if item in items:
+         self.hits += 1
+      else:
+         self.misses += 1
+         items[item] = fetch()
+      return items[item]
+
+   def Exists(self, path):
+      '''Returns True if the dataset exists.'''
+      return self._Get(path, 'exists', lambda: self.provider.Exists(path))
+
+   def Describe(self, path):
+      '''Returns a DatasetInfo for the dataset.'''
+      return self._Get(path, 'describe', lambda: self.provider.Describe(path))
+
+   def Fields(self, path):
+      '''Returns a list of (name, type) pairs for the dataset's fields.'''
+      return self.Describe(path).fields
+
+   def RasterProperty(self, path, name):
+      '''Returns a raster property as given by GetRasterProperties (e.g. CELLSIZEX).'''
+      return self._Get(path, ('raster', name), lambda: self.provider.RasterProperty(path, name))
+
+   def Invalidate(self, path = None):
+      '''Forgets one dataset, or everything if no path is given.'''
+      if path is None:
+         self._entries.clear()
+      else:
+         key = os.path.normcase(os.path.abspath(path)) if os.path.isabs(path) else path
+         self._entries.pop(key, None)
+
+   def Stats(self):
+      return {'hits': self.hits, 'misses': self.misses, 'datasets': len(self._entries)}
+
+# A cache shared by all tools in the session, so that it survives between validation calls
+_default = None
+
+def DefaultCache():
+   '''Returns the session-wide MetadataCache, creating it on first use.'''
+   global _default
+   if _default is None:
+      _default = MetadataCache()
+   return _default
+
+def CachedExists(path):
+   return DefaultCache().Exists(path)
+
+def CachedDescribe(path):
+   return DefaultCache().Describe(path)
+
+def CachedFields(path):
+   return DefaultCache().Fields(path)
+
+def CachedRasterProperty(path, name):
+   return DefaultCache().RasterProperty(path, name)
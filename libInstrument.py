@@ -0,0 +1,238 @@
+# ----------------------------------------------------------------------------------------
+# libInstrument.py
+# Version:  Python 2.7 / 3.x
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Stage timing for long geoprocessing runs, building on GetElapsedTime from TimeStamp.py.
+# Named stages can be nested (e.g. unit -> clip -> aspect -> burn -> fill radius N), and for
+# each one the wall time, CPU time, peak memory (RSS) and bytes read and written by the
+# process are recorded.  Records can be written to a JSON-lines file, and summarized as text
+# to show which stages, units and radii take the most time.
+
+# Usage Tips:
+# Peak RSS is the high-water mark of the process at the end of the stage, so it never
+# decreases from one stage to the next; an increase points at the stage responsible.  Bytes
+# read and written come from the operating system's I/O counters (/proc/self/io on Linux,
+# GetProcessIoCounters on Windows) and are None where those are not available.
+#     Records are plain dictionaries, so a worker process can hand its records back to the
+# parent with its results, to be merged with Extend().
+
+# Syntax:
+# timer = StageTimer()
+# with timer.Stage('unit', unit = UnitID):
+#    with timer.Stage('aspect'): ...
+# timer.WriteJSONLines(path); Log.write(timer.Summary())
+# ----------------------------------------------------------------------------------------
+
+import os, sys, json, time
+from datetime import datetime
+from functools import wraps
+
+def GetElapsedTime (t1, t2):
+   """Gets the time elapsed between the start time (t1) and the finish time (t2)."""
+   delta = t2 - t1
+   (d, m, s) = (delta.days, delta.seconds//60, delta.seconds%60)
+   (h, m) = (m//60, m%60)
+   deltaString = '%s days, %s hours, %s minutes, %s seconds' % (str(d), str(h), str(m), str(s))
+   return deltaString
+
+def FormatSeconds(seconds):
+   '''Formats a number of seconds compactly, e.g. 0.250s, 12.4s, 3m 05s or 2h 04m.'''
+   if seconds < 10:
+      return '%.3fs' % seconds
+   if seconds < 60:
+      return '%.1fs' % seconds
+   m, s = divmod(int(round(seconds)), 60)
+   if m < 60:
+      return '%dm %02ds' % (m, s)
+   h, m = divmod(m, 60)
+   return '%dh %02dm' % (h, m)
+
+def PeakRSS():
+   '''Returns the peak resident memory of this process in bytes, or None if unknown.'''
+   try:
+      import resource
+      peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      return peak if sys.platform == 'darwin' else peak * 1024 # Kilobytes on Linux
+   except ImportError:
+      pass
+   try:
+      import ctypes
+      from ctypes import wintypes
+      class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+         _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                     ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                     ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                     ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                     ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+      counters = PROCESS_MEMORY_COUNTERS()
+      counters.cb = ctypes.sizeof(counters)
+      handle = ctypes.windll.kernel32.GetCurrentProcess()
+      if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+         return int(counters.PeakWorkingSetSize)
+   except Exception:
+      pass
+   return None
+
+def IOCounters():
+   '''Returns a tuple (bytesRead, bytesWritten) for this process so far, or (None, None)
+   if unknown.  Includes all file I/O, whether through Python or arcpy.'''
+   try:
+      with open('/proc/self/io') as f:
+         fields = dict(line.split(':') for line in f if ':' in line)
+      return int(fields['rchar']), int(fields['wchar'])
+   except (IOError, OSError, KeyError, ValueError):
+      pass
+   try:
+      import ctypes
+      class IO_COUNTERS(ctypes.Structure):
+         _fields_ = [(name, ctypes.c_ulonglong) for name in
+                     ('ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+                      'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+      counters = IO_COUNTERS()
+      handle = ctypes.windll.kernel32.GetCurrentProcess()
+      if ctypes.windll.kernel32.GetProcessIoCounters(handle, ctypes.byref(counters)):
+         return int(counters.ReadTransferCount), int(counters.WriteTransferCount)
+   except Exception:
+      pass
+   return None, None
+
+def _Delta(after, before):
+   if after is None or before is None:
+      return None
+   return after - before
+
+class _Stage(object):
+   '''Context manager for one stage; see StageTimer.Stage.'''
+   def __init__(self, timer, name, tags):
+      self.timer = timer
+      self.name = name
+      self.tags = tags
+
+   def __enter__(self):
+      self.timer._stack.append(self.name)
+      self.timer._tagStack.append(self.tags)
+      self.started = datetime.now()
+      self.wall0 = time.time()
+      self.cpu0 = _CPUTime()
+      self.read0, self.written0 = IOCounters()
+      return self
+
+   def __exit__(self, excType, excValue, tb):
+      read1, written1 = IOCounters()
+      record = {'stage': self.name,
+                'path': '/'.join(self.timer._stack),
+                'depth': len(self.timer._stack) - 1,
+                'started': self.started.strftime('%Y-%m-%d %H:%M:%S'),
+                'wall': time.time() - self.wall0,
+                'cpu': _CPUTime() - self.cpu0,
+                'peakRSS': PeakRSS(),
+                'bytesRead': _Delta(read1, self.read0),
+                'bytesWritten': _Delta(written1, self.written0),
+                'failed': excType is not None}
+      record.update(self.timer._Tags())
+      record.update(self.tags)
+      self.timer._stack.pop()
+      self.timer._tagStack.pop()
+      self.timer.records.append(record)
+      return False
+
+def _CPUTime():
+   '''CPU time of this process (user + system), in seconds.'''
+   times = os.times()
+   return times[0] + times[1]
+
+class StageTimer(object):
+   '''Collects timing records for named, nested stages.'''
+   def __init__(self):
+      self.records = list()
+      self._stack = list()
+      self._tagStack = list()
+
+   def _Tags(self):
+      tags = dict()
+      for t in self._tagStack:
+         tags.update(t)
+      return tags
+
+   def Stage(self, name, **tags):
+      '''Returns a context manager timing a stage.  Tags (e.g. unit = UnitID, radius = 3)
+      are stored on the record, and inherited by stages nested inside it.'''
+      return _Stage(self, name, tags)
+
+   def Timed(self, name = None):
+      '''Decorator timing every call of a function as a stage, named after the function
+      unless a name is given.'''
+      def decorate(func):
+         @wraps(func)
+         def wrapper(*args, **kwargs):
+            with self.Stage(name or func.__name__):
+               return func(*args, **kwargs)
+         return wrapper
+      return decorate
+
+   def Record(self, name, wall, cpu = None, **tags):
+      '''Adds a record for an interval measured elsewhere, e.g. between two callbacks, as a
+      stage nested in the current one.'''
+      record = {'stage': name,
+                'path': '/'.join(self._stack + [name]),
+                'depth': len(self._stack),
+                'started': None,
+                'wall': wall,
+                'cpu': cpu,
+                'peakRSS': PeakRSS(),
+                'bytesRead': None,
+                'bytesWritten': None,
+                'failed': False}
+      record.update(self._Tags())
+      record.update(tags)
+      self.records.append(record)
+      return record
+
+   def Extend(self, records):
+      '''Adds records collected elsewhere (e.g. by a worker process).'''
+      self.records.extend(records)
+
+   def WriteJSONLines(self, path, append = True):
+      '''Writes the records to a JSON-lines file, one record per line.'''
+      with open(path, 'a' if append else 'w') as f:
+         for record in self.records:
+            f.write(json.dumps(record, sort_keys = True) + '\n')
+
+   def Totals(self, key = 'stage'):
+      '''Returns a dictionary of {value: [count, wall, cpu]} summed over the records, grouped
+      by the given field (e.g. 'stage', 'unit' or 'radius').  Records without it are ignored.'''
+      totals = dict()
+      for record in self.records:
+         if record.get(key) is None:
+            continue
+         entry = totals.setdefault(record[key], [0, 0.0, 0.0])
+         entry[0] += 1
+         entry[1] += record['wall']
+         entry[2] += record['cpu'] or 0.0
+      return totals
+
+   def Summary(self, top = 10):
+      '''Returns a human-readable summary:  time by stage, and the slowest units and fill
+      radii (where those tags are used).'''
+      lines = ['Time by stage:']
+      stages = sorted(self.Totals('stage').items(), key = lambda kv: -kv[1][1])
+      for name, (n, wall, cpu) in stages:
+         lines.append('   %-24s %6s calls  wall %10s  cpu %10s' % (name, n, FormatSeconds(wall), FormatSeconds(cpu)))
+      units = [r for r in self.records if r['stage'] == 'unit']
+      if units:
+         lines.append('Slowest units:')
+         for r in sorted(units, key = lambda r: -r['wall'])[:top]:
+            lines.append('   %-24s wall %10s  cpu %10s' % (r.get('unit'), FormatSeconds(r['wall']), FormatSeconds(r['cpu'] or 0.0)))
+      radii = self.Totals('radius')
+      if radii:
+         lines.append('Time by fill radius:')
+         for radius, (n, wall, cpu) in sorted(radii.items()):
+            lines.append('   radius %-17s %6s units  wall %10s' % (radius, n, FormatSeconds(wall)))
+      peaks = [r['peakRSS'] for r in self.records if r.get('peakRSS')]
+      if peaks:
+         lines.append('Peak memory: %.1f MB' % (max(peaks) / 1048576.0))
+      return '\n'.join(lines) + '\n'
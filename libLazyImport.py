@@ -0,0 +1,203 @@
+# ----------------------------------------------------------------------------------------
+# libLazyImport.py
+# Version:  Python 2.7 / 3.x (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Defers the cost of heavy imports and extension license checkouts until they are actually
+# needed, so that toolboxes open quickly and worker processes do not pay for modules they
+# never use.  Also measures what each import costs at startup.
+
+# Usage Tips:
+# Instead of importing at the top of a script or toolbox:
+#     import arcpy
+#     from arcpy.sa import *
+#     arcpy.CheckOutExtension("Spatial")
+# use:
+#     from libLazyImport import LazyImport, RequiresExtension
+#     arcpy = LazyImport('arcpy')
+#     sa = LazyImport('arcpy.sa')
+# and decorate the function doing the work (e.g. a tool's execute method) with
+# @RequiresExtension('Spatial'), then call sa.Aspect(...), sa.Con(...) and so on.  Nothing is
+# imported until the first attribute is used, and the license is checked out once, on the
+# first call of the decorated function.
+#     To find out where startup time goes:
+#     python libLazyImport.py arcpy numpy libBeersAspect
+#     python libLazyImport.py --toolbox MyTools.pyt
+
+# Syntax:
+# mod = LazyImport(name); CheckOutExtension('Spatial'); MeasureImportCost([names])
+# ----------------------------------------------------------------------------------------
+
+import os, sys, time, types, subprocess, importlib
+
+_importTimes = dict() # Module name -> seconds taken when first loaded through LazyImport
+_checkedOut = set() # Extensions checked out so far in this session
+
+class LazyModule(types.ModuleType):
+   '''Stands in for a module until one of its attributes is used, then imports it.'''
+   def __init__(self, name):
+      types.ModuleType.__init__(self, name)
+      self.__dict__['_lazyName'] = name
+      self.__dict__['_lazyModule'] = None
+
+   def _Load(self):
+      module = self.__dict__['_lazyModule']
+      if module is None:
+         name = self.__dict__['_lazyName']
+         t0 = time.time()
+         module = importlib.import_module(name)
+         _importTimes.setdefault(name, time.time() - t0)
+         self.__dict__['_lazyModule'] = module
+      return module
+
+   def __getattr__(self, attr):
+      return getattr(self._Load(), attr)
+
+   def __setattr__(self, attr, value):
+      setattr(self._Load(), attr, value)
+
+   def __dir__(self):
+      return dir(self._Load())
+
+   def __repr__(self):
+      state = 'loaded' if self.__dict__['_lazyModule'] is not None else 'not loaded'
+      return "<lazy module '%s' (%s)>" % (self.__dict__['_lazyName'], state)
+
+def LazyImport(name):
+   '''Returns the module if it is already imported, otherwise a LazyModule that imports it
+   on first use.'''
+   if name in sys.modules:
+      return sys.modules[name]
+   return LazyModule(name)
+
+def IsLoaded(module):
+   '''Returns True if a module (or LazyModule) has actually been imported.'''
+   if isinstance(module, LazyModule):
+      return module.__dict__['_lazyModule'] is not None
+   return True
+
+def ImportTimes():
+   '''Returns a dictionary of the seconds taken by each import done through LazyImport.'''
+   return dict(_importTimes)
+
+def CheckOutExtension(name = 'Spatial'):
+   '''Checks out an ArcGIS extension the first time it is called in a session; later calls
+   do nothing.  Raises RuntimeError if the extension is not available.'''
+   if name in _checkedOut:
+      return
+   import arcpy
+   status = arcpy.CheckOutExtension(name)
+   if status != 'CheckedOut':
+      raise RuntimeError('The %s extension license is not available (%s)' % (name, status))
+   _checkedOut.add(name)
+
+def RequiresExtension(*names):
+   '''Decorator that checks out the named ArcGIS extensions (default Spatial) before the
+   function first runs, rather than when the module is loaded.'''
+   names = names or ('Spatial',)
+   def decorate(func):
+      def wrapper(*args, **kwargs):
+         for name in names:
+            CheckOutExtension(name)
+         return func(*args, **kwargs)
+      wrapper.__name__ = func.__name__
+      wrapper.__doc__ = func.__doc__
+      return wrapper
+   return decorate
+
+# --- Startup time measurement -----------------------------------------------------------
+
+_TIMER_CODE = 'import time; t0 = time.time(); import %s; print(time.time() - t0)'
+
+def MeasureImportCost(names, python = None, top = 5):
+   '''Imports each module in a fresh interpreter, so that nothing is already loaded, and
+   returns a list of (name, seconds, heaviest) tuples sorted by cost.  Heaviest lists the
+   (sub-module, seconds) pairs that took longest, where the interpreter can report them
+   (Python 3.7 and later, assuming python is the same version as this one); otherwise it is
+   empty.  Seconds is None if the import failed.'''
+   python = python or sys.executable
+   flags = ['-X', 'importtime'] if sys.version_info >= (3, 7) else list()
+   cwd = os.path.dirname(os.path.abspath(__file__))
+   results = list()
+   for name in names:
+      proc = subprocess.Popen([python] + flags + ['-c', _TIMER_CODE % name], cwd = cwd,
+                              stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+      out, err = proc.communicate()
+      try:
+         seconds = float(out.decode('utf-8').strip().splitlines()[-1])
+      except (ValueError, IndexError):
+         seconds = None
+      results.append((name, seconds, _ParseImportTime(err.decode('utf-8', 'replace'), name, top)))
+   return sorted(results, key = lambda r: -(r[1] or 0))
+
+def _ParseImportTime(text, name, top):
+   '''Parses the output of python -X importtime into the top (module, seconds) pairs by
+   self time, among the modules imported on behalf of the named module (not those loaded
+   at interpreter startup).'''
+   rows = list()
+   for line in text.splitlines():
+      if not line.startswith('import time:') or 'self [us]' in line:
+         continue
+      try:
+         selfTime, cumulative, module = line[len('import time:'):].split('|')
+      except ValueError:
+         continue
+      rows.append((module.strip(), int(selfTime) / 1e6))
+      # Top-level entries have a single leading space; anything nested is indented further
+      if len(module) - len(module.lstrip()) <= 1:
+         if module.strip() == name:
+            return sorted(rows, key = lambda r: -r[1])[:top]
+         rows = list()
+   return list()
+
+def TimeToolboxLoad(pytPath):
+   '''Loads a Python toolbox the way ArcGIS does - import the .pyt, build the Toolbox, then
+   build each tool and its parameters - and returns a list of (step, seconds) pairs.'''
+   steps = list()
+   name = os.path.splitext(os.path.basename(pytPath))[0]
+   t0 = time.time()
+   if sys.version_info[0] < 3:
+      import imp
+      module = imp.load_source(name, pytPath)
+   else:
+      from importlib.machinery import SourceFileLoader
+      from importlib.util import spec_from_loader, module_from_spec
+      loader = SourceFileLoader(name, pytPath)
+      module = module_from_spec(spec_from_loader(name, loader))
+      loader.exec_module(module)
+   steps.append(('import %s' % os.path.basename(pytPath), time.time() - t0))
+   t0 = time.time()
+   toolbox = module.Toolbox()
+   steps.append(('Toolbox()', time.time() - t0))
+   for toolClass in toolbox.tools:
+      t0 = time.time()
+      tool = toolClass()
+      tool.getParameterInfo()
+      steps.append(('%s + getParameterInfo' % toolClass.__name__, time.time() - t0))
+   return steps
+
+def main():
+   import argparse
+   parser = argparse.ArgumentParser(description = 'Measure the startup cost of imports and toolboxes')
+   parser.add_argument('modules', nargs = '*', help = 'Modules to time, each in a fresh interpreter')
+   parser.add_argument('--toolbox', help = 'Python toolbox (.pyt) to time loading')
+   args = parser.parse_args()
+
+   for name, seconds, heaviest in MeasureImportCost(args.modules):
+      if seconds is None:
+         print('%-30s  import failed' % name)
+         continue
+      print('%-30s %8.3f s' % (name, seconds))
+      for module, t in heaviest:
+         print('   %-27s %8.3f s (self)' % (module, t))
+   if args.toolbox:
+      steps = TimeToolboxLoad(args.toolbox)
+      for step, seconds in steps:
+         print('%-40s %8.3f s' % (step, seconds))
+      print('%-40s %8.3f s' % ('Total', sum(s for step, s in steps)))
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,346 @@
+# ----------------------------------------------------------------------------------------
+# libNHDAttributes.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# A columnar store of the attributes of the combined NHD polygons (NHD_Polys):  FCode,
+# FType, SourceFC, area and bounding box, one row per feature, with an index from FCode to
+# rows.  Queries by subtype, source or extent return row ids (and ObjectIDs) from the
+# store alone, without a scan of the geodatabase or any geometry, so the burn-raster build
+# can select its features many times per run cheaply.
+
+# Usage Tips:
+# The store is a folder holding .meta.json and one memory-mappable .npy file per column.
+# FCode, FType and SourceFC are dictionary-encoded:  each column holds small integer codes,
+# and the distinct values are listed in .meta.json.  order.npy lists the rows grouped by
+# FCode, and offsets.npy gives where each FCode's rows start in it, so the rows of any set
+# of FCodes are a few slices.  bbox.npy holds (xMin, yMin, xMax, yMax) per row, and area.npy
+# the area in map units.
+#     NHDAttributeWriter is written during the merge:  it wraps the feature writer given to
+# StreamMerge (see libNHDMerge.py) and records each row as it passes through, so the store
+# costs no extra read of the data.  The ObjectIDs are those returned by the insert cursor;
+# for writers that return none (the SQLite one), rows are numbered from 1, as in a new
+# table.  BuildNHDAttributes makes a store from an existing feature class instead.
+#     Geometry may be arcpy geometry objects or WKB (as read with shapeToken = 'SHAPE@WKB'
+# or from SQLite).
+#     FTypes may be given by code or by name ('SwampMarsh', 'LakePond'; see NHD_SUBTYPES).
+# WhereClause turns rows into an ObjectID query for MakeFeatureLayer and the like.
+
+# Dependencies:
+# numpy; arcpy for BuildNHDAttributes only
+
+# Syntax:
+# writer = NHDAttributeWriter(storePath, featureWriter); StreamMerge(sources, writer)
+# store = NHDAttributeStore(storePath)
+# rows = store.Rows(ftypes = ['Reservoir', 'LakePond'], sources = ['NHDWaterbody'], bbox = extent)
+# arcpy.MakeFeatureLayer_management(nhdPolys, 'lyr', store.WhereClause(rows))
+# ----------------------------------------------------------------------------------------
+
+import os, json, struct, shutil
+import numpy as np
+from libNHDMerge import Field, NHD_SUBTYPES
+
+STORE_VERSION = 1
+_META = '.meta.json'
+_CATEGORIES = ('fcode', 'ftype', 'source')
+
+class NHDAttributeWriter(object):
+   '''Records FCode, FType, source, area and bounding box of each row passing through to
+   writer (Open(fields), Insert(rows), Close(), as in libNHDMerge.py), and writes the store
+   to path on Close.  writer may be None to build a store only.  Abort closes the writer
+   without writing the store, leaving any existing store as it was.'''
+   def __init__(self, path, writer = None, fcodeField = 'FCode', ftypeField = 'FType', sourceField = 'SourceFC'):
+      self.path = path
+      self.writer = writer
+      self.names = (fcodeField, ftypeField, sourceField)
+      self._positions = None
+
+   def Open(self, fields):
+      if self.writer is not None:
+         self.writer.Open(fields)
+      index = dict((f.name.lower(), i) for i, f in enumerate(fields))
+      self._positions = [index.get(name.lower()) for name in self.names]
+      self._values = dict((c, list()) for c in _CATEGORIES)
+      self._codes = dict((c, dict()) for c in _CATEGORIES)
+      self._columns = dict((c, list()) for c in _CATEGORIES)
+      self._oids = list()
+      self._stats = list()
+
+   def _Encode(self, category, value):
+      codes = self._codes[category]
+      code = codes.get(value)
+      if code is None:
+         code = codes[value] = len(codes)
+         self._values[category].append(value)
+      return code
+
+   def Insert(self, rows, oids = None):
+      '''Passes rows on to the writer and records them.  The ObjectIDs are those given,
+      else those the writer returns, else the next row numbers.'''
+      if self.writer is not None:
+         returned = self.writer.Insert(rows)
+         oids = oids or returned
+      if not oids or len(oids) != len(rows):
+         n = len(self._oids)
+         oids = range(n + 1, n + 1 + len(rows))
+      self._oids.extend(oids)
+      for row in rows:
+         for category, pos in zip(_CATEGORIES, self._positions):
+            self._columns[category].append(self._Encode(category, row[pos] if pos is not None else None))
+      self._stats.append(GeometryStats([row[-1] for row in rows]))
+      return oids
+
+   def Abort(self):
+      if self.writer is not None:
+         getattr(self.writer, 'Abort', self.writer.Close)()
+      self._positions = None
+
+   def Close(self):
+      if self.writer is not None:
+         self.writer.Close()
+      if self._positions is None:
+         return None
+      stats = np.concatenate(self._stats) if self._stats else np.zeros((0, 5))
+      columns = dict((c, np.array(self._columns[c], dtype = _CodeType(len(self._values[c]))))
+                     for c in _CATEGORIES)
+      WriteStore(self.path, columns, self._values, np.array(self._oids, dtype = np.int64), stats[:, :4], stats[:, 4])
+      self._positions = None
+      return self.path
+
+def _CodeType(nValues):
+   return np.uint8 if nValues <= 1 << 8 else np.uint16 if nValues <= 1 << 16 else np.uint32
+
+def IsAttributeStore(path):
+   '''Returns True if path is a folder holding NHD attribute store metadata.'''
+   try:
+      with open(os.path.join(path, _META)) as f:
+         meta = json.load(f)
+   except (IOError, OSError, ValueError):
+      return False
+   return isinstance(meta, dict) and 'fcodeFTypes' in meta and 'values' in meta
+
+def WriteStore(path, columns, values, oids, bbox, area):
+   '''Writes a store from the encoded category columns and their values (dicts by
+   category), the ObjectIDs, bounding boxes and areas.  The store is built in a temporary
+   folder and then moved to path, replacing an existing store (or empty folder) there; any
+   other folder at path is an error.'''
+   if os.path.exists(path) and not IsAttributeStore(path) and (not os.path.isdir(path) or os.listdir(path)):
+      raise ValueError('%s exists and is not an NHD attribute store; it will not be replaced' % path)
+   final, path = path, '%s.%d.tmp' % (path, os.getpid())
+   if os.path.exists(path):
+      shutil.rmtree(path)
+   os.makedirs(path)
+   # Group the rows by FCode (stable, so each group is in row order)
+   fcode = columns['fcode']
+   order = np.argsort(fcode, kind = 'mergesort').astype(np.int64)
+   offsets = np.zeros(len(values['fcode']) + 1, dtype = np.int64)
+   np.cumsum(np.bincount(fcode, minlength = len(values['fcode'])), out = offsets[1:])
+   arrays = {'oid': oids, 'bbox': bbox, 'area': area, 'order': order, 'offsets': offsets}
+   arrays.update(columns)
+   for name, array in arrays.items():
+      np.save(os.path.join(path, name + '.npy'), array)
+   # The FTypes found with each FCode, so that FType queries can use the index too
+   pairs = np.unique(fcode.astype(np.int64) * len(values['ftype']) + columns['ftype']) if len(oids) else []
+   fcodeFTypes = [list() for v in values['fcode']]
+   for pair in pairs:
+      fcodeFTypes[pair // len(values['ftype'])].append(int(pair % len(values['ftype'])))
+   meta = {'version': STORE_VERSION, 'nRows': int(len(oids)),
+           'values': dict((c, list(values[c])) for c in _CATEGORIES), 'fcodeFTypes': fcodeFTypes}
+   with open(os.path.join(path, _META), 'w') as f:
+      json.dump(meta, f, indent = 1)
+   if os.path.exists(final):
+      shutil.rmtree(final)
+   os.rename(path, final)
+
+def BuildNHDAttributes(fc, path, fcodeField = 'FCode', ftypeField = 'FType', sourceField = 'SourceFC'):
+   '''Builds the store for an existing NHD polygon feature class.  Returns the path.'''
+   import arcpy
+   names = [fcodeField, ftypeField, sourceField]
+   writer = NHDAttributeWriter(path, None, *names)
+   writer.Open([Field(name, None, None) for name in names])
+   with arcpy.da.SearchCursor(fc, ['OID@'] + names + ['SHAPE@']) as cursor:
+      batch = list()
+      for row in cursor:
+         batch.append(row)
+         if len(batch) >= 5000:
+            writer.Insert([r[1:] for r in batch], [r[0] for r in batch])
+            batch = list()
+      if batch:
+         writer.Insert([r[1:] for r in batch], [r[0] for r in batch])
+   return writer.Close()
+
+class NHDAttributeStore(object):
+   '''Reads a store and answers queries by FCode, FType, source and extent.  The columns
+   are memory-mapped numpy arrays:  fcode, ftype and source (codes), oid, area, and bbox.'''
+   def __init__(self, path):
+      self.path = path
+      with open(os.path.join(path, _META)) as f:
+         self.meta = json.load(f)
+      if self.meta.get('version') != STORE_VERSION:
+         raise ValueError('%s is not a version %s NHD attribute store' % (path, STORE_VERSION))
+      self.values = self.meta['values']
+      load = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode = 'r')
+      for name in _CATEGORIES + ('oid', 'area', 'bbox', 'order', 'offsets'):
+         setattr(self, name, load(name))
+
+   def __len__(self):
+      return int(self.meta['nRows'])
+
+   def Codes(self, category, values):
+      '''Returns the codes of the given values of a category (absent values are skipped).'''
+      index = dict((v, i) for i, v in enumerate(self.values[category]))
+      return np.array(sorted(index[v] for v in values if v in index), dtype = np.int64)
+
+   def Decode(self, category, rows):
+      '''Returns the values of a category for the given rows, as a list.'''
+      values = self.values[category]
+      return [values[code] for code in getattr(self, category)[rows]]
+
+   def FCodeRows(self, fcodes):
+      '''Returns the rows with any of the given FCodes, in row order, from the index.'''
+      return self._IndexRows(self.Codes('fcode', fcodes))
+
+   def _IndexRows(self, codes):
+      parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes]
+      if not parts:
+         return np.zeros(0, dtype = np.int64)
+      return np.sort(np.concatenate(parts))
+
+   def Rows(self, fcodes = None, ftypes = None, sources = None, bbox = None):
+      '''Returns the sorted row ids of the features matching all of the given criteria:
+      any of fcodes, any of ftypes (codes or subtype names), any of sources, and a bounding
+      box (xMin, yMin, xMax, yMax, or an object with XMin etc., such as an arcpy extent)
+      intersecting bbox.  Criteria left as None are not applied.'''
+      codes = self.Codes('fcode', fcodes) if fcodes is not None else None
+      if ftypes is not None:
+         ftypeCodes = self.Codes('ftype', [_FTypeCode(t) for t in ftypes])
+         # Only the FCodes found with these FTypes need to be looked at
+         wanted = set(ftypeCodes.tolist())
+         found = [c for c, seen in enumerate(self.meta['fcodeFTypes']) if wanted.intersection(seen)]
+         codes = np.array(found if codes is None else sorted(set(found).intersection(codes.tolist())), dtype = np.int64)
+      rows = self._IndexRows(codes) if codes is not None else np.arange(len(self), dtype = np.int64)
+      if ftypes is not None and rows.size:
+         rows = rows[np.isin(self.ftype[rows], ftypeCodes)]
+      if sources is not None and rows.size:
+         rows = rows[np.isin(self.source[rows], self.Codes('source', sources))]
+      if bbox is not None and rows.size:
+         xMin, yMin, xMax, yMax = _BBox(bbox)
+         b = self.bbox[rows]
+         rows = rows[(b[:, 0] <= xMax) & (b[:, 2] >= xMin) & (b[:, 1] <= yMax) & (b[:, 3] >= yMin)]
+      return rows
+
+   def ObjectIDs(self, rows):
+      return np.asarray(self.oid[rows])
+
+   def Extent(self, rows):
+      '''Returns the combined (xMin, yMin, xMax, yMax) of the given rows, or None.'''
+      b = self.bbox[rows]
+      b = b[~np.isnan(b[:, 0])]
+      if not len(b):
+         return None
+      return (float(b[:, 0].min()), float(b[:, 1].min()), float(b[:, 2].max()), float(b[:, 3].max()))
+
+   def WhereClause(self, rows, oidField = 'OBJECTID'):
+      '''Returns a where clause selecting the given rows by ObjectID.'''
+      oids = self.ObjectIDs(rows)
+      if not oids.size:
+         return '1 = 0'
+      return '%s IN (%s)' % (oidField, ', '.join(str(int(i)) for i in oids))
+
+def _FTypeCode(ftype):
+   '''Returns the FType code for a code or an NHD subtype name (e.g. 'SwampMarsh').'''
+   for code, name, domain in NHD_SUBTYPES:
+      if ftype == name:
+         return code
+   return ftype
+
+def _BBox(bbox):
+   if hasattr(bbox, 'XMin'):
+      return bbox.XMin, bbox.YMin, bbox.XMax, bbox.YMax
+   return tuple(bbox)
+
+def GeometryStats(shapes):
+   '''Returns an (n, 5) array of (xMin, yMin, xMax, yMax, area) for a list of arcpy
+   geometries or WKB polygons and multipolygons (NaN and 0 for missing geometries).  WKB
+   areas are those of the exterior rings less the holes.  The WKB is only walked in Python
+   to find the rings; bounds and areas are computed for all the rings at once.'''
+   stats = np.zeros((len(shapes), 5), dtype = np.float64)
+   stats[:, :4] = np.nan
+   rings, owners, signs = list(), list(), list()
+   for i, shape in enumerate(shapes):
+      if shape is None:
+         continue
+      if hasattr(shape, 'extent'):
+         e = shape.extent
+         stats[i] = (e.XMin, e.YMin, e.XMax, e.YMax, shape.area)
+         continue
+      nBefore = len(rings)
+      _WKBRings(bytes(shape), 0, rings, signs)
+      owners.extend([i] * (len(rings) - nBefore))
+   if rings:
+      _RingStats(rings, np.array(owners), np.array(signs, dtype = np.float64), stats)
+   return stats
+
+def _RingStats(rings, owners, signs, stats):
+   '''Fills in stats for the owners of rings (arrays of x, y, ...), with signs of 1 for
+   exterior rings and -1 for holes.'''
+   lengths = np.array([len(r) for r in rings])
+   keep = lengths > 0
+   rings, owners, signs, lengths = [r for r in rings if len(r)], owners[keep], signs[keep], lengths[keep]
+   if not rings:
+      return
+   xy = np.concatenate(rings)
+   x, y = xy[:, 0], xy[:, 1]
+   starts = np.zeros(len(rings), dtype = np.int64)
+   np.cumsum(lengths[:-1], out = starts[1:])
+   # Shoelace terms, with the term wrapping from each ring's last point to the next ring zeroed
+   cross = np.zeros(len(x))
+   cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+   cross[starts[1:] - 1] = 0.0
+   cross[-1] = 0.0
+   ringArea = np.abs(np.add.reduceat(cross, starts)) / 2.0 * signs
+   # Rings of a geometry are consecutive, so bounds can be reduced over each geometry's points
+   first = np.r_[True, owners[1:] != owners[:-1]]
+   geomStarts, geoms = starts[first], owners[first]
+   stats[geoms, 0] = np.minimum.reduceat(x, geomStarts)
+   stats[geoms, 1] = np.minimum.reduceat(y, geomStarts)
+   stats[geoms, 2] = np.maximum.reduceat(x, geomStarts)
+   stats[geoms, 3] = np.maximum.reduceat(y, geomStarts)
+   stats[geoms, 4] = np.add.reduceat(ringArea, np.flatnonzero(first))
+
+def _WKBRings(data, pos, rings, signs):
+   '''Reads one WKB (or EWKB) polygon or multipolygon from data at pos, appending its
+   rings, as (n, dims) arrays, to rings, and 1 (exterior) or -1 (hole) to signs.  Returns
+   the position after it.'''
+   order = '<' if data[pos:pos + 1] == b'\x01' else '>'
+   gtype, = struct.unpack_from(order + 'I', data, pos + 1)
+   pos += 5
+   nDims = 2
+   if gtype & 0x20000000: # EWKB SRID
+      pos += 4
+   if gtype & 0xE0000000:
+      nDims += bool(gtype & 0x80000000) + bool(gtype & 0x40000000)
+      gtype &= 0x0FFFFFFF
+   else:
+      nDims += (0, 1, 1, 2)[gtype // 1000] if gtype >= 1000 else 0
+      gtype %= 1000
+   if gtype == 6: # MultiPolygon
+      n, = struct.unpack_from(order + 'I', data, pos)
+      pos += 4
+      for i in range(n):
+         pos = _WKBRings(data, pos, rings, signs)
+      return pos
+   if gtype != 3:
+      raise ValueError('Unsupported WKB geometry type %s' % gtype)
+   nRings, = struct.unpack_from(order + 'I', data, pos)
+   pos += 4
+   for i in range(nRings):
+      nPoints, = struct.unpack_from(order + 'I', data, pos)
+      pos += 4
+      rings.append(np.frombuffer(data, dtype = order + 'f8', count = nPoints * nDims, offset = pos).reshape(nPoints, nDims)[:, :2])
+      signs.append(1.0 if i == 0 else -1.0)
+      pos += nPoints * nDims * 8
+   return pos
@@ -0,0 +1,434 @@
+# ----------------------------------------------------------------------------------------
+# libNHDMerge.py
+# Version:  Python 2.7 / 3.x (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Single-pass merge of NHD polygon feature classes (NHDArea and NHDWaterbody) into one
+# output, used by CombineNHDPolygons.py.  Each source is read once and its rows are
+# bulk-inserted into the output with the SourceFC attribute set on the fly, so there are
+# no temporary copies, no AddField/CalculateField passes and no Merge.
+
+# Usage Tips:
+# Readers and writers are pluggable.  A reader has Fields(), returning a list of Field
+# tuples (geometry excluded), and Rows(), yielding value tuples with the geometry last.  A
+# writer has Open(fields), Insert(rows) and Close(); Insert may return the new ObjectIDs.
+# If the merge fails, StreamMerge calls the writer's Abort() instead of Close(), where it
+# has one.
+#     ArcFeatureReader/ArcFeatureWriter work on geodatabases through arcpy.da cursors.
+# SQLiteFeatureReader/SQLiteFeatureWriter keep features in a SQLite table, with geometry
+# as a WKB blob, so that the merge can be run and benchmarked without arcpy.  To move
+# features between the two, read from arcpy with shapeToken = 'SHAPE@WKB'.
+
+#     CombineNHDBatch combines many NHD geodatabases (e.g. every HU4 or HU8 download)
+# concurrently in a process pool, one output per input, optionally appending all of them
+# into a single combined layer afterwards.  It returns, and can write as CSV, a summary of
+# row counts, elapsed time and errors per input.  Folders are searched for file
+# geodatabases only, unless other extensions are given along with a merge function that
+# reads them.
+#     Given attrStore, MergeNHDPolygons also writes a columnar store of the FCode, FType,
+# SourceFC, area and extent of each output feature (see libNHDAttributes.py), for queries
+# by subtype and extent that need not scan the geodatabase.
+
+# Dependencies:
+# libProcessPool.py; arcpy for the Arc* readers and writers and the default batch functions only
+# ----------------------------------------------------------------------------------------
+
+import os, sys, time, sqlite3, datetime, traceback
+import multiprocessing
+from collections import namedtuple
+from libProcessPool import SetExecutable, ClosePool
+
+Field = namedtuple('Field', ['name', 'type', 'length'])
+
+try:
+   _STRING_TYPES = basestring # Python 2
+except NameError:
+   _STRING_TYPES = str
+
+# Subtypes removed by the Merge tool, and their domains:  [FType subtype, description, domain on FCode]
+# It's possible this list may need modification in the future
+NHD_SUBTYPES = [[493, 'Estuary', 'Estuary FCode'],
+                [378, 'Ice Mass', 'Ice Mass FCode'],
+                [390, 'LakePond', 'LakePond FCode'],
+                [361, 'Playa', 'Playa FCode'],
+                [436, 'Reservoir', 'Reservoir FCode'],
+                [466, 'SwampMarsh', 'SwampMarsh FCode']]
+
+# Field types managed by the geodatabase itself, which are not copied
+_SKIP_TYPES = ('OID', 'Geometry', 'GlobalID', 'Raster', 'Blob')
+_SKIP_NAMES = ('shape_length', 'shape_area', 'shape_len')
+
+def printMsg(msg):
+   '''Prints a message, and also passes it to the geoprocessor if arcpy is in use.'''
+   arcpy = sys.modules.get('arcpy')
+   if arcpy is not None:
+      arcpy.AddMessage(msg)
+   print(msg)
+
+def NHDSources(in_GDB):
+   '''Returns the [SourceFC value, feature class path] pairs for an NHD geodatabase.'''
+   return [['NHDArea', in_GDB + os.sep + 'Hydrography' + os.sep + 'NHDArea'],
+           ['NHDWaterbody', in_GDB + os.sep + 'Hydrography' + os.sep + 'NHDWaterbody']]
+
+def UnionFields(readers):
+   '''Returns the union of the readers' fields, in order of first appearance, as Merge does.'''
+   fields = list()
+   seen = set()
+   for reader in readers:
+      for field in reader.Fields():
+         if field.name.lower() not in seen:
+            seen.add(field.name.lower())
+            fields.append(field)
+   return fields
+
+def StreamMerge(sources, writer, batchSize = 5000, sourceField = Field('SourceFC', 'String', 12)):
+   '''Merges features from sources, a list of (source name, reader) pairs, into writer in a
+   single pass, setting sourceField to the source name.  Returns a dict of row counts by
+   source.  If the merge fails, the writer is closed with Abort() where it has one.'''
+   readers = [reader for name, reader in sources]
+   fields = [f for f in UnionFields(readers) if f.name.lower() != sourceField.name.lower()]
+   fields.append(sourceField)
+   outIndex = dict((f.name.lower(), i) for i, f in enumerate(fields))
+   nOut = len(fields)
+   counts = dict()
+
+   writer.Open(fields)
+   try:
+      for sourceFC, reader in sources:
+         # Position of each of this source's fields in the output row
+         # (a source field already on the input is overwritten)
+         positions = [outIndex[f.name.lower()] for f in reader.Fields()]
+         n = 0
+         batch = list()
+         for row in reader.Rows():
+            out = [None] * nOut + [row[-1]]
+            for pos, val in zip(positions, row[:-1]):
+               out[pos] = val
+            out[nOut - 1] = sourceFC
+            batch.append(out)
+            if len(batch) >= batchSize:
+               writer.Insert(batch)
+               n += len(batch)
+               batch = list()
+         if batch:
+            writer.Insert(batch)
+            n += len(batch)
+         counts[sourceFC] = n
+   except:
+      getattr(writer, 'Abort', writer.Close)()
+      raise
+   writer.Close()
+   return counts
+
+class ArcFeatureReader(object):
+   '''Reads a feature class through arcpy.da.SearchCursor.'''
+   def __init__(self, fc, shapeToken = 'SHAPE@'):
+      self.fc = fc
+      self.shapeToken = shapeToken
+      self._fields = None
+
+   def Fields(self):
+      if self._fields is None:
+         import arcpy
+         self._fields = [Field(f.name, f.type, f.length) for f in arcpy.ListFields(self.fc)
+                         if f.type not in _SKIP_TYPES and f.name.lower() not in _SKIP_NAMES]
+      return self._fields
+
+   def Rows(self):
+      import arcpy
+      names = [f.name for f in self.Fields()] + [self.shapeToken]
+      with arcpy.da.SearchCursor(self.fc, names) as cursor:
+         for row in cursor:
+            yield row
+
+class ArcFeatureWriter(object):
+   '''Creates a polygon feature class and fills it through a single arcpy.da.InsertCursor.
+   If subtypes are given (as in NHD_SUBTYPES), subtypeField is set as the subtype field, the
+   subtypes are added, and their domains - copied from domainGDB if missing - are assigned
+   to domainField within each subtype.'''
+   def __init__(self, outFC, spatialRef, subtypeField = None, subtypes = None, domainGDB = None,
+                shapeToken = 'SHAPE@', domainField = None):
+      self.outFC = outFC
+      self.spatialRef = spatialRef
+      self.subtypeField = subtypeField
+      self.domainField = domainField or subtypeField
+      self.subtypes = subtypes or list()
+      self.domainGDB = domainGDB
+      self.shapeToken = shapeToken
+      self._cursor = None
+
+   def Open(self, fields):
+      import arcpy
+      outGDB, name = os.path.split(self.outFC)
+      arcpy.CreateFeatureclass_management(outGDB, name, 'POLYGON', '', '', '', self.spatialRef)
+      for f in fields:
+         arcpy.AddField_management(self.outFC, f.name, _ArcFieldType(f.type), '', '', f.length or '')
+      if self.subtypeField and self.subtypes:
+         if self.domainGDB:
+            CopyDomains(self.domainGDB, outGDB, [t[2] for t in self.subtypes])
+         arcpy.SetSubtypeField_management(self.outFC, self.subtypeField)
+         for code, desc, domain in self.subtypes:
+            arcpy.AddSubtype_management(self.outFC, code, desc)
+            arcpy.AssignDomainToField_management(self.outFC, self.domainField, domain, code)
+      self._cursor = arcpy.da.InsertCursor(self.outFC, [f.name for f in fields] + [self.shapeToken])
+
+   def Insert(self, rows):
+      return [self._cursor.insertRow(row) for row in rows]
+
+   def Close(self):
+      if self._cursor is not None:
+         del self._cursor
+         self._cursor = None
+
+def _ArcFieldType(fieldType):
+   '''Maps a field type as reported by ListFields to the keyword AddField expects.'''
+   return {'String': 'TEXT', 'Integer': 'LONG', 'SmallInteger': 'SHORT', 'Single': 'FLOAT',
+           'Double': 'DOUBLE', 'Date': 'DATE', 'GUID': 'GUID'}.get(fieldType, fieldType)
+
+def CopyDomains(fromGDB, toGDB, names):
+   '''Copies the named attribute domains from one geodatabase to another, where missing.'''
+   import arcpy
+   existing = set(d.name for d in arcpy.da.ListDomains(toGDB))
+   for d in arcpy.da.ListDomains(fromGDB):
+      if d.name not in names or d.name in existing:
+         continue
+      domainType = 'CODED' if d.domainType == 'CodedValue' else 'RANGE'
+      arcpy.CreateDomain_management(toGDB, d.name, d.description, d.type.upper(), domainType)
+      if d.domainType == 'CodedValue':
+         for code, desc in sorted(d.codedValues.items()):
+            arcpy.AddCodedValueToDomain_management(toGDB, d.name, code, desc)
+      else:
+         arcpy.SetValueForRangeDomain_management(toGDB, d.name, d.range[0], d.range[1])
+
+_SQL_TYPES = {'String': 'TEXT', 'Integer': 'INTEGER', 'SmallInteger': 'INTEGER',
+              'Single': 'REAL', 'Double': 'REAL', 'Date': 'TEXT', 'GUID': 'TEXT'}
+
+class SQLiteFeatureReader(object):
+   '''Reads features from a SQLite table whose last column, Shape, holds the geometry.
+   Field types are recovered from the _fields table written by SQLiteFeatureWriter, or
+   else inferred from the declared column types.'''
+   def __init__(self, dbPath, table):
+      self.dbPath = dbPath
+      self.table = table
+      self._fields = None
+
+   def Fields(self):
+      if self._fields is None:
+         conn = sqlite3.connect(self.dbPath)
+         try:
+            cols = [(r[1], r[2]) for r in conn.execute('PRAGMA table_info("%s")' % self.table)]
+            known = dict()
+            if conn.execute("SELECT name FROM sqlite_master WHERE name = '_fields'").fetchone():
+               for name, ftype, length in conn.execute(
+                     'SELECT name, type, length FROM _fields WHERE tbl = ?', (self.table,)):
+                  known[name] = Field(name, ftype, length)
+         finally:
+            conn.close()
+         inferred = {'TEXT': 'String', 'INTEGER': 'Integer', 'REAL': 'Double'}
+         self._fields = [known.get(name, Field(name, inferred.get(decl.upper(), 'String'), None))
+                         for name, decl in cols if name != 'Shape']
+      return self._fields
+
+   def Rows(self):
+      names = ', '.join('"%s"' % f.name for f in self.Fields())
+      conn = sqlite3.connect(self.dbPath)
+      try:
+         for row in conn.execute('SELECT %s, Shape FROM "%s"' % (names, self.table)):
+            yield row
+      finally:
+         conn.close()
+
+class SQLiteFeatureWriter(object):
+   '''Writes features to a new SQLite table, in one transaction, with geometry as a blob in
+   the last column, Shape.  Field definitions are recorded in a _fields table.'''
+   def __init__(self, dbPath, table):
+      self.dbPath = dbPath
+      self.table = table
+      self._conn = None
+      self._sql = None
+
+   def Open(self, fields):
+      self._conn = sqlite3.connect(self.dbPath)
+      c = self._conn
+      c.execute('DROP TABLE IF EXISTS "%s"' % self.table)
+      cols = ', '.join('"%s" %s' % (f.name, _SQL_TYPES.get(f.type, 'TEXT')) for f in fields)
+      c.execute('CREATE TABLE "%s" (%s, Shape BLOB)' % (self.table, cols))
+      c.execute('CREATE TABLE IF NOT EXISTS _fields (tbl TEXT, name TEXT, type TEXT, length INTEGER)')
+      c.execute('DELETE FROM _fields WHERE tbl = ?', (self.table,))
+      c.executemany('INSERT INTO _fields VALUES (?, ?, ?, ?)',
+                    [(self.table, f.name, f.type, f.length) for f in fields])
+      self._sql = 'INSERT INTO "%s" VALUES (%s)' % (self.table, ', '.join(['?'] * (len(fields) + 1)))
+
+   def Insert(self, rows):
+      self._conn.executemany(self._sql, (_SQLRow(row) for row in rows))
+
+   def Close(self):
+      if self._conn is not None:
+         self._conn.commit()
+         self._conn.close()
+         self._conn = None
+
+def _SQLRow(row):
+   '''Converts values sqlite3 cannot store directly (dates, geometry buffers).'''
+   out = list()
+   for val in row:
+      if isinstance(val, (datetime.datetime, datetime.date)):
+         val = val.isoformat()
+      elif isinstance(val, (bytearray, memoryview)):
+         val = sqlite3.Binary(val)
+      out.append(val)
+   return out
+
+def AttributeStorePath(nhdMerged):
+   '''Returns the default attribute store path for an output feature class:  a folder
+   beside its geodatabase, named after both, e.g. Hydro_NHD_Polys_Attributes for
+   Hydro.gdb\\NHD_Polys.'''
+   outGDB, name = os.path.split(os.path.abspath(nhdMerged))
+   return '%s_%s_Attributes' % (os.path.splitext(outGDB)[0], name)
+
+def MergeNHDPolygons(in_GDB, nhdMerged, attrStore = None):
+   '''Combines NHDArea and NHDWaterbody from an NHD geodatabase into the nhdMerged feature
+   class, with the SourceFC attribute, the FType subtypes and their FCode domains.  If attrStore is
+   given, the attribute store for the output is written there in the same pass.  Returns a
+   dict of row counts by source.'''
+   import arcpy
+   sources = NHDSources(in_GDB)
+   if arcpy.Exists(nhdMerged):
+      arcpy.Delete_management(nhdMerged)
+   spatialRef = arcpy.Describe(sources[0][1]).spatialReference
+   writer = ArcFeatureWriter(nhdMerged, spatialRef, 'FType', NHD_SUBTYPES, in_GDB, domainField = 'FCode')
+   if attrStore:
+      from libNHDAttributes import NHDAttributeWriter
+      writer = NHDAttributeWriter(attrStore, writer)
+   return StreamMerge([[sourceFC, ArcFeatureReader(fc)] for sourceFC, fc in sources], writer)
+
+def MergeNHDToNewGDB(in_GDB, outFolder):
+   '''Batch worker default:  creates <outFolder>/<input name>_NHD.gdb and merges the input
+   into NHD_Polys there, with its attribute store beside it (see AttributeStorePath).
+   Returns a tuple (output feature class, counts by source).'''
+   import arcpy
+   name = os.path.splitext(os.path.basename(os.path.normpath(in_GDB)))[0]
+   outGDB = os.path.join(outFolder, name + '_NHD.gdb')
+   if not arcpy.Exists(outGDB):
+      arcpy.CreateFileGDB_management(outFolder, name + '_NHD.gdb')
+   nhdMerged = outGDB + os.sep + 'NHD_Polys'
+   return nhdMerged, MergeNHDPolygons(in_GDB, nhdMerged, AttributeStorePath(nhdMerged))
+
+def AppendNHDOutputs(outputs, combinedFC):
+   '''Combines the per-input NHD_Polys feature classes into one, in a single pass, adding a
+   SourceGDB attribute.  The subtypes and domains of the first output are carried over.'''
+   import arcpy
+   if arcpy.Exists(combinedFC):
+      arcpy.Delete_management(combinedFC)
+   spatialRef = arcpy.Describe(outputs[0]).spatialReference
+   domainGDB = os.path.dirname(outputs[0])
+   writer = ArcFeatureWriter(combinedFC, spatialRef, 'FType', NHD_SUBTYPES, domainGDB, domainField = 'FCode')
+   sources = [[os.path.basename(os.path.dirname(fc)), ArcFeatureReader(fc)] for fc in outputs]
+   return StreamMerge(sources, writer, sourceField = Field('SourceGDB', 'String', 255))
+
+def ListNHDInputs(inputs, extensions = ('.gdb',)):
+   '''Expands a folder, or a list/semicolon-delimited string of geodatabases and folders,
+   into a sorted list of paths.  In folders, only inputs with the given extensions are
+   listed:  file geodatabases by default, which is what MergeNHDToNewGDB reads.'''
+   if isinstance(inputs, _STRING_TYPES):
+      inputs = [i.strip().strip("'") for i in inputs.split(';') if i.strip()]
+   gdbs = list()
+   for item in inputs:
+      if os.path.isdir(item) and not item.lower().endswith('.gdb'):
+         gdbs.extend(os.path.join(item, f) for f in sorted(os.listdir(item))
+                     if f.lower().endswith(tuple(extensions)))
+      else:
+         gdbs.append(item)
+   return gdbs
+
+def _CombineOne(task):
+   '''Batch worker:  merges one input, returning a summary dict rather than raising.'''
+   in_GDB, outFolder, mergeFunction = task
+   t0 = time.time()
+   summary = {'input': in_GDB, 'output': None, 'rows': 0, 'seconds': 0.0, 'error': None}
+   try:
+      output, counts = mergeFunction(in_GDB, outFolder)
+      summary['output'] = output
+      summary['rows'] = sum(counts.values())
+      summary.update(('rows_%s' % k, v) for k, v in counts.items())
+   except Exception:
+      summary['error'] = traceback.format_exc()
+   summary['seconds'] = round(time.time() - t0, 3)
+   return summary
+
+def CombineNHDBatch(inputs, outFolder, nWorkers = 4, combinedFC = None, summaryFile = None,
+                    mergeFunction = MergeNHDToNewGDB, appendFunction = AppendNHDOutputs, extensions = ('.gdb',)):
+   '''Combines the NHD polygons of every input geodatabase (a folder, or a list of paths)
+   concurrently in a pool of nWorkers processes, writing one output per input to outFolder.
+   If combinedFC is given, all outputs are then appended into it.  Returns a list of
+   per-input summary dicts (input, output, rows, seconds, error), also written to
+   summaryFile as CSV if given.
+
+   mergeFunction(input, outFolder) must return (output, counts by source), and
+   appendFunction(outputs, combinedFC) must return counts by output; the defaults work on
+   file geodatabases through arcpy.  Both must be importable module-level functions.  The
+   inputs listed from folders are those with the given extensions, which must be what
+   mergeFunction reads (e.g. ('.sqlite',) for a SQLite merge function).  If the batch fails
+   or is interrupted, the worker pool is stopped at once.'''
+   gdbs = ListNHDInputs(inputs, extensions)
+   tasks = [(gdb, outFolder, mergeFunction) for gdb in gdbs]
+   printMsg('Combining NHD polygons for %s inputs with %s worker processes...' % (len(tasks), nWorkers))
+   summaries = list()
+   if nWorkers > 1 and len(tasks) > 1:
+      SetExecutable()
+      pool = multiprocessing.Pool(min(nWorkers, len(tasks)))
+      try:
+         for summary in pool.imap_unordered(_CombineOne, tasks):
+            summaries.append(summary)
+            _ReportOne(summary)
+      except:
+         ClosePool(pool, terminate = True)
+         raise
+      ClosePool(pool)
+   else:
+      for task in tasks:
+         summary = _CombineOne(task)
+         summaries.append(summary)
+         _ReportOne(summary)
+   summaries.sort(key = lambda x: x['input'])
+
+   if combinedFC:
+      outputs = [x['output'] for x in summaries if x['error'] is None]
+      if outputs:
+         printMsg('Appending %s outputs into %s...' % (len(outputs), combinedFC))
+         t0 = time.time()
+         counts = appendFunction(outputs, combinedFC)
+         printMsg('%s features appended in %.1f seconds' % (sum(counts.values()), time.time() - t0))
+
+   failed = [x['input'] for x in summaries if x['error'] is not None]
+   if failed:
+      printMsg('Processing failed for %s inputs:' % len(failed))
+      for gdb in failed:
+         printMsg('   -%s' % gdb)
+   if summaryFile:
+      WriteBatchSummary(summaries, summaryFile)
+   return summaries
+
+def _ReportOne(summary):
+   if summary['error'] is None:
+      printMsg('%s: %s features in %s seconds' % (summary['input'], summary['rows'], summary['seconds']))
+   else:
+      printMsg('%s: FAILED after %s seconds\n%s' % (summary['input'], summary['seconds'], summary['error']))
+
+def WriteBatchSummary(summaries, summaryFile):
+   '''Writes per-input batch summaries to a CSV file.'''
+   import csv
+   keys = ['input', 'output', 'rows', 'seconds', 'error']
+   extra = sorted(set(k for x in summaries for k in x) - set(keys))
+   if sys.version_info[0] < 3:
+      f = open(summaryFile, 'wb')
+   else:
+      f = open(summaryFile, 'w', newline = '')
+   with f:
+      w = csv.writer(f)
+      w.writerow(keys + extra)
+      for x in summaries:
+         w.writerow([x.get(k) for k in keys + extra])
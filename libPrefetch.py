@@ -0,0 +1,211 @@
+# ----------------------------------------------------------------------------------------
+# libPrefetch.py
+# Version:  Python 2.7 / 3.x
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Double buffering for unit-by-unit processing in a single process:  while unit k is being
+# computed, a background thread reads the inputs for unit k+1 and another writes the output
+# of unit k-1, so that the CPU is not idle during I/O and the disk (or network) is not idle
+# during computation.  Also measures how much of the I/O time was hidden this way.
+
+# Usage Tips:
+# Prefetcher wraps an iterable of items and a load function; iterating over it yields
+# (item, loaded, err) in order, with up to depth items loaded ahead.  BackgroundWriter wraps
+# a writer from libRasterWindows.py (Open/Write/Close); Submit queues a block for writing
+# and returns at once, unless depth blocks are already waiting.  Bounded queues keep memory
+# capped at roughly depth + 2 units' worth of inputs and depth + 1 units' worth of output.
+#     Reading and writing run on threads, which helps wherever the work releases the GIL:
+# file and network I/O, zlib, and most NumPy operations.  Readers and writers must be safe
+# to call from another thread, which they declare with threadSafe = True; the NumPy-based
+# ones in this package do.  arcpy is not safe off the main thread, so the arcpy readers and
+# writers set threadSafe = False; ThreadSafe tells which objects may go to the background.
+#     OverlapStats adds up the time spent reading and writing in the background and the time
+# the main thread spent waiting for them; the difference is the I/O time that was hidden.
+
+# Syntax:
+# stats = OverlapStats()
+# for item, data, err in Prefetcher(items, load, depth = 1, stats = stats): ...
+# out = BackgroundWriter(writer, depth = 1, stats = stats).Open(); out.Submit(key, unitID, window, block)
+# ----------------------------------------------------------------------------------------
+
+import time, threading, traceback
+try:
+   import queue # Python 3
+except ImportError:
+   import Queue as queue # Python 2
+
+_DONE = object() # Marks the end of a queue
+
+def ThreadSafe(*objects):
+   '''Returns True if every object given (None aside) declares threadSafe = True.'''
+   return all(getattr(obj, 'threadSafe', False) for obj in objects if obj is not None)
+
+class OverlapStats(object):
+   '''Time accounting for a pipelined run, in seconds.  Busy times are measured on the
+   background threads, wait times on the main thread; all are added through Add, under a
+   lock.'''
+   def __init__(self):
+      self._lock = threading.Lock()
+      self.readBusy = 0.0
+      self.readWait = 0.0
+      self.writeBusy = 0.0
+      self.writeWait = 0.0
+      self.nRead = 0
+      self.nWritten = 0
+      self.t0 = time.time()
+      self.wall = None
+
+   def Add(self, name, seconds, count = None):
+      '''Adds seconds to one of the times (e.g. 'readBusy'), and counts a unit read or
+      written if count names its counter.'''
+      with self._lock:
+         setattr(self, name, getattr(self, name) + seconds)
+         if count:
+            setattr(self, count, getattr(self, count) + 1)
+
+   def Stop(self):
+      self.wall = time.time() - self.t0
+
+   def Hidden(self):
+      '''Returns the seconds of I/O that overlapped with computation.'''
+      return max(0.0, self.readBusy - self.readWait) + max(0.0, self.writeBusy - self.writeWait)
+
+   def AsDict(self):
+      io = self.readBusy + self.writeBusy
+      return {'readBusy': self.readBusy, 'readWait': self.readWait, 'writeBusy': self.writeBusy,
+              'writeWait': self.writeWait, 'nRead': self.nRead, 'nWritten': self.nWritten,
+              'hidden': self.Hidden(), 'hiddenFraction': self.Hidden() / io if io else None,
+              'wall': self.wall}
+
+   def Summary(self):
+      '''Returns a few lines of text for the processing log.'''
+      d = self.AsDict()
+      lines = ['Pipelined I/O:',
+               '   Reading:  %.1f s for %d units, main thread waited %.1f s' % (self.readBusy, self.nRead, self.readWait),
+               '   Writing:  %.1f s for %d units, main thread waited %.1f s' % (self.writeBusy, self.nWritten, self.writeWait)]
+      if d['hiddenFraction'] is not None:
+         lines.append('   I/O hidden behind computation:  %.1f s (%.0f%%)' % (d['hidden'], 100 * d['hiddenFraction']))
+      if self.wall is not None:
+         lines.append('   Wall time:  %.1f s' % self.wall)
+      return '\n'.join(lines) + '\n'
+
+def _Put(q, value, stop):
+   '''Puts a value on a bounded queue, giving up if the stop event is set.'''
+   while not stop.is_set():
+      try:
+         q.put(value, timeout = 0.1)
+         return True
+      except queue.Full:
+         pass
+   return False
+
+class Prefetcher(object):
+   '''Yields (item, load(item), err) for each item, in order, loading up to depth items
+   ahead of the consumer in a background thread.  If load raises, loaded is None and err
+   is the formatted traceback.'''
+   def __init__(self, items, load, depth = 1, stats = None):
+      self.items = items
+      self.load = load
+      self.depth = max(1, int(depth))
+      self.stats = stats if stats is not None else OverlapStats()
+      self._queue = queue.Queue(self.depth)
+      self._stop = threading.Event()
+      self._thread = None
+
+   def _Run(self):
+      try:
+         for item in self.items:
+            t0 = time.time()
+            try:
+               value, err = self.load(item), None
+            except Exception:
+               value, err = None, traceback.format_exc()
+            self.stats.Add('readBusy', time.time() - t0, 'nRead')
+            if not _Put(self._queue, (item, value, err), self._stop):
+               return
+      finally:
+         _Put(self._queue, _DONE, self._stop)
+
+   def __iter__(self):
+      self._thread = threading.Thread(target = self._Run, name = 'Prefetcher')
+      self._thread.daemon = True
+      self._thread.start()
+      try:
+         while True:
+            t0 = time.time()
+            entry = self._queue.get()
+            self.stats.Add('readWait', time.time() - t0)
+            if entry is _DONE:
+               break
+            yield entry
+      finally:
+         self.Close()
+
+   def Close(self):
+      '''Stops the background thread, e.g. if the consumer stops early.'''
+      self._stop.set()
+      if self._thread is not None:
+         self._thread.join()
+
+class BackgroundWriter(object):
+   '''Writes blocks with a writer (Open/Write/Close) on a background thread.  Submit returns
+   at once unless depth blocks are already queued.  Completed returns the (key, nBytes, err)
+   of the writes finished so far, where err is a formatted traceback or None.'''
+   def __init__(self, writer, depth = 1, stats = None):
+      self.writer = writer
+      self.depth = max(1, int(depth))
+      self.stats = stats if stats is not None else OverlapStats()
+      self._queue = queue.Queue(self.depth)
+      self._done = list()
+      self._lock = threading.Lock()
+      self._thread = None
+
+   def Open(self):
+      self.writer.Open()
+      self._thread = threading.Thread(target = self._Run, name = 'BackgroundWriter')
+      self._thread.daemon = True
+      self._thread.start()
+      return self
+
+   def _Run(self):
+      while True:
+         entry = self._queue.get()
+         if entry is _DONE:
+            return
+         key, unitID, window, block = entry
+         t0 = time.time()
+         try:
+            nBytes, err = self.writer.Write(unitID, window, block), None
+         except Exception:
+            nBytes, err = 0, traceback.format_exc()
+         seconds = time.time() - t0
+         self.stats.Add('writeBusy', seconds, 'nWritten')
+         with self._lock:
+            self._done.append((key, nBytes, err, seconds))
+
+   def Submit(self, key, unitID, window, block):
+      '''Queues a block to be written; key identifies it in Completed.'''
+      t0 = time.time()
+      self._queue.put((key, unitID, window, block))
+      self.stats.Add('writeWait', time.time() - t0)
+
+   def Completed(self):
+      '''Returns and forgets the writes finished so far, as (key, nBytes, err, seconds).'''
+      with self._lock:
+         done, self._done = self._done, list()
+      return done
+
+   def Close(self):
+      '''Waits for queued writes to finish and closes the writer.  Returns the writes
+      finished since the last call to Completed.'''
+      if self._thread is not None:
+         t0 = time.time()
+         self._queue.put(_DONE)
+         self._thread.join()
+         self.stats.Add('writeWait', time.time() - t0)
+         self._thread = None
+      self.writer.Close()
+      return self.Completed()
@@ -0,0 +1,57 @@
+# ----------------------------------------------------------------------------------------
+# libProcessPool.py
+# Version:  Python 2.7 / 3.x
+# Creation Date: 2026-10-17
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Helpers for running worker processes from ArcGIS:  pointing multiprocessing at a Python
+# interpreter when the host application is not one, and shutting a pool down without
+# waiting for its remaining work when the run has failed or been interrupted.
+
+# Usage Tips:
+# Inside ArcMap or ArcGIS Pro, sys.executable is the application (ArcMap.exe, ArcGISPro.exe)
+# rather than Python, and worker processes started from it would start the application.
+# SetExecutable finds the interpreter of the running environment (pythonw.exe or python.exe
+# on Windows, bin/python elsewhere) and uses it; if none is found, or sys.executable is
+# already Python, nothing is changed.
+#     ClosePool(pool, terminate = True) stops the workers at once; use it on the error path
+# (including KeyboardInterrupt), and ClosePool(pool) after a normal run.
+
+# Syntax:
+# SetExecutable(); pool = multiprocessing.Pool(n)
+# try: ...; ClosePool(pool)
+# except: ClosePool(pool, terminate = True); raise
+# ----------------------------------------------------------------------------------------
+
+import os, sys
+import multiprocessing
+
+def PythonExecutable():
+   '''Returns the path of the Python interpreter of the running environment, or None if it
+   cannot be found.'''
+   if os.path.basename(sys.executable).lower().startswith('python'):
+      return sys.executable
+   prefix = sys.exec_prefix
+   for name in ('pythonw.exe', 'python.exe', os.path.join('bin', 'python3'), os.path.join('bin', 'python')):
+      path = os.path.join(prefix, name)
+      if os.path.isfile(path):
+         return path
+   return None
+
+def SetExecutable():
+   '''Points multiprocessing at the Python interpreter if sys.executable is the host
+   application rather than Python.'''
+   python = PythonExecutable()
+   if python is not None and python != sys.executable:
+      multiprocessing.set_executable(python)
+
+def ClosePool(pool, terminate = False):
+   '''Shuts down a pool:  waits for its work to finish, or, with terminate, stops the
+   workers at once.'''
+   if terminate:
+      pool.terminate()
+   else:
+      pool.close()
+   pool.join()
@@ -0,0 +1,395 @@
+# ----------------------------------------------------------------------------------------
+# libProjections.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Vectorized coordinate transformations for whole arrays of vertices at once:  geographic,
+# Transverse Mercator (UTM), Albers Equal Area Conic and Lambert Conformal Conic, with
+# 7-parameter Helmert datum shifts between them.  Formulas follow Snyder (1987), Map
+# Projections - A Working Manual, USGS Professional Paper 1395.
+
+# Usage Tips:
+# Coordinates are in degrees (x = longitude, y = latitude) for geographic systems, and in
+# meters for projected ones.  Datum shifts are never chosen implicitly from an unordered
+# list, as transList[0] is in CoordinateSystems.ProjectToMatch:  ChooseTransformation
+# returns the named transformation if one is given, and otherwise the first one listed for
+# that pair of datums in TRANSFORMATIONS, so the same inputs always give the same choice.
+# Datums with no direct transformation (e.g. NAD27 and NAD83) are joined through WGS84.
+#     TransformBatch reprojects many layers (arrays) in one call, by concatenating them.
+
+# Syntax:
+# x2, y2 = Transform(lon, lat, GEOGRAPHIC['WGS84'], UTM(17, 'NAD83'))
+# ----------------------------------------------------------------------------------------
+
+import numpy as np
+
+class Ellipsoid(object):
+   '''A reference ellipsoid, given by its semi-major axis (m) and inverse flattening.'''
+   def __init__(self, name, a, invf):
+      self.name = name
+      self.a = float(a)
+      self.f = 1.0 / invf
+      self.e2 = self.f * (2 - self.f) # Eccentricity squared
+      self.e = np.sqrt(self.e2)
+      self.ep2 = self.e2 / (1 - self.e2) # Second eccentricity squared
+
+ELLIPSOIDS = {
+   'WGS84': Ellipsoid('WGS84', 6378137.0, 298.257223563),
+   'GRS80': Ellipsoid('GRS80', 6378137.0, 298.257222101),
+   'Clarke1866': Ellipsoid('Clarke1866', 6378206.4, 294.978698214)}
+
+# Datum name -> ellipsoid name
+DATUMS = {'WGS84': 'WGS84', 'NAD83': 'GRS80', 'NAD27': 'Clarke1866'}
+
+class Helmert(object):
+   '''A 7-parameter Helmert transformation:  translations (m), rotations (arc-seconds) and
+   scale difference (ppm), in the position vector or coordinate frame convention.'''
+   def __init__(self, name, fromDatum, toDatum, tx, ty, tz, rx = 0, ry = 0, rz = 0, ds = 0,
+                convention = 'coordinate_frame'):
+      self.name = name
+      self.fromDatum = fromDatum
+      self.toDatum = toDatum
+      self.params = (tx, ty, tz, rx, ry, rz, ds)
+      self.convention = convention
+
+   def Inverse(self):
+      '''Returns the reverse transformation (exact to well under a millimeter for the
+      small rotations and scale differences used between datums).'''
+      tx, ty, tz, rx, ry, rz, ds = self.params
+      return Helmert(self.name + ' (reversed)', self.toDatum, self.fromDatum,
+                     -tx, -ty, -tz, -rx, -ry, -rz, -ds, self.convention)
+
+   def Apply(self, X, Y, Z):
+      '''Transforms geocentric coordinates.'''
+      tx, ty, tz, rx, ry, rz, ds = self.params
+      sec2rad = np.pi / (180.0 * 3600.0)
+      rx, ry, rz = rx * sec2rad, ry * sec2rad, rz * sec2rad
+      if self.convention == 'coordinate_frame':
+         rx, ry, rz = -rx, -ry, -rz
+      m = 1.0 + ds * 1e-6
+      X2 = tx + m * (X - rz * Y + ry * Z)
+      Y2 = ty + m * (rz * X + Y - rx * Z)
+      Z2 = tz + m * (-ry * X + rx * Y + Z)
+      return X2, Y2, Z2
+
+# Available datum transformations for each pair of datums, in order of preference.  The
+# first one listed is the default.  Reverse directions are derived automatically.
+TRANSFORMATIONS = {
+   ('WGS84', 'NAD83'): [
+      Helmert('WGS_1984_(ITRF00)_To_NAD_1983', 'WGS84', 'NAD83',
+              0.9956, -1.9013, -0.5215, 0.025915, 0.009426, 0.011599, 0.00062)],
+   ('NAD83', 'WGS84'): [
+      Helmert('NAD_1983_To_WGS_1984_1', 'NAD83', 'WGS84', 0, 0, 0)],
+   ('NAD27', 'WGS84'): [
+      Helmert('NAD_1927_To_WGS_1984_4', 'NAD27', 'WGS84', -8.0, 160.0, 176.0)]}
+
+# Datum through which two datums without a direct transformation are joined
+HUB_DATUM = 'WGS84'
+
+class TransformationChain(object):
+   '''Two or more transformations applied in turn, e.g. NAD27 to WGS84 and then WGS84 to
+   NAD83.  The steps are chained in geocentric coordinates.'''
+   def __init__(self, steps):
+      self.steps = list(steps)
+      self.name = ' + '.join(t.name for t in self.steps)
+      self.fromDatum = self.steps[0].fromDatum
+      self.toDatum = self.steps[-1].toDatum
+
+   def Inverse(self):
+      return TransformationChain([t.Inverse() for t in reversed(self.steps)])
+
+   def Apply(self, X, Y, Z):
+      for t in self.steps:
+         X, Y, Z = t.Apply(X, Y, Z)
+      return X, Y, Z
+
+def _Direct(fromDatum, toDatum):
+   forward = TRANSFORMATIONS.get((fromDatum, toDatum), list())
+   reverse = [t.Inverse() for t in TRANSFORMATIONS.get((toDatum, fromDatum), list())]
+   return forward + reverse
+
+def ListTransformations(fromDatum, toDatum):
+   '''Returns the transformations available between two datums, in order of preference.
+   If there is no direct transformation, the pair is joined through HUB_DATUM, with one
+   TransformationChain for each combination of the transformations to and from it.'''
+   direct = _Direct(fromDatum, toDatum)
+   if direct or HUB_DATUM in (fromDatum, toDatum):
+      return direct
+   return [TransformationChain([a, b]) for a in _Direct(fromDatum, HUB_DATUM) for b in _Direct(HUB_DATUM, toDatum)]
+
+def ChooseTransformation(fromDatum, toDatum, name = None):
+   '''Returns the transformation to use between two datums:  the one named, if given, and
+   otherwise the default (first listed).  Returns None if the datums are the same.  Raises
+   ValueError if no transformation (or none by that name) is available.'''
+   if fromDatum == toDatum:
+      return None
+   candidates = ListTransformations(fromDatum, toDatum)
+   if name is not None:
+      candidates = [t for t in candidates if t.name.replace(' (reversed)', '') == name.replace(' (reversed)', '')]
+   if not candidates:
+      raise ValueError('No transformation %sfrom %s to %s' % ('named %s ' % name if name else '', fromDatum, toDatum))
+   return candidates[0]
+
+class CRS(object):
+   '''A coordinate system:  a datum plus a projection ('geographic', 'tmerc', 'aea' or
+   'lcc') and its parameters, in degrees and meters.'''
+   def __init__(self, name, datum, projection = 'geographic', lon0 = 0.0, lat0 = 0.0,
+                lat1 = None, lat2 = None, k0 = 1.0, falseEasting = 0.0, falseNorthing = 0.0):
+      self.name = name
+      self.datum = datum
+      self.ellipsoid = ELLIPSOIDS[DATUMS[datum]]
+      self.projection = projection
+      self.lon0 = lon0
+      self.lat0 = lat0
+      self.lat1 = lat1
+      self.lat2 = lat2
+      self.k0 = k0
+      self.falseEasting = falseEasting
+      self.falseNorthing = falseNorthing
+
+   def __repr__(self):
+      return 'CRS(%r)' % self.name
+
+   def Forward(self, lon, lat):
+      '''Projects geographic coordinates (degrees) on this datum to this system.'''
+      if self.projection == 'geographic':
+         return lon, lat
+      return _PROJECTIONS[self.projection][0](self, np.radians(lon), np.radians(lat))
+
+   def Inverse(self, x, y):
+      '''Converts coordinates in this system to geographic coordinates (degrees).'''
+      if self.projection == 'geographic':
+         return x, y
+      lon, lat = _PROJECTIONS[self.projection][1](self, x, y)
+      return np.degrees(lon), np.degrees(lat)
+
+GEOGRAPHIC = dict((d, CRS('GCS_' + d, d)) for d in DATUMS)
+
+def UTM(zone, datum = 'NAD83', south = False):
+   '''Returns a UTM zone coordinate system.'''
+   return CRS('%s_UTM_Zone_%s%s' % (datum, zone, 'S' if south else 'N'), datum, 'tmerc',
+              lon0 = -183.0 + 6.0 * zone, k0 = 0.9996, falseEasting = 500000.0,
+              falseNorthing = 10000000.0 if south else 0.0)
+
+# Commonly used projected systems
+USA_ALBERS = CRS('USA_Contiguous_Albers_Equal_Area_Conic_USGS_version', 'NAD83', 'aea',
+                 lon0 = -96.0, lat0 = 23.0, lat1 = 29.5, lat2 = 45.5)
+VA_LAMBERT = CRS('NAD_1983_Virginia_Lambert', 'NAD83', 'lcc',
+                 lon0 = -79.5, lat0 = 36.0, lat1 = 37.0, lat2 = 39.5)
+
+# --- Transverse Mercator (Snyder 8-9 to 8-25) --------------------------------------------
+
+def _MeridianArc(ell, phi):
+   e2 = ell.e2
+   e4, e6 = e2 * e2, e2 * e2 * e2
+   return ell.a * ((1 - e2/4 - 3*e4/64 - 5*e6/256) * phi
+                   - (3*e2/8 + 3*e4/32 + 45*e6/1024) * np.sin(2*phi)
+                   + (15*e4/256 + 45*e6/1024) * np.sin(4*phi)
+                   - (35*e6/3072) * np.sin(6*phi))
+
+def _TMForward(crs, lam, phi):
+   ell = crs.ellipsoid
+   sinphi, cosphi = np.sin(phi), np.cos(phi)
+   N = ell.a / np.sqrt(1 - ell.e2 * sinphi**2)
+   T = np.tan(phi)**2
+   C = ell.ep2 * cosphi**2
+   A = (lam - np.radians(crs.lon0)) * cosphi
+   M = _MeridianArc(ell, phi)
+   M0 = _MeridianArc(ell, np.radians(crs.lat0))
+   x = crs.k0 * N * (A + (1 - T + C) * A**3/6
+                     + (5 - 18*T + T**2 + 72*C - 58*ell.ep2) * A**5/120)
+   y = crs.k0 * (M - M0 + N * np.tan(phi) * (A**2/2 + (5 - T + 9*C + 4*C**2) * A**4/24
+                     + (61 - 58*T + T**2 + 600*C - 330*ell.ep2) * A**6/720))
+   return x + crs.falseEasting, y + crs.falseNorthing
+
+def _TMInverse(crs, x, y):
+   ell = crs.ellipsoid
+   e2 = ell.e2
+   x = np.asarray(x, dtype = np.float64) - crs.falseEasting
+   y = np.asarray(y, dtype = np.float64) - crs.falseNorthing
+   M = _MeridianArc(ell, np.radians(crs.lat0)) + y / crs.k0
+   mu = M / (ell.a * (1 - e2/4 - 3*e2**2/64 - 5*e2**3/256))
+   e1 = (1 - np.sqrt(1 - e2)) / (1 + np.sqrt(1 - e2))
+   phi1 = (mu + (3*e1/2 - 27*e1**3/32) * np.sin(2*mu)
+              + (21*e1**2/16 - 55*e1**4/32) * np.sin(4*mu)
+              + (151*e1**3/96) * np.sin(6*mu)
+              + (1097*e1**4/512) * np.sin(8*mu))
+   sin1, cos1, tan1 = np.sin(phi1), np.cos(phi1), np.tan(phi1)
+   C1 = ell.ep2 * cos1**2
+   T1 = tan1**2
+   N1 = ell.a / np.sqrt(1 - e2 * sin1**2)
+   R1 = ell.a * (1 - e2) / (1 - e2 * sin1**2)**1.5
+   D = x / (N1 * crs.k0)
+   phi = phi1 - (N1 * tan1 / R1) * (D**2/2
+            - (5 + 3*T1 + 10*C1 - 4*C1**2 - 9*ell.ep2) * D**4/24
+            + (61 + 90*T1 + 298*C1 + 45*T1**2 - 252*ell.ep2 - 3*C1**2) * D**6/720)
+   lam = np.radians(crs.lon0) + (D - (1 + 2*T1 + C1) * D**3/6
+            + (5 - 2*C1 + 28*T1 - 3*C1**2 + 8*ell.ep2 + 24*T1**2) * D**5/120) / cos1
+   return lam, phi
+
+# --- Albers Equal Area Conic (Snyder 14-1 to 14-21) ---------------------------------------
+
+def _AlbersQ(ell, phi):
+   e = ell.e
+   s = np.sin(phi)
+   return (1 - ell.e2) * (s / (1 - ell.e2 * s**2) - (1 / (2*e)) * np.log((1 - e*s) / (1 + e*s)))
+
+def _ConicM(ell, phi):
+   return np.cos(phi) / np.sqrt(1 - ell.e2 * np.sin(phi)**2)
+
+def _AlbersConstants(crs):
+   ell = crs.ellipsoid
+   phi0, phi1, phi2 = np.radians([crs.lat0, crs.lat1, crs.lat2])
+   m1, m2 = _ConicM(ell, phi1), _ConicM(ell, phi2)
+   q0, q1, q2 = _AlbersQ(ell, phi0), _AlbersQ(ell, phi1), _AlbersQ(ell, phi2)
+   n = (m1**2 - m2**2) / (q2 - q1) if phi1 != phi2 else np.sin(phi1)
+   C = m1**2 + n * q1
+   rho0 = ell.a * np.sqrt(C - n * q0) / n
+   return n, C, rho0
+
+def _AlbersForward(crs, lam, phi):
+   ell = crs.ellipsoid
+   n, C, rho0 = _AlbersConstants(crs)
+   rho = ell.a * np.sqrt(C - n * _AlbersQ(ell, phi)) / n
+   theta = n * (lam - np.radians(crs.lon0))
+   return crs.falseEasting + rho * np.sin(theta), crs.falseNorthing + rho0 - rho * np.cos(theta)
+
+def _AlbersInverse(crs, x, y):
+   ell = crs.ellipsoid
+   e, e2 = ell.e, ell.e2
+   n, C, rho0 = _AlbersConstants(crs)
+   x = np.asarray(x, dtype = np.float64) - crs.falseEasting
+   y = np.asarray(y, dtype = np.float64) - crs.falseNorthing
+   sign = np.sign(n)
+   rho = sign * np.hypot(x, rho0 - y)
+   theta = np.arctan2(sign * x, sign * (rho0 - y))
+   q = (C - (rho * n / ell.a)**2) / n
+   phi = np.arcsin(np.clip(q / 2, -1, 1))
+   for i in range(15): # Converges to well under a millimeter in a few iterations
+      s = np.sin(phi)
+      phi = phi + ((1 - e2 * s**2)**2 / (2 * np.cos(phi))) * (q / (1 - e2) - s / (1 - e2 * s**2)
+                   + (1 / (2*e)) * np.log((1 - e*s) / (1 + e*s)))
+   return np.radians(crs.lon0) + theta / n, phi
+
+# --- Lambert Conformal Conic, two standard parallels (Snyder 15-1 to 15-11) --------------
+
+def _LCCT(ell, phi):
+   e = ell.e
+   s = np.sin(phi)
+   return np.tan(np.pi/4 - phi/2) / ((1 - e*s) / (1 + e*s))**(e/2)
+
+def _LCCConstants(crs):
+   ell = crs.ellipsoid
+   phi0, phi1, phi2 = np.radians([crs.lat0, crs.lat1, crs.lat2])
+   m1, m2 = _ConicM(ell, phi1), _ConicM(ell, phi2)
+   t0, t1, t2 = _LCCT(ell, phi0), _LCCT(ell, phi1), _LCCT(ell, phi2)
+   n = (np.log(m1) - np.log(m2)) / (np.log(t1) - np.log(t2)) if phi1 != phi2 else np.sin(phi1)
+   F = m1 / (n * t1**n)
+   rho0 = ell.a * F * t0**n
+   return n, F, rho0
+
+def _LCCForward(crs, lam, phi):
+   ell = crs.ellipsoid
+   n, F, rho0 = _LCCConstants(crs)
+   rho = ell.a * F * _LCCT(ell, phi)**n
+   theta = n * (lam - np.radians(crs.lon0))
+   return crs.falseEasting + rho * np.sin(theta), crs.falseNorthing + rho0 - rho * np.cos(theta)
+
+def _LCCInverse(crs, x, y):
+   ell = crs.ellipsoid
+   e = ell.e
+   n, F, rho0 = _LCCConstants(crs)
+   x = np.asarray(x, dtype = np.float64) - crs.falseEasting
+   y = np.asarray(y, dtype = np.float64) - crs.falseNorthing
+   sign = np.sign(n)
+   rho = sign * np.hypot(x, rho0 - y)
+   t = (rho / (ell.a * F))**(1 / n)
+   theta = np.arctan2(sign * x, sign * (rho0 - y))
+   phi = np.pi/2 - 2 * np.arctan(t)
+   for i in range(15):
+      s = np.sin(phi)
+      phi = np.pi/2 - 2 * np.arctan(t * ((1 - e*s) / (1 + e*s))**(e/2))
+   return np.radians(crs.lon0) + theta / n, phi
+
+_PROJECTIONS = {'tmerc': (_TMForward, _TMInverse),
+                'aea': (_AlbersForward, _AlbersInverse),
+                'lcc': (_LCCForward, _LCCInverse)}
+
+# --- Datum shifts ---------------------------------------------------------------------
+
+def GeodeticToGeocentric(ell, lon, lat, h = 0.0):
+   '''Converts geodetic coordinates (degrees, meters) to geocentric X, Y, Z (meters).'''
+   lam, phi = np.radians(lon), np.radians(lat)
+   s = np.sin(phi)
+   N = ell.a / np.sqrt(1 - ell.e2 * s**2)
+   X = (N + h) * np.cos(phi) * np.cos(lam)
+   Y = (N + h) * np.cos(phi) * np.sin(lam)
+   Z = (N * (1 - ell.e2) + h) * s
+   return X, Y, Z
+
+def GeocentricToGeodetic(ell, X, Y, Z):
+   '''Converts geocentric X, Y, Z (meters) to geodetic longitude, latitude (degrees) and
+   ellipsoidal height (meters).'''
+   p = np.hypot(X, Y)
+   lam = np.arctan2(Y, X)
+   phi = np.arctan2(Z, p * (1 - ell.e2))
+   for i in range(5):
+      N = ell.a / np.sqrt(1 - ell.e2 * np.sin(phi)**2)
+      h = p / np.cos(phi) - N
+      phi = np.arctan2(Z, p * (1 - ell.e2 * N / (N + h)))
+   N = ell.a / np.sqrt(1 - ell.e2 * np.sin(phi)**2)
+   h = p / np.cos(phi) - N
+   return np.degrees(lam), np.degrees(phi), h
+
+def ShiftDatum(lon, lat, transformation):
+   '''Applies a Helmert datum transformation (or a chain of them) to geographic coordinates
+   (degrees).'''
+   fromEll = ELLIPSOIDS[DATUMS[transformation.fromDatum]]
+   toEll = ELLIPSOIDS[DATUMS[transformation.toDatum]]
+   X, Y, Z = GeodeticToGeocentric(fromEll, lon, lat)
+   X, Y, Z = transformation.Apply(X, Y, Z)
+   lon2, lat2, h = GeocentricToGeodetic(toEll, X, Y, Z)
+   return lon2, lat2
+
+# --- Public entry points ----------------------------------------------------------------
+
+def Transform(x, y, fromCRS, toCRS, transformation = None):
+   '''Transforms coordinate arrays from one coordinate system to another.  If the datums
+   differ, transformation may be a Helmert or TransformationChain object, the name of one,
+   or None for the default from ChooseTransformation.  Returns a tuple (x, y) of float64 arrays.'''
+   x = np.asarray(x, dtype = np.float64)
+   y = np.asarray(y, dtype = np.float64)
+   lon, lat = fromCRS.Inverse(x, y)
+   if fromCRS.datum != toCRS.datum:
+      if not isinstance(transformation, (Helmert, TransformationChain)):
+         transformation = ChooseTransformation(fromCRS.datum, toCRS.datum, transformation)
+      lon, lat = ShiftDatum(lon, lat, transformation)
+   return toCRS.Forward(lon, lat)
+
+def TransformBatch(layers, fromCRS, toCRS, transformation = None):
+   '''Transforms many layers in one call.  Layers is a list of (x, y) array pairs; returns
+   a list of transformed (x, y) pairs in the same order.'''
+   if not layers:
+      return list()
+   sizes = [np.size(x) for x, y in layers]
+   xs = np.concatenate([np.ravel(x) for x, y in layers])
+   ys = np.concatenate([np.ravel(y) for x, y in layers])
+   xOut, yOut = Transform(xs, ys, fromCRS, toCRS, transformation)
+   bounds = np.cumsum([0] + sizes)
+   return [(xOut[bounds[i]:bounds[i+1]].reshape(np.shape(x)), yOut[bounds[i]:bounds[i+1]].reshape(np.shape(y)))
+           for i, (x, y) in enumerate(layers)]
+
+def ProjectPointFeatures(inFC, outFC, fromCRS, toCRS, outSpatialRef, transformation = None, fields = None):
+   '''Reprojects a point feature class with the array engine:  reads all points in one pass,
+   transforms them at once, and writes a new feature class with outSpatialRef.'''
+   import arcpy
+   fields = list(fields or [])
+   arr = arcpy.da.FeatureClassToNumPyArray(inFC, ['SHAPE@X', 'SHAPE@Y'] + fields)
+   x, y = Transform(arr['SHAPE@X'], arr['SHAPE@Y'], fromCRS, toCRS, transformation)
+   arr['SHAPE@X'] = x
+   arr['SHAPE@Y'] = y
+   arcpy.da.NumPyArrayToFeatureClass(arr, outFC, ['SHAPE@X', 'SHAPE@Y'], outSpatialRef)
+   return outFC
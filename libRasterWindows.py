@@ -0,0 +1,335 @@
+# ----------------------------------------------------------------------------------------
+# libRasterWindows.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Pixel-aligned windows on a raster grid, and readers/writers that move windows of cells
+# between rasters and NumPy arrays.  Readers and writers are small picklable objects
+# holding only paths, so they can be handed to worker processes.
+
+# Usage Tips:
+# Windows are given in cells as (row0, col0, nRows, nCols), with row 0 at the northern
+# edge of the grid, matching arcpy.RasterToNumPyArray.  Readers return float32 arrays with
+# NaN in NoData cells, or boolean presence masks.
+#     NpyRaster and RawRaster work on .npy and headerless binary files and need no arcpy.  ArcRaster imports arcpy only when
+# it is actually used.
+
+# Dependencies:
+# numpy; arcpy for ArcRaster and ArcUnitWriter only
+# ----------------------------------------------------------------------------------------
+
+import os
+import numpy as np
+
+class Window(object):
+   '''A rectangular block of cells on a raster grid.'''
+   def __init__(self, row0, col0, nRows, nCols):
+      self.row0 = int(row0)
+      self.col0 = int(col0)
+      self.nRows = int(nRows)
+      self.nCols = int(nCols)
+
+   def __repr__(self):
+      return 'Window(%s, %s, %s, %s)' % (self.row0, self.col0, self.nRows, self.nCols)
+
+   def __eq__(self, other):
+      return isinstance(other, Window) and self.Tuple() == other.Tuple()
+
+   def __ne__(self, other):
+      return not self.__eq__(other)
+
+   def __hash__(self):
+      return hash(self.Tuple())
+
+   def Tuple(self):
+      return (self.row0, self.col0, self.nRows, self.nCols)
+
+   def Slices(self):
+      '''Returns (row slice, column slice) for indexing a full-grid array.'''
+      return (slice(self.row0, self.row0 + self.nRows), slice(self.col0, self.col0 + self.nCols))
+
+   def Expand(self, halo, grid):
+      '''Grows the window by halo cells on every side, clipped to the grid.'''
+      r0 = max(0, self.row0 - halo)
+      c0 = max(0, self.col0 - halo)
+      r1 = min(grid.nRows, self.row0 + self.nRows + halo)
+      c1 = min(grid.nCols, self.col0 + self.nCols + halo)
+      return Window(r0, c0, r1 - r0, c1 - c0)
+
+   def Intersect(self, other):
+      '''Returns the window common to this one and another, or None if they do not overlap.'''
+      r0, c0 = max(self.row0, other.row0), max(self.col0, other.col0)
+      r1 = min(self.row0 + self.nRows, other.row0 + other.nRows)
+      c1 = min(self.col0 + self.nCols, other.col0 + other.nCols)
+      if r1 <= r0 or c1 <= c0:
+         return None
+      return Window(r0, c0, r1 - r0, c1 - c0)
+
+   def RelativeTo(self, outer):
+      '''Returns (row slice, column slice) locating this window within an enclosing window.'''
+      r0 = self.row0 - outer.row0
+      c0 = self.col0 - outer.col0
+      return (slice(r0, r0 + self.nRows), slice(c0, c0 + self.nCols))
+
+class RasterGrid(object):
+   '''Georeferencing of a north-up raster:  upper-left corner, cell size and dimensions.'''
+   def __init__(self, xMin, yMax, cellSize, nRows, nCols):
+      self.xMin = float(xMin)
+      self.yMax = float(yMax)
+      self.cellSize = float(cellSize)
+      self.nRows = int(nRows)
+      self.nCols = int(nCols)
+
+   def __repr__(self):
+      return 'RasterGrid(%s, %s, %s, %s, %s)' % (self.xMin, self.yMax, self.cellSize, self.nRows, self.nCols)
+
+   def WindowForExtent(self, xMin, yMin, xMax, yMax, halo = 0):
+      '''Returns the smallest window covering a map extent, snapped outward to cell edges,
+      grown by halo cells and clipped to the grid.  Returns None if the extent misses the grid.'''
+      cs = self.cellSize
+      c0 = int(np.floor((xMin - self.xMin) / cs + 1e-9)) - halo
+      c1 = int(np.ceil((xMax - self.xMin) / cs - 1e-9)) + halo
+      r0 = int(np.floor((self.yMax - yMax) / cs + 1e-9)) - halo
+      r1 = int(np.ceil((self.yMax - yMin) / cs - 1e-9)) + halo
+      c0, r0 = max(0, c0), max(0, r0)
+      c1, r1 = min(self.nCols, c1), min(self.nRows, r1)
+      if c1 <= c0 or r1 <= r0:
+         return None
+      return Window(r0, c0, r1 - r0, c1 - c0)
+
+   def ExtentOf(self, window):
+      '''Returns the map extent (xMin, yMin, xMax, yMax) of a window.'''
+      x, y = self.LowerLeft(window)
+      return (x, y, x + window.nCols * self.cellSize, y + window.nRows * self.cellSize)
+
+   def LowerLeft(self, window):
+      '''Returns the map coordinates (x, y) of the lower-left corner of a window.'''
+      x = self.xMin + window.col0 * self.cellSize
+      y = self.yMax - (window.row0 + window.nRows) * self.cellSize
+      return (x, y)
+
+class NpyRaster(object):
+   '''A raster stored as a 2-D .npy file, read through a memory map.  NoData is NaN for
+   float data, or the given nodata value.'''
+   threadSafe = True # NumPy only, so it can be used from a background thread (see libPrefetch.py)
+   def __init__(self, path, grid, nodata = None):
+      self.path = path
+      self.grid = grid
+      self.nodata = nodata
+
+   def _Array(self):
+      return np.load(self.path, mmap_mode = 'r')
+
+   def Read(self, window, grid = None):
+      '''Returns the window as float32, with NaN in NoData cells.  The file is assumed to
+      share the reference grid, so grid is accepted only for compatibility with ArcRaster.'''
+      rows, cols = window.Slices()
+      block = np.array(self._Array()[rows, cols], dtype = np.float32)
+      if self.nodata is not None:
+         block[block == self.nodata] = np.nan
+      return block
+
+   def ReadMask(self, window, grid = None):
+      '''Returns a boolean array that is True wherever the window has data.'''
+      return ~np.isnan(self.Read(window))
+
+class RawRaster(NpyRaster):
+   '''A raster stored as a headerless binary file of cells in row-major order (e.g. the
+   .flt/.bil layout), read through a memory map.  The grid supplies the dimensions.'''
+   def __init__(self, path, grid, dtype = 'float32', nodata = None):
+      NpyRaster.__init__(self, path, grid, nodata)
+      self.dtype = dtype
+
+   def _Array(self):
+      return np.memmap(self.path, dtype = self.dtype, mode = 'r',
+                       shape = (self.grid.nRows, self.grid.nCols))
+
+class ArcRaster(object):
+   '''A raster dataset read through arcpy.RasterToNumPyArray.'''
+   threadSafe = False # arcpy calls must stay on the main thread
+   def __init__(self, path):
+      self.path = path
+      self._grid = None
+      self._nodata = None
+
+   def _Describe(self):
+      import arcpy
+      desc = arcpy.Describe(self.path)
+      ext = desc.extent
+      self._grid = RasterGrid(ext.XMin, ext.YMax, desc.meanCellWidth, desc.height, desc.width)
+      self._nodata = desc.noDataValue
+
+   @property
+   def grid(self):
+      if self._grid is None:
+         self._Describe()
+      return self._grid
+
+   def _ReadRaw(self, window, grid):
+      import arcpy
+      if self._grid is None:
+         self._Describe()
+      x, y = grid.LowerLeft(window)
+      # Nudge the corner inward by a fraction of a cell so it falls unambiguously in the
+      # intended cell when this raster's grid is snapped to the reference grid.
+      nudge = 0.001 * grid.cellSize
+      return arcpy.RasterToNumPyArray(self.path, arcpy.Point(x + nudge, y + nudge),
+                                      window.nCols, window.nRows)
+
+   def Read(self, window, grid = None):
+      '''Returns the window, defined on grid (default: this raster's own grid), as float32
+      with NaN in NoData cells.'''
+      grid = grid or self.grid
+      raw = self._ReadRaw(window, grid)
+      block = np.array(raw, dtype = np.float32)
+      if self._nodata is not None:
+         block[raw == self._nodata] = np.nan
+      return block
+
+   def ReadMask(self, window, grid = None):
+      '''Returns a boolean array that is True wherever the window has data.'''
+      grid = grid or self.grid
+      raw = self._ReadRaw(window, grid)
+      if self._nodata is None:
+         return np.ones(raw.shape, dtype = bool)
+      return raw != self._nodata
+
+class NpyMosaicWriter(object):
+   '''Writes unit results into a single full-grid float32 file, initialized to NaN, through
+   a memory map.  Paths ending in .npy get a .npy header; anything else is written as a
+   headerless binary file readable by RawRaster.  With append = True, an existing file of
+   the right size is updated in place rather than overwritten (e.g. when resuming a run).'''
+   threadSafe = True # NumPy only, so it can be used from a background thread (see libPrefetch.py)
+   def __init__(self, path, grid, append = False):
+      self.path = path
+      self.grid = grid
+      self.append = append
+      self._out = None
+
+   def Open(self):
+      shape = (self.grid.nRows, self.grid.nCols)
+      if self.append and os.path.exists(self.path):
+         if self.path.lower().endswith('.npy'):
+            self._out = np.load(self.path, mmap_mode = 'r+')
+         else:
+            self._out = np.memmap(self.path, dtype = np.float32, mode = 'r+', shape = shape)
+         if self._out.shape == shape:
+            return self
+         raise ValueError('%s does not match the grid dimensions %s' % (self.path, shape))
+      if self.path.lower().endswith('.npy'):
+         self._out = np.lib.format.open_memmap(self.path, mode = 'w+', dtype = np.float32, shape = shape)
+      else:
+         self._out = np.memmap(self.path, dtype = np.float32, mode = 'w+', shape = shape)
+      self._out[:] = np.nan
+      return self
+
+   def Write(self, unitID, window, block):
+      '''Writes a block; returns the number of bytes written.'''
+      rows, cols = window.Slices()
+      self._out[rows, cols] = np.where(np.isnan(block), self._out[rows, cols], block)
+      return block.size * 4
+
+   def Close(self):
+      if self._out is not None:
+         self._out.flush()
+         self._out = None
+      return self.path
+
+class ArcUnitWriter(object):
+   '''Writes each unit's result to its own raster (e.g. rdBeers_<unit>) in a geodatabase,
+   then optionally mosaics them into a single raster on Close.'''
+   threadSafe = False # arcpy calls must stay on the main thread
+   def __init__(self, outGDB, prefix, grid, spatialRef, mosaicName = None):
+      self.outGDB = outGDB
+      self.prefix = prefix
+      self.grid = grid
+      self.spatialRef = spatialRef
+      self.mosaicName = mosaicName
+      self.written = list()
+
+   def Open(self):
+      return self
+
+   def Write(self, unitID, window, block):
+      '''Writes a block to its own raster; returns the number of bytes written (the block as
+      float32, before any compression by the geodatabase).'''
+      import arcpy
+      x, y = self.grid.LowerLeft(window)
+      cs = self.grid.cellSize
+      outRaster = self.outGDB + os.sep + self.prefix + str(unitID)
+      ras = arcpy.NumPyArrayToRaster(block, arcpy.Point(x, y), cs, cs, np.nan)
+      ras.save(outRaster)
+      arcpy.DefineProjection_management(outRaster, self.spatialRef)
+      self.written.append(outRaster)
+      return block.size * 4
+
+   def Close(self):
+      if not (self.mosaicName and self.written):
+         return None
+      import arcpy
+      arcpy.MosaicToNewRaster_management(self.written, self.outGDB, self.mosaicName,
+                                         self.spatialRef, '32_BIT_FLOAT', self.grid.cellSize, 1)
+      return self.outGDB + os.sep + self.mosaicName
+
+def FolderSize(path):
+   '''Returns the total size in bytes of all files under a folder (e.g. a file geodatabase).'''
+   total = 0
+   for root, dirs, files in os.walk(path):
+      for f in files:
+         try:
+            total += os.path.getsize(os.path.join(root, f))
+         except OSError:
+            pass # File was removed while walking
+   return total
+
+_PIXEL_BITS = {'U1': 1, 'U2': 2, 'U4': 4, 'U8': 8, 'S8': 8, 'U16': 16, 'S16': 16,
+               'U32': 32, 'S32': 32, 'F32': 32, 'F64': 64}
+
+def RasterBytes(path):
+   '''Returns the size in bytes of a raster's cells (width x height x bands x pixel size),
+   before any compression.  Only the raster's properties are read, not the folder holding
+   it, so this stays cheap however large the geodatabase grows.'''
+   import arcpy
+   r = arcpy.Raster(path)
+   return (r.width * r.height * r.bandCount * _PIXEL_BITS.get(r.pixelType, 32) + 7) // 8
+
+class Checkpointer(object):
+   '''Decides which intermediate arrays are persisted, and keeps a tally of bytes written.
+   Policies, from least to most output:
+      NONE - nothing but the final products
+      FINAL - also each unit's final result over its whole buffered window
+      STAGE - also the output of each stage (initial Beers, burned Beers, NoAspect mask)
+      ITERATION - also the result of every neighborhood radius in the fill loop
+   Arrays are saved as .npy files in folder.'''
+   LEVELS = {'NONE': 0, 'FINAL': 1, 'STAGE': 2, 'ITERATION': 3}
+
+   def __init__(self, policy = 'NONE', folder = None):
+      policy = (policy or 'NONE').upper()
+      if policy not in self.LEVELS:
+         raise ValueError('Unknown checkpoint policy %s; expected one of %s' % (policy, sorted(self.LEVELS)))
+      if self.LEVELS[policy] > 0 and not folder:
+         raise ValueError('A checkpoint folder is required for policy %s' % policy)
+      self.policy = policy
+      self.folder = folder
+      self.bytesWritten = 0
+
+   def Wants(self, level):
+      '''Returns True if the policy persists intermediates at the given level.'''
+      return self.LEVELS[self.policy] >= self.LEVELS[level]
+
+   def Save(self, name, array, level):
+      '''Saves the array as <folder>/<name>.npy if the policy calls for it.'''
+      if not self.Wants(level):
+         return None
+      if not os.path.isdir(self.folder):
+         try:
+            os.makedirs(self.folder)
+         except OSError:
+            pass # Another worker got there first
+      path = os.path.join(self.folder, name + '.npy')
+      np.save(path, array)
+      self.bytesWritten += os.path.getsize(path)
+      return path
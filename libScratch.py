@@ -0,0 +1,320 @@
+# ----------------------------------------------------------------------------------------
+# libScratch.py
+# Version:  Python 2.7 / 3.x (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-16
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# A scratch workspace manager, so that concurrent jobs (and the workers of one job) never
+# collide on intermediate names such as clipDEM, and so that scratch data does not pile up
+# when a step fails.  Each ScratchWorkspace is a private folder (with a file geodatabase in
+# it when arcpy is available) that hands out unique names, keeps track of the bytes it
+# holds, enforces a quota, and deletes everything when the with-block exits, whether or not
+# an exception was raised.
+
+# Usage Tips:
+# The private folder is named scratch_<host>_<process id>_<random>, and each name handed out
+# carries the workspace's tag (e.g. a worker or unit ID) and a counter, so names cannot
+# collide even when many jobs share one root folder.  Within the with-block,
+# arcpy.env.scratchWorkspace points at the private geodatabase, so that Spatial Analyst's
+# temporary rasters land there too and are removed with it.
+#     If expectedBytes is given, the data is placed in the fastest location it fits:  the
+# arcpy in_memory workspace (if inMemory is True, since only the creating process can see
+# it), then a RAM-backed folder (tmpfs, e.g. /dev/shm), then the root folder on disk.
+#     Unit(tag) opens a nested workspace for one unit, whose names are deleted when the unit
+# is done, so that scratch never holds more than one unit's worth of data.  Given the unit's
+# expected size, it too goes to in_memory when that fits.
+#     A process that is killed cannot clean up after itself; SweepStale removes the scratch
+# folders left under a root by processes that are no longer running.
+
+# Dependencies:
+# libRasterWindows.py (FolderSize); arcpy for the geodatabase and in_memory workspaces
+
+# Syntax:
+# with ScratchWorkspace(root, tag = 'w1', quota = 10 * 2**30) as scratch:
+#    clipDEM = scratch.Name('clipDEM'); ...; scratch.Check()
+# ----------------------------------------------------------------------------------------
+
+import os, sys, re, json, shutil, socket, uuid, time
+from libRasterWindows import FolderSize
+
+PREFIX = 'scratch_'
+TMPFS_PATHS = ('/dev/shm',)
+_OWNER = 'owner.json'
+
+class ScratchQuotaError(RuntimeError):
+   '''Raised when a scratch workspace holds more than its quota.'''
+   pass
+
+def _HaveArcpy():
+   try:
+      import arcpy
+      return True
+   except ImportError:
+      return False
+
+def FreeBytes(path):
+   '''Returns the free space in bytes on the volume holding path, or None if unknown.'''
+   try:
+      st = os.statvfs(path)
+      return st.f_bavail * st.f_frsize
+   except (AttributeError, OSError):
+      pass
+   try:
+      import ctypes
+      free = ctypes.c_ulonglong(0)
+      if ctypes.windll.kernel32.GetDiskFreeSpaceExW(ctypes.c_wchar_p(path), ctypes.byref(free), None, None):
+         return int(free.value)
+   except Exception:
+      pass
+   return None
+
+def AvailableMemory():
+   '''Returns the physical memory available to new allocations in bytes, or None if unknown.'''
+   try:
+      with open('/proc/meminfo') as f:
+         for line in f:
+            if line.startswith('MemAvailable:'):
+               return int(line.split()[1]) * 1024
+   except (IOError, OSError, ValueError):
+      pass
+   try:
+      import ctypes
+      class MEMORYSTATUSEX(ctypes.Structure):
+         _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong)] + \
+                    [(name, ctypes.c_ulonglong) for name in
+                     ('ullTotalPhys', 'ullAvailPhys', 'ullTotalPageFile', 'ullAvailPageFile',
+                      'ullTotalVirtual', 'ullAvailVirtual', 'ullAvailExtendedVirtual')]
+      status = MEMORYSTATUSEX()
+      status.dwLength = ctypes.sizeof(status)
+      if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+         return int(status.ullAvailPhys)
+   except Exception:
+      pass
+   return None
+
+def ChooseLocation(root, expectedBytes = None, inMemory = True, headroom = 0.5):
+   '''Returns 'in_memory', a tmpfs folder, or root:  the fastest place where expectedBytes
+   fits in the given fraction (headroom) of the free memory or space.  Without
+   expectedBytes, returns root.'''
+   if not expectedBytes:
+      return root
+   memory = AvailableMemory()
+   if inMemory and memory is not None and expectedBytes <= memory * headroom and _HaveArcpy():
+      return 'in_memory'
+   for path in TMPFS_PATHS:
+      free = FreeBytes(path) if os.path.isdir(path) else None
+      if free is not None and expectedBytes <= free * headroom:
+         return path
+   return root
+
+def _ProcessAlive(pid):
+   if sys.platform.startswith('win'):
+      import ctypes
+      handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid) # PROCESS_QUERY_LIMITED_INFORMATION
+      if not handle:
+         return False
+      ctypes.windll.kernel32.CloseHandle(handle)
+      return True
+   try:
+      os.kill(pid, 0)
+   except OSError as e:
+      return e.errno == 1 # EPERM: the process exists but belongs to someone else
+   return True
+
+def _Remove(path, tries = 3):
+   '''Deletes a folder, retrying briefly in case ArcGIS still holds a lock on it.  Returns
+   True if it is gone.'''
+   for i in range(tries):
+      shutil.rmtree(path, ignore_errors = True)
+      if not os.path.exists(path):
+         return True
+      time.sleep(0.5 * (i + 1))
+   return False
+
+def SweepStale(root):
+   '''Removes the scratch folders under root that were left by processes on this host which
+   are no longer running.  Returns the number of bytes freed.'''
+   freed = 0
+   if not os.path.isdir(root):
+      return freed
+   host = socket.gethostname()
+   for name in os.listdir(root):
+      path = os.path.join(root, name)
+      if not (name.startswith(PREFIX) and os.path.isdir(path)):
+         continue
+      try:
+         with open(os.path.join(path, _OWNER)) as f:
+            owner = json.load(f)
+      except (IOError, OSError, ValueError):
+         continue # Not ours, or still being created
+      if owner.get('host') != host or _ProcessAlive(owner.get('pid')):
+         continue
+      size = FolderSize(path)
+      if _Remove(path):
+         freed += size
+   return freed
+
+def _CleanTag(tag):
+   '''Makes a tag safe for geodatabase names:  letters, digits and underscores.'''
+   return re.sub(r'\W', '_', str(tag)) if tag is not None else ''
+
+class ScratchWorkspace(object):
+   '''A private scratch workspace under root (default:  the system temporary folder) that is
+   deleted on exit.  Tag is added to every name (e.g. a worker or unit ID).  Quota, in
+   bytes, is enforced by Check; expectedBytes lets the workspace go to memory or tmpfs if
+   the data fits (see ChooseLocation).'''
+   def __init__(self, root = None, tag = None, quota = None, expectedBytes = None, inMemory = True,
+                useGDB = None, keep = False):
+      import tempfile
+      self.root = root or tempfile.gettempdir()
+      self.tag = _CleanTag(tag)
+      self.quota = quota
+      self.expectedBytes = expectedBytes
+      self.inMemory = inMemory
+      self.useGDB = _HaveArcpy() if useGDB is None else useGDB
+      self.keep = keep # Leave the data in place on exit, e.g. for debugging
+      self.folder = None # Private folder
+      self.gdb = None # Private file geodatabase, if arcpy is available
+      self.path = None # Where names are created:  in_memory, the geodatabase or the folder
+      self.names = list() # Names handed out and not yet deleted
+      self.peakBytes = 0
+      self._parent = None
+      self._savedEnv = None
+      self._counter = 0
+
+   def __enter__(self):
+      return self.Open()
+
+   def __exit__(self, excType, excValue, tb):
+      self.Close()
+      return False # Exceptions are not swallowed
+
+   def Open(self):
+      '''Creates the workspace.  Returns self.'''
+      if self._parent is not None:
+         # A unit shares its parent's folder and geodatabase
+         parent = self._parent
+         self.folder, self.gdb, self.path = parent.folder, parent.gdb, parent.path
+         if self.inMemory and ChooseLocation(None, self.expectedBytes, True) == 'in_memory':
+            self.path = 'in_memory'
+         return self
+      location = ChooseLocation(self.root, self.expectedBytes, self.inMemory)
+      base = self.root if location == 'in_memory' else location
+      if not os.path.isdir(base):
+         os.makedirs(base)
+      self.folder = os.path.join(base, '%s%s_%d_%s' % (PREFIX, _CleanTag(socket.gethostname()), os.getpid(),
+                                                      uuid.uuid4().hex[:8]))
+      os.makedirs(self.folder)
+      with open(os.path.join(self.folder, _OWNER), 'w') as f:
+         json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'created': time.time(), 'tag': self.tag}, f)
+      self.path = self.folder
+      if self.useGDB:
+         import arcpy
+         arcpy.CreateFileGDB_management(self.folder, 'scratch.gdb')
+         self.gdb = os.path.join(self.folder, 'scratch.gdb')
+         self.path = self.gdb
+         self._savedEnv = arcpy.env.scratchWorkspace
+         arcpy.env.scratchWorkspace = self.gdb
+      if location == 'in_memory':
+         self.path = 'in_memory'
+      return self
+
+   def Name(self, base):
+      '''Returns a full path, unique to this workspace, for a new dataset named after base.'''
+      owner = self._parent or self
+      owner._counter += 1
+      parts = [_CleanTag(base)] + ([self.tag] if self.tag else list()) + [str(owner._counter)]
+      name = '_'.join(parts)
+      if self.path == 'in_memory':
+         # in_memory is shared by the whole process, so names also carry the folder's unique suffix
+         name = '%s_%s' % (name, os.path.basename(self.folder)[-8:])
+      full = os.path.join(self.path, name) if self.path != 'in_memory' else 'in_memory' + os.sep + name
+      self.names.append(full)
+      if self._parent is not None:
+         self._parent.names.append(full)
+      return full
+
+   def Delete(self, name):
+      '''Deletes one dataset handed out by Name, if it exists.'''
+      if self.useGDB or name.startswith('in_memory'):
+         import arcpy
+         if arcpy.Exists(name):
+            arcpy.Delete_management(name)
+      else:
+         for path in (name, name + '.npy'):
+            if os.path.isfile(path):
+               os.remove(path)
+            elif os.path.isdir(path):
+               shutil.rmtree(path, ignore_errors = True)
+      for ws in (self, self._parent):
+         if ws is not None and name in ws.names:
+            ws.names.remove(name)
+
+   def BytesUsed(self):
+      '''Returns the bytes held on disk (or tmpfs) by the workspace.  Data in in_memory is
+      not counted.'''
+      if self.folder is None:
+         return 0
+      used = FolderSize(self.folder)
+      self.peakBytes = max(self.peakBytes, used)
+      return used
+
+   def Check(self):
+      '''Raises ScratchQuotaError if the workspace holds more than its quota, or if the
+      volume it is on is nearly full.  Returns the bytes used.'''
+      used = self.BytesUsed()
+      if self.quota is not None and used > self.quota:
+         raise ScratchQuotaError('Scratch workspace %s holds %d bytes, over its quota of %d' % (self.folder, used, self.quota))
+      free = FreeBytes(self.folder)
+      if free is not None and self.expectedBytes and free < self.expectedBytes:
+         raise ScratchQuotaError('Only %d bytes are free on the volume holding %s' % (free, self.folder))
+      return used
+
+   def Unit(self, tag, expectedBytes = None):
+      '''Returns a nested workspace, in the same place (or in_memory, if expectedBytes fits
+      there), whose names carry the tag and are deleted when it exits.'''
+      unit = ScratchWorkspace(self.root, '_'.join(t for t in (self.tag, _CleanTag(tag)) if t), self.quota,
+                              expectedBytes, self.inMemory, self.useGDB, self.keep)
+      unit._parent = self
+      return unit
+
+   def Close(self):
+      '''Deletes everything in the workspace (unless keep is set) and restores the arcpy
+      environment.  Safe to call more than once.'''
+      if self._parent is not None:
+         # A unit's names live in its parent's workspace; only they are removed
+         if self.keep:
+            return
+         for name in list(self.names):
+            try:
+               self.Delete(name)
+            except Exception:
+               pass
+         return
+      if self.folder is None:
+         return
+      self.BytesUsed()
+      if self.useGDB:
+         import arcpy
+         arcpy.env.scratchWorkspace = self._savedEnv
+         if not self.keep:
+            for name in list(self.names):
+               if name.startswith('in_memory'):
+                  try:
+                     arcpy.Delete_management(name)
+                  except Exception:
+                     pass
+            try:
+               arcpy.ClearWorkspaceCache_management()
+               arcpy.Delete_management(self.gdb) # Releases ArcGIS's locks before the folder is removed
+            except Exception:
+               pass
+      if not self.keep:
+         _Remove(self.folder)
+      self.folder = None
+      self.names = list()
+
+   def __repr__(self):
+      return 'ScratchWorkspace(%r, tag = %r)' % (self.path or self.root, self.tag)
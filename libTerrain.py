@@ -0,0 +1,222 @@
+# ----------------------------------------------------------------------------------------
+# libTerrain.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Fused terrain-derivative engine:  slope, aspect, Beers aspect, hillshade and curvature
+# from a single pass over the 3x3 neighborhoods of a DEM tile.  The eight neighbors of each
+# cell are gathered once, and every requested derivative is computed from the same
+# gradients, instead of one full-raster pass per derivative.
+
+# Usage Tips:
+# A TerrainEngine allocates all of its float32 working and output buffers up front, for
+# the largest tile it will be given, and reuses them for every tile, so nothing is
+# allocated per tile.  The arrays returned by Compute are views of those buffers and are
+# overwritten by the next call; copy them (or write them out) before computing the next
+# tile.  TerrainDerivatives is a one-off version that returns copies.
+#     The rules follow libBeersAspect.py and the ArcGIS tools:  gradients use the Horn
+# (1981) kernel, with the center elevation substituted for NoData or off-edge neighbors;
+# NoData cells are NaN in every output; flat cells are -1 in aspect and Beers aspect,
+# 0 in slope, and lit from straight above in hillshade.  Aspect and Beers aspect are
+# identical to HornAspect and BeersAspect in libBeersAspect.py.
+#     Slope is in degrees (or percent rise), hillshade is 0-255 (not rounded), and
+# curvature is that of the ArcGIS CURVATURE tool (Zevenbergen and Thorne 1987), in
+# hundredths of a z unit per cell, positive where the surface is convex.  zFactor applies
+# to slope, hillshade and curvature.
+#     DerivativeRange gives the range of values each derivative can take, for output
+# formats that store a fixed range (e.g. libChunkStore.py); slope in percent rise and
+# curvature are unbounded.
+#     To process a whole DEM in tiles, see StreamTerrain in libBeersStream.py; tiles need
+# a halo of one cell.
+
+# Dependencies:
+# numpy
+
+# Syntax:
+# engine = TerrainEngine((1024, 1024), cellSize, ['slope', 'beers', 'hillshade'])
+# out = engine.Compute(demTile, nodata)  # {name: float32 array}
+# ----------------------------------------------------------------------------------------
+
+import numpy as np
+from libBeersAspect import NOASPECT
+
+DERIVATIVES = ('slope', 'aspect', 'beers', 'hillshade', 'curvature')
+
+# The range of values of each bounded derivative, flat cells (NOASPECT) included
+_RANGES = {'slope': (0.0, 90.0), 'aspect': (NOASPECT, 360.0), 'beers': (NOASPECT, 2.0), 'hillshade': (0.0, 255.0)}
+
+def DerivativeRange(name, slopeUnits = 'DEGREE'):
+   '''Returns the range (vmin, vmax) of a derivative's values, or None if it is unbounded
+   (curvature, and slope in percent rise).'''
+   if name not in DERIVATIVES:
+      raise ValueError('Unknown derivative: %s' % name)
+   if name == 'slope' and slopeUnits != 'DEGREE':
+      return None
+   return _RANGES.get(name)
+
+# The 3x3 neighbors in the order the Horn sums are accumulated, as (row offset, column
+# offset, east-west role, north-south role); roles are (sign, weight), or None
+_NEIGHBORS = ((-1, -1, (-1, 1), (-1, 1)),  # a
+              (-1,  0, None,    (-1, 2)),  # b
+              (-1,  1, (1, 1),  (-1, 1)),  # c
+              ( 0, -1, (-1, 2), None),     # d
+              ( 0,  1, (1, 2),  None),     # f
+              ( 1, -1, (-1, 1), (1, 1)),   # g
+              ( 1,  0, None,    (1, 2)),   # h
+              ( 1,  1, (1, 1),  (1, 1)))   # i
+
+class TerrainEngine(object):
+   '''Computes the requested derivatives (any of DERIVATIVES) for DEM tiles of up to shape
+   (rows, columns), reusing preallocated buffers.  Azimuth and altitude, in degrees, set the
+   light source for hillshade; slopeUnits is 'DEGREE' or 'PERCENT_RISE'.'''
+   def __init__(self, shape, cellSize, derivatives = DERIVATIVES, zFactor = 1.0, azimuth = 315.0, altitude = 45.0,
+                slopeUnits = 'DEGREE'):
+      unknown = set(derivatives) - set(DERIVATIVES)
+      if unknown:
+         raise ValueError('Unknown derivatives: %s' % ', '.join(sorted(unknown)))
+      if slopeUnits not in ('DEGREE', 'PERCENT_RISE'):
+         raise ValueError("slopeUnits must be 'DEGREE' or 'PERCENT_RISE'")
+      self.shape = tuple(int(n) for n in shape)
+      self.cellSize = float(cellSize)
+      self.derivatives = tuple(d for d in DERIVATIVES if d in derivatives)
+      self.zFactor = float(zFactor)
+      self.azimuth = float(azimuth)
+      self.altitude = float(altitude)
+      self.slopeUnits = slopeUnits
+
+      nRows, nCols = self.shape
+      f32 = lambda: np.empty(self.shape, dtype = np.float32)
+      self._pad = np.full((nRows + 2, nCols + 2), np.nan, dtype = np.float32)
+      self._nbr = f32()
+      self._missing = np.empty(self.shape, dtype = bool)
+      self._flat = np.empty(self.shape, dtype = bool)
+      # East-west and north-south sums (positive and negative sides); the positive ones end up holding dz/dx and dz/dy
+      self._xPos, self._xNeg, self._yPos, self._yNeg = f32(), f32(), f32(), f32()
+      self._angle = f32() if self._Needs('aspect', 'beers', 'hillshade') else None
+      self._slope = f32() if self._Needs('slope', 'hillshade') else None # Slope in radians
+      self._work = f32() if self._Needs('hillshade') else None
+      self._cross = f32() if self._Needs('curvature') else None # Sum of the four edge neighbors
+      self._out = dict((name, f32()) for name in self.derivatives)
+
+   def _Needs(self, *names):
+      return any(name in self.derivatives for name in names)
+
+   def _Views(self, nRows, nCols):
+      '''Returns a function giving the top-left (nRows, nCols) view of a buffer.'''
+      if (nRows, nCols) == self.shape:
+         return lambda buf: buf
+      return lambda buf: buf[:nRows, :nCols] if buf is not None else None
+
+   def Compute(self, dem, nodata = None):
+      '''Computes the derivatives for a DEM tile (NaN, or True in the optional nodata mask,
+      for NoData).  Returns a dictionary of {name: float32 array}; the arrays are views of
+      the engine's buffers, valid until the next call.'''
+      nRows, nCols = np.shape(dem)
+      if nRows > self.shape[0] or nCols > self.shape[1]:
+         raise ValueError('Tile of %s x %s is larger than the engine (%s x %s)' % ((nRows, nCols) + self.shape))
+      V = self._Views(nRows, nCols)
+      pad = self._pad[:nRows + 2, :nCols + 2]
+      pad[0, :] = pad[-1, :] = np.nan # Off-edge neighbors are NoData
+      pad[:, 0] = pad[:, -1] = np.nan
+      z = pad[1:-1, 1:-1]
+      np.copyto(z, dem, casting = 'unsafe')
+      if nodata is not None:
+         np.copyto(z, np.nan, where = np.asarray(nodata, dtype = bool))
+
+      nbr, missing = V(self._nbr), V(self._missing)
+      xPos, xNeg, yPos, yNeg = V(self._xPos), V(self._xNeg), V(self._yPos), V(self._yNeg)
+      cross = V(self._cross)
+      started = set()
+      for dr, dc, xRole, yRole in _NEIGHBORS:
+         # Neighbor elevations, with the center value substituted for NoData/off-edge neighbors
+         np.copyto(nbr, pad[1 + dr:1 + dr + nRows, 1 + dc:1 + dc + nCols])
+         np.isnan(nbr, out = missing)
+         np.copyto(nbr, z, where = missing)
+         if cross is not None and (dr == 0) != (dc == 0):
+            if 'cross' in started:
+               np.add(cross, nbr, out = cross)
+            else:
+               np.copyto(cross, nbr)
+               started.add('cross')
+         for role, pos, neg, key in ((xRole, xPos, xNeg, 'x'), (yRole, yPos, yNeg, 'y')):
+            if role is None:
+               continue
+            sign, weight = role
+            if weight == 2:
+               np.multiply(nbr, np.float32(2.0), out = nbr) # Only ever used once with weight 2
+            acc = pos if sign > 0 else neg
+            if (key, sign) in started:
+               np.add(acc, nbr, out = acc)
+            else:
+               np.copyto(acc, nbr)
+               started.add((key, sign))
+
+      denom = np.float32(8.0 * self.cellSize)
+      dzdx = np.subtract(xPos, xNeg, out = xPos)
+      np.divide(dzdx, denom, out = dzdx)
+      dzdy = np.subtract(yPos, yNeg, out = yPos)
+      np.divide(dzdy, denom, out = dzdy)
+      flat = V(self._flat)
+      np.equal(dzdx, 0, out = flat)
+      np.equal(dzdy, 0, out = missing)
+      np.logical_and(flat, missing, out = flat)
+
+      out = dict((name, V(buf)) for name, buf in self._out.items())
+      angle = V(self._angle)
+      if angle is not None:
+         # Math angle of the downslope direction; compass aspect is 90 - angle
+         np.negative(dzdx, out = xNeg)
+         np.arctan2(dzdy, xNeg, out = angle)
+      if 'aspect' in out:
+         aspect = out['aspect']
+         np.degrees(angle, out = aspect)
+         np.greater(aspect, 90.0, out = missing)
+         np.subtract(np.float32(90.0), aspect, out = aspect)
+         np.add(aspect, np.float32(360.0), out = aspect, where = missing)
+         np.copyto(aspect, np.float32(NOASPECT), where = flat)
+      if 'beers' in out:
+         beers = out['beers']
+         np.subtract(angle, np.float32(np.pi/4), out = beers)
+         np.cos(beers, out = beers)
+         np.add(beers, np.float32(1.0), out = beers)
+         np.copyto(beers, np.float32(NOASPECT), where = flat)
+      slope = V(self._slope)
+      if slope is not None:
+         np.hypot(dzdx, dzdy, out = slope)
+         np.multiply(slope, np.float32(self.zFactor), out = slope)
+         if 'slope' in out and self.slopeUnits == 'PERCENT_RISE':
+            np.multiply(slope, np.float32(100.0), out = out['slope'])
+         np.arctan(slope, out = slope)
+         if 'slope' in out and self.slopeUnits == 'DEGREE':
+            np.degrees(slope, out = out['slope'])
+      if 'hillshade' in out:
+         # 255 * (cos(zenith) cos(slope) + sin(zenith) sin(slope) cos(azimuth - aspect)), in math angles
+         hs, work = out['hillshade'], V(self._work)
+         zenith = np.radians(90.0 - self.altitude)
+         azimuth = np.radians((450.0 - self.azimuth) % 360.0)
+         np.subtract(np.float32(azimuth), angle, out = hs)
+         np.cos(hs, out = hs)
+         np.sin(slope, out = work)
+         np.multiply(hs, work, out = hs)
+         np.multiply(hs, np.float32(np.sin(zenith)), out = hs)
+         np.cos(slope, out = work)
+         np.multiply(work, np.float32(np.cos(zenith)), out = work)
+         np.add(hs, work, out = hs)
+         np.multiply(hs, np.float32(255.0), out = hs)
+         np.maximum(hs, np.float32(0.0), out = hs) # NaN is kept
+      if 'curvature' in out:
+         # -2 (D + E) * 100, where D and E are the second differences across the cell, east-west and north-south
+         curv = out['curvature']
+         np.multiply(z, np.float32(4.0), out = curv)
+         np.subtract(cross, curv, out = curv)
+         np.multiply(curv, np.float32(-100.0 * self.zFactor / (self.cellSize * self.cellSize)), out = curv)
+      return out
+
+def TerrainDerivatives(dem, cellSize, derivatives = DERIVATIVES, nodata = None, **options):
+   '''Computes the requested derivatives for a whole DEM array in one pass.  Options are
+   those of TerrainEngine.  Returns a dictionary of {name: float32 array}.'''
+   engine = TerrainEngine(np.shape(dem), cellSize, derivatives, **options)
+   return dict((name, array.copy()) for name, array in engine.Compute(dem, nodata).items())
@@ -0,0 +1,84 @@
+# ----------------------------------------------------------------------------------------
+# libUnitManifest.py
+# Version:  Python 2.7 / 3.x with NumPy
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# A completion manifest for runs that process many units, so that an interrupted or
+# repeated run only recomputes units that are new, failed, or whose inputs have changed.
+
+# Usage Tips:
+# Each finished unit is appended to the manifest as one line of JSON, with a fingerprint
+# of everything its result depends on (e.g. the DEM window, burn window, boundary geometry,
+# nLimit and code version).  Lines are flushed as they are written, so the manifest
+# survives a crash part-way through a run.  If a unit appears more than once, the last
+# line wins.  Failed units are never recorded, so they are retried on the next run.  A
+# last line cut short by a crash is ignored, and the next record starts on a new line.
+
+# Syntax:
+# manifest = UnitManifest(path)
+# fp = Fingerprint(demArray, burnArray, nLimit, CODE_VERSION)
+# if not manifest.IsCurrent(unitID, fp): ... manifest.Record(unitID, fp)
+# ----------------------------------------------------------------------------------------
+
+import os, json, hashlib
+from datetime import datetime
+import numpy as np
+
+def Fingerprint(*parts):
+   '''Returns a hex digest of the given parts, which may be NumPy arrays, strings, numbers
+   or None.  Arrays contribute their shape, dtype and contents.'''
+   h = hashlib.sha1()
+   for part in parts:
+      if isinstance(part, np.ndarray):
+         h.update(('%s|%s|' % (part.shape, part.dtype)).encode('utf-8'))
+         h.update(np.ascontiguousarray(part).tobytes())
+      else:
+         h.update(('%r|' % (part,)).encode('utf-8'))
+   return h.hexdigest()
+
+class UnitManifest(object):
+   '''Per-unit completion records, backed by a JSON-lines file.'''
+   def __init__(self, path):
+      self.path = path
+      self.entries = dict()
+      self._newline = False # Whether the file ends part-way through a line
+      if os.path.exists(path):
+         with open(path, 'r') as f:
+            for line in f:
+               self._newline = not line.endswith('\n')
+               line = line.strip()
+               if not line:
+                  continue
+               try:
+                  entry = json.loads(line)
+               except ValueError:
+                  continue # A line cut short by a crash
+               self.entries[entry['unit']] = entry
+
+   def Get(self, unitID):
+      '''Returns the recorded entry for a unit, or None.'''
+      return self.entries.get(str(unitID))
+
+   def Fingerprint(self, unitID):
+      '''Returns the recorded fingerprint for a unit, or None.'''
+      entry = self.Get(unitID)
+      return entry['fingerprint'] if entry else None
+
+   def IsCurrent(self, unitID, fingerprint):
+      '''Returns True if the unit was completed with the same fingerprint.'''
+      return self.Fingerprint(unitID) == fingerprint
+
+   def Record(self, unitID, fingerprint, **info):
+      '''Records a completed unit, along with any extra information (e.g. limitReached).'''
+      entry = dict(info)
+      entry.update({'unit': str(unitID), 'fingerprint': fingerprint,
+                    'finished': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+      self.entries[entry['unit']] = entry
+      with open(self.path, 'a') as f:
+         f.write(('\n' if self._newline else '') + json.dumps(entry, sort_keys = True) + '\n')
+         self._newline = False
+         f.flush()
+         os.fsync(f.fileno())
@@ -0,0 +1,175 @@
+# ----------------------------------------------------------------------------------------
+# libUnitPlan.py
+# Version:  Python 2.7 / 3.x with NumPy (arcpy optional)
+# Creation Date: 2026-10-16
+# Last Edit: 2026-10-17
+# Creator:  Kirsten R. Hazler
+
+# Summary:
+# Prepares all processing units in one batch, instead of running MakeFeatureLayer, Buffer,
+# Clip and Describe for each unit in turn.  The units and the processing boundary are each
+# read once, the boundary polygons are indexed with an STR-tree (a packed R-tree), and each
+# unit's buffered-and-clipped geometry and pixel-aligned window on the DEM grid are computed
+# up front.  The resulting unit plan then drives processing directly.
+
+# Usage Tips:
+# The STR-tree works on bounding boxes only, and needs nothing but NumPy.  Clipping against
+# the boundary uses arcpy geometry methods, and only against the boundary polygons whose
+# boxes intersect the unit's buffered box.
+#     Rows with the same unit ID are unioned into one unit, as the original per-unit
+# selection by ID did.  Units that do not overlap the boundary get no geometry or window;
+# they are kept in the plan so that the caller can report them.
+#     The plan drives both processing modes of BeersAspect_BAK6.py:  the raster-algebra mode
+# clips to each unit's geometry, and the array mode reads each unit's window (see
+# libBeersParallel.PlanUnitJobs).
+
+# Dependencies:
+# numpy, libRasterWindows.py; arcpy for ReadPolygons and BuildUnitPlan
+
+# Syntax:
+# plan = BuildUnitPlan(inProcUnits, inFld, inBnd, buffDist, grid)
+# tree = STRTree(boxes); hits = tree.Query((xMin, yMin, xMax, yMax))
+# ----------------------------------------------------------------------------------------
+
+import numpy as np
+
+class STRTree(object):
+   '''A static R-tree over bounding boxes, packed by the Sort-Tile-Recursive algorithm
+   (Leutenegger et al. 1997).  Boxes is an (n, 4) array-like of (xMin, yMin, xMax, yMax).'''
+   def __init__(self, boxes, nodeCapacity = 16):
+      boxes = np.asarray(boxes, dtype = np.float64).reshape(-1, 4)
+      self.boxes = boxes
+      self.nodeCapacity = int(nodeCapacity)
+      # Leaf level:  item indices in STR order, grouped into nodes of nodeCapacity
+      self.order = self._Pack(boxes) if len(boxes) else np.zeros(0, dtype = np.int64)
+      self.levels = list() # Bounding boxes of the nodes at each level, from the leaves up
+      level = boxes[self.order]
+      while len(level) > 1 or not self.levels:
+         nodes = self._Bounds(level)
+         self.levels.append(nodes)
+         if len(nodes) <= 1:
+            break
+         level = nodes
+
+   def _Pack(self, boxes):
+      '''Returns the item order that tiles the boxes into vertical slices by x, then into
+      nodes by y within each slice.'''
+      n = len(boxes)
+      cx = (boxes[:, 0] + boxes[:, 2]) / 2
+      cy = (boxes[:, 1] + boxes[:, 3]) / 2
+      nNodes = int(np.ceil(n / float(self.nodeCapacity)))
+      nSlices = int(np.ceil(np.sqrt(nNodes)))
+      sliceSize = nSlices * self.nodeCapacity
+      byX = np.argsort(cx, kind = 'mergesort')
+      order = list()
+      for start in range(0, n, sliceSize):
+         s = byX[start:start + sliceSize]
+         order.append(s[np.argsort(cy[s], kind = 'mergesort')])
+      return np.concatenate(order)
+
+   def _Bounds(self, boxes):
+      '''Returns the bounding box of each consecutive group of nodeCapacity boxes.'''
+      k = self.nodeCapacity
+      n = len(boxes)
+      starts = np.arange(0, n, k)
+      return np.column_stack([np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                              np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)])
+
+   def __len__(self):
+      return len(self.boxes)
+
+   def Query(self, box):
+      '''Returns the indices (in input order) of the boxes that intersect the given box,
+      including those that only touch it.'''
+      if len(self.boxes) == 0:
+         return np.zeros(0, dtype = np.int64)
+      xMin, yMin, xMax, yMax = box
+      k = self.nodeCapacity
+      candidates = np.arange(len(self.levels[-1]))
+      for depth in range(len(self.levels) - 1, -1, -1):
+         nodes = self.levels[depth][candidates]
+         hit = (nodes[:, 0] <= xMax) & (nodes[:, 2] >= xMin) & (nodes[:, 1] <= yMax) & (nodes[:, 3] >= yMin)
+         candidates = candidates[hit]
+         # Expand the surviving nodes to their children at the level below
+         limit = len(self.levels[depth - 1]) if depth > 0 else len(self.order)
+         children = (candidates[:, None] * k + np.arange(k)[None, :]).ravel()
+         candidates = children[children < limit]
+      items = self.boxes[self.order[candidates]]
+      hit = (items[:, 0] <= xMax) & (items[:, 2] >= xMin) & (items[:, 1] <= yMax) & (items[:, 3] >= yMin)
+      return np.sort(self.order[candidates[hit]])
+
+class PlannedUnit(object):
+   '''One processing unit, prepared for processing:  its buffered-and-clipped geometry and
+   extent, and its interior and buffered windows on the DEM grid.  Geometry, extent and the
+   windows are None if the unit does not overlap the boundary (or the grid).'''
+   def __init__(self, unitID, shape = None):
+      self.unitID = unitID
+      self.shape = shape # Original unit geometry
+      self.geometry = None # Buffered and clipped to the boundary
+      self.extent = None # (xMin, yMin, xMax, yMax) of the geometry, snapped out to cell edges
+      self.interior = None # Window covering the unit itself
+      self.window = None # Window covering the buffered and clipped geometry
+
+   @property
+   def overlaps(self):
+      return self.geometry is not None
+
+   def Rectangle(self):
+      '''Returns the extent as the space-delimited string taken by Clip_management.'''
+      return '%s %s %s %s' % self.extent
+
+def _Box(extent):
+   return (extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+
+def ReadPolygons(fc, fields = None):
+   '''Reads all rows of a feature class in one pass, returning a list of tuples of the given
+   fields, with the geometry last.'''
+   import arcpy
+   with arcpy.da.SearchCursor(fc, list(fields or list()) + ['SHAPE@']) as cursor:
+      return [row for row in cursor]
+
+def GroupByUnit(rows):
+   '''Groups (unitID, shape) rows by unit ID, in order of first appearance, and returns a
+   list of (unitID, shape) pairs with the shapes of each unit unioned, as selecting the unit
+   by ID would give.'''
+   shapes = dict()
+   order = list()
+   for unitID, shape in rows:
+      if unitID in shapes:
+         shapes[unitID] = shapes[unitID].union(shape)
+      else:
+         shapes[unitID] = shape
+         order.append(unitID)
+   return [(unitID, shapes[unitID]) for unitID in order]
+
+def BuildUnitPlan(inProcUnits, inFld, inBnd, buffDist, grid = None):
+   '''Reads all processing units and the boundary once, and returns a list of PlannedUnit
+   objects, in the order of the unit feature class.  Rows sharing a unit ID make up a single
+   unit.  Each unit is buffered by buffDist and clipped to the boundary polygons found
+   through an STR-tree.  If the DEM grid (a libRasterWindows.RasterGrid) is given, extents
+   are snapped out to its cell edges and windows are set.'''
+   boundary = [row[-1] for row in ReadPolygons(inBnd)]
+   tree = STRTree([_Box(shape.extent) for shape in boundary])
+   plan = list()
+   for unitID, shape in GroupByUnit(ReadPolygons(inProcUnits, [inFld])):
+      unit = PlannedUnit(unitID, shape)
+      plan.append(unit)
+      buffered = shape.buffer(buffDist)
+      clipped = None
+      for i in tree.Query(_Box(buffered.extent)):
+         part = buffered.intersect(boundary[i], 4) # 4 = polygon output
+         if part.area <= 0:
+            continue
+         clipped = part if clipped is None else clipped.union(part)
+      if clipped is None:
+         continue
+      unit.geometry = clipped
+      unit.extent = _Box(clipped.extent)
+      if grid is not None:
+         unit.window = grid.WindowForExtent(*unit.extent)
+         if unit.window is None:
+            unit.geometry = unit.extent = None
+            continue
+         unit.extent = grid.ExtentOf(unit.window)
+         unit.interior = grid.WindowForExtent(*_Box(shape.extent))
+   return plan
@@ -0,0 +1,125 @@
+# Tests for libBeersAspect:  Horn aspect and Beers values against hand-computed examples.
+import numpy as np
+import pytest
+
+from libBeersAspect import (NOASPECT, HornGradients, HornAspect, BeersTransform, BeersAspect, BurnBeers,
+                            FillNoAspect, FillNoAspectNearest, NearestValid, NearestValidAt, BeersAspectUnit)
+
+def test_horn_matches_arcgis_example():
+   # The worked example in the ArcGIS help for How Aspect works (cell size 5)
+   dem = np.array([[101, 92, 85],
+                   [101, 92, 85],
+                   [101, 91, 84]], dtype = np.float32)
+   dzdx, dzdy = HornGradients(dem, 5.0)
+   assert dzdx[1, 1] == pytest.approx(-1.625)
+   assert dzdy[1, 1] == pytest.approx(-0.075)
+   assert HornAspect(dem, 5.0)[1, 1] == pytest.approx(92.64, abs = 0.01)
+
+@pytest.mark.parametrize('dx, dy, aspect, beers', [
+   (-1, 1, 45.0, 2.0), # Rising to the southwest, so facing northeast:  most sheltered
+   (1, -1, 225.0, 0.0), # Facing southwest:  most exposed
+   (1, 0, 270.0, 1.0 - np.sqrt(0.5)), # Rising to the east, facing west
+   (0, -1, 180.0, 1.0 - np.sqrt(0.5)), # Rising to the north, facing south
+   (0, 1, 0.0, 1.0 + np.sqrt(0.5))]) # Facing north
+def test_planes(dx, dy, aspect, beers):
+   rows, cols = np.mgrid[0:5, 0:5]
+   dem = (dx * cols + dy * rows).astype(np.float32) # Row 0 is the northern edge
+   assert HornAspect(dem, 10.0)[2, 2] == pytest.approx(aspect, abs = 1e-4)
+   assert BeersAspect(dem, 10.0)[2, 2] == pytest.approx(beers, abs = 1e-5)
+
+def test_flat_and_nodata():
+   dem = np.full((4, 4), 7.0, dtype = np.float32)
+   dem[0, 0] = np.nan
+   aspect = HornAspect(dem, 1.0)
+   assert np.isnan(aspect[0, 0])
+   assert (aspect[~np.isnan(aspect)] == NOASPECT).all()
+   assert (BeersAspect(dem, 1.0)[1:, 1:] == NOASPECT).all()
+
+def test_beers_aspect_matches_transform_of_aspect():
+   dem = np.random.RandomState(0).rand(40, 50).astype(np.float32) * 100
+   np.testing.assert_allclose(BeersAspect(dem, 30.0), BeersTransform(HornAspect(dem, 30.0)), atol = 1e-5)
+
+def test_edges_substitute_the_center_value():
+   rows, cols = np.mgrid[0:3, 0:3]
+   dem = (2.0 * cols).astype(np.float32)
+   dzdx, dzdy = HornGradients(dem, 1.0)
+   # On the west edge the missing neighbors take the center value:  (4*2 - 4*0) / 8
+   assert dzdx[1, 0] == pytest.approx(1.0)
+   assert dzdy[1, 0] == pytest.approx(0.0)
+
+def test_burn_sets_neutral_value():
+   beers = np.array([[0.5, np.nan], [NOASPECT, 1.5]], dtype = np.float32)
+   burned = BurnBeers(beers, np.array([[True, True], [True, False]]))
+   np.testing.assert_array_equal(burned, np.array([[1.0, np.nan], [1.0, 1.5]], dtype = np.float32))
+
+def test_fill_takes_mean_of_nearest_ring():
+   beers = np.array([[0.0, 0.5, 0.0],
+                     [2.0, NOASPECT, 1.0],
+                     [0.0, 1.5, 0.0]], dtype = np.float32)
+   # The radius 1 circle holds only the four edge neighbors
+   filled, radius, limitReached = FillNoAspect(beers, 3)
+   assert filled[1, 1] == pytest.approx(1.25)
+   assert (radius, limitReached) == (1, False)
+
+def test_fill_imposes_neutral_value_at_limit():
+   beers = np.full((9, 9), NOASPECT, dtype = np.float32)
+   beers[0, 0] = 0.25
+   filled, radius, limitReached = FillNoAspect(beers, 2)
+   assert filled[0, 1] == pytest.approx(0.25)
+   assert filled[8, 8] == 1.0
+   assert (radius, limitReached) == (2, True)
+
+def _BruteNearest(valid):
+   rows, cols = np.nonzero(valid)
+   r, c = np.mgrid[0:valid.shape[0], 0:valid.shape[1]]
+   d2 = (r[..., None] - rows) ** 2 + (c[..., None] - cols) ** 2
+   return d2.min(axis = -1).astype(np.float64)
+
+@pytest.mark.parametrize('fraction', [0.005, 0.05, 0.5])
+def test_distance_transforms_match_brute_force(fraction):
+   rng = np.random.RandomState(3)
+   for trial in range(20):
+      valid = rng.rand(*rng.randint(2, 40, 2)) < fraction
+      valid[rng.randint(valid.shape[0]), rng.randint(valid.shape[1])] = True
+      expected = _BruteNearest(valid)
+      dist2, rows, cols = NearestValid(valid)
+      np.testing.assert_array_equal(dist2, expected)
+      np.testing.assert_array_equal((rows - np.arange(valid.shape[0])[:, None]) ** 2 +
+                                    (cols - np.arange(valid.shape[1])[None, :]) ** 2, expected)
+      ys, xs = np.nonzero(~valid)
+      atDist2, atRows, atCols = NearestValidAt(valid, ys, xs)
+      np.testing.assert_array_equal(atDist2, dist2[ys, xs])
+      np.testing.assert_array_equal(atRows, rows[ys, xs])
+      np.testing.assert_array_equal(atCols, cols[ys, xs])
+
+def test_nearest_search_hands_wide_gaps_to_envelope():
+   valid = np.zeros((60, 200), dtype = bool)
+   valid[0, 0] = valid[59, 199] = True
+   ys, xs = np.nonzero(~valid)
+   dist2, rows, cols = NearestValidAt(valid, ys, xs)
+   np.testing.assert_array_equal(dist2, _BruteNearest(valid)[ys, xs])
+   assert np.isinf(NearestValidAt(np.zeros((3, 3), dtype = bool), [1], [1])[0]).all()
+
+def test_nearest_fill_copies_nearest_value():
+   beers = np.full((5, 7), NOASPECT, dtype = np.float32)
+   beers[0, 0] = 0.5
+   beers[4, 6] = 1.5
+   filled, radius, limitReached = FillNoAspectNearest(beers)
+   assert filled[1, 1] == 0.5 and filled[3, 5] == 1.5
+   assert radius == 5 and not limitReached # (0, 5) is sqrt(17) from (4, 6)
+   blended, radius, limitReached = FillNoAspectNearest(beers, k = 2)
+   assert 0.5 < blended[2, 3] < 1.5
+   assert (blended[beers != NOASPECT] == beers[beers != NOASPECT]).all()
+
+def test_nearest_fill_without_valid_cells_imposes_neutral_value():
+   beers = np.full((3, 3), NOASPECT, dtype = np.float32)
+   filled, radius, limitReached = FillNoAspectNearest(beers)
+   assert (filled == 1.0).all() and limitReached
+
+def test_unit_fills_only_region():
+   dem = np.zeros((6, 6), dtype = np.float32)
+   dem[:, :2] = np.arange(6)[:, None] # A sloping strip on the west, flat elsewhere
+   beers, limitReached = BeersAspectUnit(dem, 1.0, 10, region = (slice(0, 3), slice(0, 6)))
+   assert (beers[:3] != NOASPECT).all()
+   assert (beers[3:, 3:] == NOASPECT).all()
+   assert not limitReached
@@ -0,0 +1,73 @@
+# Tests for libBeersParallel:  pipelined runs read thread-safe inputs ahead in the background.
+import threading
+import numpy as np
+
+from libBeersParallel import UnitInputs, BuildUnitJobs, RunUnits, SplitInputs
+from libRasterWindows import RasterGrid, NpyRaster, NpyMosaicWriter
+
+class _MainThreadRaster(NpyRaster):
+   '''Stands in for an arcpy reader:  not thread-safe, and it fails if read off the main
+   thread.  Reading unit 0 waits (briefly) for the burn window of unit 1.'''
+   threadSafe = False
+   def __init__(self, path, grid, burn):
+      NpyRaster.__init__(self, path, grid)
+      self.burn = burn
+      self.burnAhead = None
+
+   def Read(self, window, grid = None):
+      assert threading.current_thread().name == 'MainThread'
+      if window.col0 == 0 and self.burnAhead is None:
+         self.burnAhead = self.burn.second.wait(5)
+      return NpyRaster.Read(self, window, grid)
+
+class _RecordingRaster(NpyRaster):
+   '''A thread-safe reader that records the thread of each read.'''
+   def __init__(self, path, grid):
+      NpyRaster.__init__(self, path, grid)
+      self.threads = list()
+      self.second = threading.Event()
+
+   def ReadMask(self, window, grid = None):
+      self.threads.append(threading.current_thread().name)
+      if len(self.threads) == 2:
+         self.second.set()
+      return NpyRaster.ReadMask(self, window, grid)
+
+def _Setup(tmp_path):
+   nRows, nCols = 20, 60
+   grid = RasterGrid(0.0, nRows * 10.0, 10.0, nRows, nCols)
+   rows, cols = np.mgrid[0:nRows, 0:nCols]
+   dem = (3 * np.sin(rows / 3.0) + 2 * np.cos(cols / 4.0)).astype(np.float32)
+   dem[5:9, 10:40] = 1.0
+   burn = np.full((nRows, nCols), np.nan, dtype = np.float32)
+   burn[15:17, :] = 1.0
+   np.save(str(tmp_path / 'dem.npy'), dem)
+   np.save(str(tmp_path / 'burn.npy'), burn)
+   units = [('U%d' % i, (200.0 * i, 0.0, 200.0 * (i + 1), 200.0)) for i in range(3)]
+   return grid, units
+
+def _Run(tmp_path, grid, units, inputs, prefetch):
+   out = str(tmp_path / ('out%d.npy' % prefetch))
+   jobs = BuildUnitJobs(units, grid, inputs.nLimit)
+   fails, limits = RunUnits(jobs, inputs, NpyMosaicWriter(out, grid), prefetch = prefetch)
+   assert fails == []
+   return np.load(out)
+
+def test_split_inputs_by_thread_safety(tmp_path):
+   grid, units = _Setup(tmp_path)
+   burn = _RecordingRaster(str(tmp_path / 'burn.npy'), grid)
+   dem = _MainThreadRaster(str(tmp_path / 'dem.npy'), grid, burn)
+   assert SplitInputs(UnitInputs(dem, grid, 3, burn)) == (['burn'], ['dem'])
+   assert SplitInputs(UnitInputs(NpyRaster(dem.path, grid), grid, 3)) == (['dem'], [])
+
+def test_thread_safe_input_is_read_ahead(tmp_path):
+   grid, units = _Setup(tmp_path)
+   burn = _RecordingRaster(str(tmp_path / 'burn.npy'), grid)
+   dem = _MainThreadRaster(str(tmp_path / 'dem.npy'), grid, burn)
+   out = _Run(tmp_path, grid, units, UnitInputs(dem, grid, 3, burn), prefetch = 1)
+   assert len(burn.threads) == 3
+   assert 'MainThread' not in burn.threads
+   assert dem.burnAhead # Unit 1's burn window was read before unit 0's DEM
+
+   serial = UnitInputs(NpyRaster(dem.path, grid), grid, 3, NpyRaster(burn.path, grid))
+   np.testing.assert_array_equal(out, _Run(tmp_path, grid, units, serial, prefetch = 0))
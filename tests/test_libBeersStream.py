@@ -0,0 +1,86 @@
+# Tests for libBeersStream:  tiled output must equal processing the whole array at once.
+import os
+import numpy as np
+import pytest
+
+from libBeersAspect import BeersAspectUnit
+from libBeersStream import StreamBeersAspect, StreamTerrain, TileWindows
+from libRasterWindows import RasterGrid, NpyRaster
+from libTerrain import TerrainDerivatives, TerrainEngine, DerivativeRange
+from libChunkStore import ChunkStore, ChunkStoreWriter
+
+def _TestDEM(nRows, nCols, seed = 0):
+   '''A rough surface with flat plateaus of several sizes, a NoData corner and a burn mask.'''
+   rng = np.random.RandomState(seed)
+   rows, cols = np.mgrid[0:nRows, 0:nCols]
+   dem = (50 * np.sin(rows / 7.0) + 30 * np.cos(cols / 5.0) + rng.rand(nRows, nCols)).astype(np.float32)
+   dem[5:12, 8:20] = 40.0 # Small enough to fill within the limit
+   dem[30:60, 25:70] = 45.0 # Too wide, so the limit is reached
+   dem[:4, -6:] = np.nan
+   burn = np.zeros((nRows, nCols), dtype = bool)
+   burn[20:24, :] = True
+   burn &= ~np.isnan(dem)
+   return dem, burn
+
+def _Inputs(tmp_path, dem, burn):
+   grid = RasterGrid(0.0, dem.shape[0] * 10.0, 10.0, dem.shape[0], dem.shape[1])
+   np.save(str(tmp_path / 'dem.npy'), dem)
+   np.save(str(tmp_path / 'burn.npy'), np.where(burn, 1.0, np.nan).astype(np.float32))
+   return grid, NpyRaster(str(tmp_path / 'dem.npy'), grid), NpyRaster(str(tmp_path / 'burn.npy'), grid)
+
+def test_tile_windows_cover_grid_once():
+   grid = RasterGrid(0, 100, 1, 45, 70)
+   cover = np.zeros((45, 70), dtype = int)
+   for tile in TileWindows(grid, 16):
+      cover[tile.Slices()] += 1
+   assert (cover == 1).all()
+
+@pytest.mark.parametrize('tileSize', [16, 25, 200])
+def test_tiled_beers_equals_whole(tmp_path, tileSize):
+   dem, burn = _TestDEM(80, 90)
+   nLimit = 6
+   grid, demRaster, burnRaster = _Inputs(tmp_path, dem, burn)
+   whole, limitReached = BeersAspectUnit(dem, grid.cellSize, nLimit, np.isnan(dem), burn)
+   outPath = str(tmp_path / 'beers.npy')
+   limitTiles = StreamBeersAspect(demRaster, outPath, nLimit, tileSize, burnRaster)
+   tiled = np.load(outPath)
+   np.testing.assert_allclose(tiled, whole, rtol = 0, atol = 1e-6)
+   assert np.array_equal(np.isnan(tiled), np.isnan(whole))
+   assert limitReached and len(limitTiles) > 0
+
+def test_tiled_terrain_equals_whole(tmp_path):
+   dem, burn = _TestDEM(50, 60)
+   grid, demRaster, burnRaster = _Inputs(tmp_path, dem, burn)
+   names = ['slope', 'aspect', 'hillshade', 'curvature']
+   outputs = dict((name, str(tmp_path / (name + '.npy'))) for name in names)
+   assert StreamTerrain(demRaster, outputs, 16) == sorted(names)
+   whole = TerrainDerivatives(dem, grid.cellSize, names)
+   for name in names:
+      np.testing.assert_allclose(np.load(outputs[name]), whole[name], rtol = 0, atol = 1e-4)
+
+def test_terrain_through_chunk_stores_matches_engine(tmp_path):
+   dem, burn = _TestDEM(50, 60)
+   grid, demRaster, burnRaster = _Inputs(tmp_path, dem, burn)
+   outputs = {'slope': ChunkStoreWriter(str(tmp_path / 'slope'), grid, *DerivativeRange('slope'), chunkSize = 16),
+              'hillshade': ChunkStoreWriter(str(tmp_path / 'hs'), grid, *DerivativeRange('hillshade'), chunkSize = 16),
+              'beers': ChunkStoreWriter(str(tmp_path / 'beers'), grid, *DerivativeRange('beers'), chunkSize = 16)}
+   StreamTerrain(demRaster, outputs, 16)
+   whole = TerrainEngine(dem.shape, grid.cellSize, list(outputs)).Compute(dem)
+   for name, writer in outputs.items():
+      store = ChunkStore(writer.path)
+      np.testing.assert_allclose(store.ToArray(), whole[name], rtol = 0, atol = store.maxError + 1e-4)
+      assert np.array_equal(np.isnan(store.ToArray()), np.isnan(whole[name]))
+
+def test_writers_must_cover_the_output_range(tmp_path):
+   dem, burn = _TestDEM(20, 20)
+   grid, demRaster, burnRaster = _Inputs(tmp_path, dem, burn)
+   hsPath = str(tmp_path / 'hs.npy')
+   with pytest.raises(ValueError):
+      StreamTerrain(demRaster, {'hillshade': hsPath, 'slope': ChunkStoreWriter(str(tmp_path / 's'), grid, 0.0, 2.0)})
+   assert not os.path.exists(hsPath) # Checked before anything is opened
+   with pytest.raises(ValueError):
+      StreamTerrain(demRaster, {'curvature': ChunkStoreWriter(str(tmp_path / 'c'), grid, -1000.0, 1000.0)})
+   with pytest.raises(ValueError):
+      StreamTerrain(demRaster, {'slope': ChunkStoreWriter(str(tmp_path / 'p'), grid, 0.0, 90.0)}, slopeUnits = 'PERCENT_RISE')
+   with pytest.raises(ValueError):
+      StreamBeersAspect(demRaster, ChunkStoreWriter(str(tmp_path / 'b'), grid, 0.0, 1.0), 3)
@@ -0,0 +1,62 @@
+# Tests for libBurnMask:  the packed-bit window arithmetic and the fingerprint-named cache.
+import os, glob
+import numpy as np
+import pytest
+
+from libBurnMask import OpenBurnMask, CachePath, BuildBurnMask
+from libRasterWindows import RasterGrid, NpyRaster, Window
+
+def _Source(tmp_path, nRows = 37, nCols = 53, seed = 0, name = 'burn.npy'):
+   '''A burn raster whose width is not a multiple of 8, with 1 for water and NaN elsewhere.'''
+   grid = RasterGrid(0.0, nRows * 10.0, 10.0, nRows, nCols)
+   mask = np.random.RandomState(seed).rand(nRows, nCols) < 0.3
+   path = str(tmp_path / name)
+   np.save(path, np.where(mask, 1.0, np.nan).astype(np.float32))
+   return NpyRaster(path, grid), grid, mask
+
+def test_whole_mask_round_trips(tmp_path):
+   source, grid, mask = _Source(tmp_path)
+   cache = BuildBurnMask(source, str(tmp_path / 'cache.npy'), grid, stripRows = 10)
+   assert cache.Packed().shape == (37, 7)
+   np.testing.assert_array_equal(cache.ReadMask(Window(0, 0, 37, 53)), mask)
+   assert cache.Count() == mask.sum() # Padding bits at the end of each row are zero
+
+@pytest.mark.parametrize('window', [Window(0, 3, 10, 5), Window(4, 7, 9, 2), Window(2, 9, 30, 17),
+                                    Window(10, 45, 5, 8), Window(30, 50, 7, 3), Window(0, 48, 37, 5),
+                                    Window(5, 16, 1, 8), Window(0, 52, 37, 1)])
+def test_windows_at_any_column_offset(tmp_path, window):
+   source, grid, mask = _Source(tmp_path)
+   cache = BuildBurnMask(source, str(tmp_path / 'cache.npy'), grid)
+   rows, cols = window.Slices()
+   out = cache.ReadMask(window)
+   assert out.dtype == bool and out.shape == (window.nRows, window.nCols)
+   np.testing.assert_array_equal(out, mask[rows, cols])
+   assert cache.Count(window) == mask[rows, cols].sum()
+   packed, offset = cache.ReadPacked(window)
+   assert offset == window.col0 % 8
+   assert packed.shape[1] == (offset + window.nCols + 7) // 8
+
+def test_cache_is_reused_until_the_source_changes(tmp_path):
+   source, grid, mask = _Source(tmp_path)
+   folder = str(tmp_path / 'caches')
+   os.mkdir(folder)
+   first = OpenBurnMask(source, folder, grid)
+   built = os.path.getmtime(first.path)
+   os.utime(first.path, (built - 100, built - 100)) # Would change if the cache were rebuilt
+   second = OpenBurnMask(source, folder, grid)
+   assert second.path == first.path and os.path.getmtime(second.path) == built - 100
+
+   # Rewrite the source with different contents; the new cache gets a new name, and the old one is removed
+   stamp = os.path.getmtime(source.path)
+   np.save(source.path, np.where(~mask, 1.0, np.nan).astype(np.float32))
+   os.utime(source.path, (stamp + 10, stamp + 10))
+   third = OpenBurnMask(source, folder, grid)
+   assert third.path != first.path
+   np.testing.assert_array_equal(third.ReadMask(Window(0, 0, 37, 53)), ~mask)
+   assert sorted(glob.glob(os.path.join(folder, 'BurnMask_*'))) == sorted([third.path, os.path.splitext(third.path)[0] + '.json'])
+
+def test_cache_name_depends_on_grid(tmp_path):
+   source, grid, mask = _Source(tmp_path)
+   other = RasterGrid(0.0, 370.0, 10.0, 37, 52)
+   assert CachePath(source, str(tmp_path), grid) == CachePath(source, str(tmp_path), grid)
+   assert CachePath(source, str(tmp_path), grid) != CachePath(source, str(tmp_path), other)
@@ -0,0 +1,97 @@
+# Tests for libChunkStore:  quantization bounds, NoData, windowed writes and reads, and reopening.
+import os
+import numpy as np
+import pytest
+
+from libChunkStore import ChunkStore, ChunkStoreWriter, Quantization, IsChunkStore
+from libRasterWindows import RasterGrid, Window
+
+GRID = RasterGrid(0.0, 500.0, 10.0, 50, 70)
+
+@pytest.mark.parametrize('dtype, bound', [('uint8', 0.004), ('uint16', 0.000016)])
+def test_quantization_error_is_within_bound(tmp_path, dtype, bound):
+   name, scale, maxError = Quantization(0.0, 2.0, dtype)
+   assert name == dtype and maxError < bound
+   values = np.random.RandomState(1).uniform(0.0, 2.0, (50, 70)).astype(np.float32)
+   values[0, :2] = [0.0, 2.0] # The ends of the range
+   writer = ChunkStoreWriter(str(tmp_path / 'store'), GRID, 0.0, 2.0, chunkSize = 16, dtype = dtype).Open()
+   writer.Write('all', Window(0, 0, 50, 70), values)
+   writer.Close()
+   assert np.abs(ChunkStore(writer.path).ToArray() - values).max() <= maxError
+
+def test_precision_picks_smallest_dtype():
+   assert Quantization(0.0, 2.0, precision = 0.005)[0] == 'uint8'
+   assert Quantization(0.0, 2.0, precision = 0.001)[0] == 'uint16'
+   assert Quantization(0.0, 90.0, precision = 0.001)[0] == 'uint16'
+   with pytest.raises(ValueError):
+      Quantization(0.0, 2.0, precision = 1e-9)
+
+def test_nodata_round_trip_and_unwritten_chunks(tmp_path):
+   values = np.full((20, 20), 1.5, dtype = np.float32)
+   values[3:7, 4] = np.nan
+   writer = ChunkStoreWriter(str(tmp_path / 'store'), GRID, 0.0, 2.0, chunkSize = 16).Open()
+   writer.Write('a', Window(0, 0, 20, 20), values)
+   writer.Close()
+   store = ChunkStore(writer.path)
+   out = store.Read(Window(0, 0, 20, 30))
+   np.testing.assert_array_equal(np.isnan(out[:, :20]), np.isnan(values))
+   assert np.isnan(out[:, 20:]).all() # Never written
+   assert not store.ReadMask(Window(3, 4, 4, 1)).any()
+   assert (store.ReadCodes(Window(3, 4, 4, 1)) == store.nodataCode).all()
+
+def test_unaligned_and_edge_windows_match_a_full_array(tmp_path):
+   rng = np.random.RandomState(2)
+   expected = np.full((GRID.nRows, GRID.nCols), np.nan, dtype = np.float32)
+   writer = ChunkStoreWriter(str(tmp_path / 'store'), GRID, 0.0, 2.0, chunkSize = 16).Open()
+   # Windows straddling chunk edges, and reaching the partial chunks at the right and bottom edges
+   for window in [Window(3, 5, 20, 17), Window(10, 40, 40, 30), Window(45, 0, 5, 70), Window(0, 60, 9, 10)]:
+      block = rng.uniform(0.0, 2.0, (window.nRows, window.nCols)).astype(np.float32)
+      block[rng.rand(*block.shape) < 0.1] = np.nan # Leaves what is already stored
+      writer.Write('u', window, block)
+      rows, cols = window.Slices()
+      expected[rows, cols] = np.where(np.isnan(block), expected[rows, cols], block)
+   writer.Close()
+   store = ChunkStore(writer.path, cacheChunks = 2)
+   for window in [Window(0, 0, 50, 70), Window(7, 13, 30, 41), Window(48, 65, 2, 5)]:
+      rows, cols = window.Slices()
+      np.testing.assert_allclose(store.Read(window), expected[rows, cols], atol = store.maxError)
+
+def test_reopen_appends_and_checks_grid_and_range(tmp_path):
+   path = str(tmp_path / 'store')
+   writer = ChunkStoreWriter(path, GRID, 0.0, 2.0, chunkSize = 16).Open()
+   writer.Write('a', Window(0, 0, 10, 10), np.full((10, 10), 0.5, dtype = np.float32))
+   writer.Close()
+   writer = ChunkStoreWriter(path, GRID, 0.0, 2.0, chunkSize = 16, append = True).Open()
+   writer.Write('b', Window(5, 5, 10, 10), np.full((10, 10), 1.5, dtype = np.float32))
+   writer.Close()
+   out = ChunkStore(path).Read(Window(0, 0, 15, 15))
+   assert abs(out[0, 0] - 0.5) < 1e-4 and abs(out[14, 14] - 1.5) < 1e-4 and np.isnan(out[0, 14])
+   with pytest.raises(ValueError):
+      ChunkStoreWriter(path, RasterGrid(0.0, 500.0, 10.0, 50, 71), 0.0, 2.0, append = True).Open()
+   with pytest.raises(ValueError):
+      ChunkStoreWriter(path, GRID, 0.0, 90.0, append = True).Open()
+   # Without append, the store is replaced
+   ChunkStoreWriter(path, GRID, 0.0, 2.0, chunkSize = 16).Open().Close()
+   assert np.isnan(ChunkStore(path).ToArray()).all()
+
+def test_open_refuses_a_folder_that_is_not_a_chunk_store(tmp_path):
+   folder = tmp_path / 'data'
+   folder.mkdir()
+   (folder / 'keep.txt').write_text(u'not a chunk store')
+   assert not IsChunkStore(str(folder))
+   with pytest.raises(ValueError):
+      ChunkStoreWriter(str(folder), GRID, 0.0, 2.0).Open()
+   assert os.path.exists(str(folder / 'keep.txt'))
+   ChunkStoreWriter(str(tmp_path / 'empty'), GRID, 0.0, 2.0).Open().Close() # A new folder is fine
+   assert IsChunkStore(str(tmp_path / 'empty'))
+
+def test_values_outside_the_range_are_refused(tmp_path):
+   writer = ChunkStoreWriter(str(tmp_path / 'store'), GRID, 0.0, 2.0).Open()
+   block = np.full((4, 4), 1.0, dtype = np.float32)
+   block[0, :3] = [-1.0, 2.5, np.inf]
+   with pytest.raises(ValueError) as err:
+      writer.Write('a', Window(0, 0, 4, 4), block)
+   assert '3 values' in str(err.value)
+   writer.Write('b', Window(0, 0, 1, 2), np.array([[2.0000002, -1e-7]], dtype = np.float32)) # Within the error
+   with pytest.raises(ValueError):
+      ChunkStoreWriter(str(tmp_path / 'other'), GRID, 2.0, 2.0)
@@ -0,0 +1,79 @@
+# Tests for libDescribeCache:  dataset stamps and cache invalidation.
+import os
+
+from libDescribeCache import DatasetInfo, DatasetStamp, MetadataCache, StandInProvider
+
+def _Touch(path, mtime):
+   with open(path, 'ab'):
+      pass
+   os.utime(path, (mtime, mtime))
+
+def _MakeGDB(tmp_path):
+   gdb = str(tmp_path / 'Test.gdb')
+   os.mkdir(gdb)
+   for n in (1, 3, 4):
+      for ext in ('gdbtable', 'gdbtablx'):
+         _Touch(os.path.join(gdb, 'a%08x.%s' % (n, ext)), 1000.0 + n)
+   return gdb
+
+def test_gdb_stamp_covers_the_whole_geodatabase(tmp_path):
+   gdb = _MakeGDB(tmp_path)
+   roads, prj = os.path.join(gdb, 'Roads'), os.path.join(gdb, 'Roads_prj')
+   assert DatasetStamp(roads) == (1004.0, 0)
+   assert DatasetStamp(os.path.join(gdb, 'Transport', 'Roads')) == (1004.0, 0) # In a feature dataset
+   assert DatasetStamp(gdb) == (1004.0, 0)
+   # Writing any table changes the stamp of every dataset, even without a later time
+   with open(os.path.join(gdb, 'a00000003.gdbtable'), 'ab') as f:
+      f.write(b'row')
+   os.utime(os.path.join(gdb, 'a00000003.gdbtable'), (1003.0, 1003.0))
+   assert DatasetStamp(roads) == DatasetStamp(prj) == (1004.0, 3)
+   _Touch(os.path.join(gdb, 'a00000005.gdbtable'), 2000.0) # A new table
+   assert DatasetStamp(roads) == (2000.0, 3)
+
+def test_gdb_stamp_ignores_locks(tmp_path):
+   gdb = _MakeGDB(tmp_path)
+   stamp = DatasetStamp(os.path.join(gdb, 'Roads'))
+   with open(os.path.join(gdb, '_gdb.host.1234.1.sr.lock'), 'w') as f:
+      f.write('lock')
+   assert DatasetStamp(os.path.join(gdb, 'Roads')) == stamp
+
+def test_file_and_other_stamps(tmp_path):
+   shp = str(tmp_path / 'Points.shp')
+   _Touch(shp, 1000.0)
+   _Touch(str(tmp_path / 'Points.dbf'), 1500.0)
+   assert DatasetStamp(shp) == (1500.0, 0)
+   assert DatasetStamp(str(tmp_path / 'Data.mdb' / 'Points')) is None
+   assert DatasetStamp(r'Database Connections\Server.sde\Points') is None
+
+def test_cache_invalidates_on_change(tmp_path):
+   gdb = _MakeGDB(tmp_path)
+   roads, prj = os.path.join(gdb, 'Roads'), os.path.join(gdb, 'Roads_prj')
+   provider = StandInProvider({roads: DatasetInfo(roads, 'FeatureClass'), prj: DatasetInfo(prj, 'FeatureClass')})
+   cache = MetadataCache(provider, stampTTL = 0)
+   cache.Describe(roads)
+   cache.Describe(prj)
+   cache.Describe(roads)
+   assert provider.calls['Describe'] == 2
+   _Touch(os.path.join(gdb, 'a00000004.gdbtable'), 2000.0)
+   cache.Describe(roads) # Its geodatabase changed, so both are described again
+   cache.Describe(prj)
+   cache.Describe(prj)
+   assert provider.calls['Describe'] == 4
+
+def test_cache_trusts_entries_within_ttl_and_invalidates_explicitly():
+   provider = StandInProvider({'Layer': DatasetInfo('Layer', 'FeatureLayer')})
+   cache = MetadataCache(provider, stampTTL = 60)
+   cache.Describe('Layer')
+   cache.Describe('Layer')
+   assert provider.calls['Describe'] == 1
+   cache.Invalidate('Layer')
+   cache.Describe('Layer')
+   assert provider.calls['Describe'] == 2
+   assert cache.Stats() == {'hits': 1, 'misses': 2, 'datasets': 1}
+
+def test_cache_evicts_least_recently_used():
+   provider = StandInProvider(dict((name, DatasetInfo(name)) for name in 'abc'))
+   cache = MetadataCache(provider, maxSize = 2)
+   for name in 'abca':
+      cache.Describe(name)
+   assert provider.calls['Describe'] == 4
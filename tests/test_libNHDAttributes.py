@@ -0,0 +1,113 @@
+# Tests for libNHDAttributes:  the WKB ring reader, and the FCode index of a store built during a merge.
+import struct
+import numpy as np
+import pytest
+
+from libNHDAttributes import GeometryStats, NHDAttributeWriter, NHDAttributeStore
+from libNHDMerge import Field, StreamMerge, SQLiteFeatureReader, SQLiteFeatureWriter
+
+def _Square(x0, y0, size):
+   return [(x0, y0), (x0, y0 + size), (x0 + size, y0 + size), (x0 + size, y0), (x0, y0)]
+
+def _Rings(rings, order, extra):
+   '''The ring count and rings of a WKB polygon, with extra ordinates (Z, M) of 7.0.'''
+   out = struct.pack(order + 'I', len(rings))
+   for ring in rings:
+      out += struct.pack(order + 'I', len(ring))
+      for x, y in ring:
+         out += struct.pack(order + 'd' * (2 + extra), x, y, *([7.0] * extra))
+   return out
+
+def _Header(gtype, order):
+   return (b'\x01' if order == '<' else b'\x00') + struct.pack(order + 'I', gtype)
+
+def Polygon(rings, order = '<', extra = 0, gtype = 3):
+   return _Header(gtype, order) + _Rings(rings, order, extra)
+
+def MultiPolygon(polygons, order = '<', extra = 0, gtype = 6, partType = 3):
+   return (_Header(gtype, order) + struct.pack(order + 'I', len(polygons))
+           + b''.join(Polygon(p, order, extra, partType) for p in polygons))
+
+SQUARE = [_Square(0.0, 0.0, 10.0)]
+HOLED = [_Square(100.0, 200.0, 10.0), _Square(102.0, 202.0, 2.0), _Square(105.0, 205.0, 1.0)]
+
+@pytest.mark.parametrize('order', ['<', '>'])
+def test_polygon_bbox_and_area(order):
+   stats = GeometryStats([Polygon(SQUARE, order), Polygon(HOLED, order)])
+   np.testing.assert_allclose(stats, [[0, 0, 10, 10, 100], [100, 200, 110, 210, 100 - 4 - 1]])
+
+@pytest.mark.parametrize('order', ['<', '>'])
+def test_multipolygon_bbox_and_area(order):
+   wkb = MultiPolygon([SQUARE, HOLED, [_Square(-5.0, 50.0, 3.0)]], order)
+   np.testing.assert_allclose(GeometryStats([wkb]), [[-5, 0, 110, 210, 100 + 95 + 9]])
+
+@pytest.mark.parametrize('gtype, extra', [(1003, 1), (2003, 1), (3003, 2),  # ISO Z, M, ZM
+                                          (0x80000003, 1), (0x40000003, 1), (0xC0000003, 2)])  # EWKB flags
+def test_z_and_m_ordinates_are_skipped(gtype, extra):
+   for order in ('<', '>'):
+      np.testing.assert_allclose(GeometryStats([Polygon(HOLED, order, extra, gtype)]), [[100, 200, 110, 210, 95]])
+   multi = MultiPolygon([SQUARE, HOLED], '<', extra, gtype + 3, gtype)
+   np.testing.assert_allclose(GeometryStats([multi]), [[0, 0, 110, 210, 195]])
+
+def test_ewkb_srid_is_skipped():
+   wkb = _Header(0x20000003, '<') + struct.pack('<I', 4269) + _Rings(SQUARE, '<', 0)
+   np.testing.assert_allclose(GeometryStats([wkb]), [[0, 0, 10, 10, 100]])
+
+class _Extent(object):
+   XMin, YMin, XMax, YMax = 1.0, 2.0, 3.0, 4.0
+
+class _ArcGeometry(object):
+   extent = _Extent()
+   area = 2.5
+
+def test_mixed_and_missing_geometries():
+   stats = GeometryStats([None, Polygon(SQUARE), _ArcGeometry(), Polygon([[]]), bytearray(Polygon(HOLED))])
+   assert np.isnan(stats[0, :4]).all() and stats[0, 4] == 0
+   np.testing.assert_allclose(stats[1], [0, 0, 10, 10, 100])
+   np.testing.assert_allclose(stats[2], [1, 2, 3, 4, 2.5])
+   assert np.isnan(stats[3, :4]).all() and stats[3, 4] == 0 # A polygon without points
+   np.testing.assert_allclose(stats[4], [100, 200, 110, 210, 95])
+
+def test_other_geometry_types_are_refused():
+   with pytest.raises(ValueError):
+      GeometryStats([_Header(1, '<') + struct.pack('<2d', 0.0, 0.0)])
+
+FIELDS = [Field('Permanent_Identifier', 'String', 40), Field('FCode', 'Integer', None),
+          Field('FType', 'SmallInteger', None)]
+
+def _Source(db, table, rows):
+   writer = SQLiteFeatureWriter(db, table)
+   writer.Open(FIELDS)
+   writer.Insert(rows)
+   writer.Close()
+   return SQLiteFeatureReader(db, table)
+
+def test_store_index_after_merge(tmp_path):
+   db = str(tmp_path / 'nhd.sqlite')
+   # FCodes interleaved, so that the index has to group them
+   area = _Source(db, 'NHDArea', [('A%d' % i, (46600, 46602)[i % 2], 466, Polygon([_Square(10.0 * i, 0.0, 1.0)]))
+                                  for i in range(5)])
+   waterbody = _Source(db, 'NHDWaterbody', [('W%d' % i, (39004, 46600, 43600)[i % 3], (390, 466, 436)[i % 3],
+                                             Polygon([_Square(10.0 * i, 100.0, 2.0)])) for i in range(6)])
+   storePath = str(tmp_path / 'store')
+   writer = NHDAttributeWriter(storePath, SQLiteFeatureWriter(str(tmp_path / 'out.sqlite'), 'NHD_Polys'))
+   StreamMerge([('NHDArea', area), ('NHDWaterbody', waterbody)], writer, batchSize = 4)
+   store = NHDAttributeStore(storePath)
+
+   fcodes = [46600, 46602, 46600, 46602, 46600, 39004, 46600, 43600, 39004, 46600, 43600]
+   assert len(store) == 11
+   assert store.Decode('fcode', np.arange(11)) == fcodes
+   assert store.values['fcode'] == [46600, 46602, 39004, 43600] # In order of first appearance
+   np.testing.assert_array_equal(store.offsets, [0, 5, 7, 9, 11])
+   np.testing.assert_array_equal(store.order, [0, 2, 4, 6, 9, 1, 3, 5, 8, 7, 10])
+   np.testing.assert_array_equal(store.ObjectIDs(np.arange(11)), np.arange(1, 12)) # SQLite returns none
+   for fcode in set(fcodes):
+      np.testing.assert_array_equal(store.FCodeRows([fcode]), [i for i, f in enumerate(fcodes) if f == fcode])
+   np.testing.assert_array_equal(store.FCodeRows([39004, 43600, 11111]), [5, 7, 8, 10])
+
+   np.testing.assert_array_equal(store.Rows(ftypes = ['SwampMarsh']), [0, 1, 2, 3, 4, 6, 9])
+   np.testing.assert_array_equal(store.Rows(ftypes = ['SwampMarsh'], sources = ['NHDWaterbody']), [6, 9])
+   np.testing.assert_array_equal(store.Rows(fcodes = [46600], bbox = (0.0, 50.0, 100.0, 150.0)), [6, 9])
+   assert store.WhereClause(store.Rows(fcodes = [43600])) == 'OBJECTID IN (8, 11)'
+   assert store.Extent(store.Rows(sources = ['NHDArea'])) == (0.0, 0.0, 41.0, 1.0)
+   np.testing.assert_allclose(store.area[:], [1.0] * 5 + [4.0] * 6)
@@ -0,0 +1,104 @@
+# Tests for libNHDMerge:  the single-pass merge, round-tripped through SQLite.
+import datetime, os
+import pytest
+
+from libNHDMerge import (Field, StreamMerge, UnionFields, SQLiteFeatureReader, SQLiteFeatureWriter,
+                         AttributeStorePath, ListNHDInputs)
+
+AREA_FIELDS = [Field('Permanent_Identifier', 'String', 40), Field('FCode', 'Integer', None),
+               Field('FType', 'SmallInteger', None), Field('AreaSqKm', 'Double', None)]
+WATERBODY_FIELDS = [Field('Permanent_Identifier', 'String', 40), Field('FCode', 'Integer', None),
+                    Field('FType', 'SmallInteger', None), Field('GNIS_Name', 'String', 65),
+                    Field('LoadDate', 'Date', None)]
+
+def _Source(dbPath, table, fields, rows):
+   writer = SQLiteFeatureWriter(dbPath, table)
+   writer.Open(fields)
+   writer.Insert(rows)
+   writer.Close()
+   return SQLiteFeatureReader(dbPath, table)
+
+def _Sources(folder):
+   db = str(folder / 'nhd.sqlite')
+   area = _Source(db, 'NHDArea', AREA_FIELDS,
+                  [('A%d' % i, 46006, 460, 0.5 * i, b'\x01area' + str(i).encode()) for i in range(7)])
+   waterbody = _Source(db, 'NHDWaterbody', WATERBODY_FIELDS,
+                       [('W%d' % i, 39004, 390, 'Lake %d' % i, datetime.datetime(2020, 1, i + 1),
+                         bytearray(b'\x01wb' + str(i).encode())) for i in range(5)])
+   return [('NHDArea', area), ('NHDWaterbody', waterbody)]
+
+def test_union_fields_keeps_first_appearance(tmp_path):
+   sources = _Sources(tmp_path)
+   names = [f.name for f in UnionFields([reader for name, reader in sources])]
+   assert names == ['Permanent_Identifier', 'FCode', 'FType', 'AreaSqKm', 'GNIS_Name', 'LoadDate']
+
+@pytest.mark.parametrize('batchSize', [1, 3, 5000])
+def test_stream_merge_round_trip(tmp_path, batchSize):
+   sources = _Sources(tmp_path)
+   outDB = str(tmp_path / 'out.sqlite')
+   counts = StreamMerge(sources, SQLiteFeatureWriter(outDB, 'NHD_Polys'), batchSize)
+   assert counts == {'NHDArea': 7, 'NHDWaterbody': 5}
+
+   merged = SQLiteFeatureReader(outDB, 'NHD_Polys')
+   fields = merged.Fields()
+   assert [f.name for f in fields] == ['Permanent_Identifier', 'FCode', 'FType', 'AreaSqKm', 'GNIS_Name',
+                                       'LoadDate', 'SourceFC']
+   assert fields[-1] == Field('SourceFC', 'String', 12)
+   assert fields[0] == Field('Permanent_Identifier', 'String', 40)
+   rows = list(merged.Rows())
+   assert len(rows) == 12
+   byID = dict((row[0], row) for row in rows)
+   assert byID['A3'] == ('A3', 46006, 460, 1.5, None, None, 'NHDArea', b'\x01area3')
+   assert byID['W2'] == ('W2', 39004, 390, None, 'Lake 2', '2020-01-03T00:00:00', 'NHDWaterbody', b'\x01wb2')
+
+def test_existing_source_field_is_overwritten(tmp_path):
+   db = str(tmp_path / 'nhd.sqlite')
+   reader = _Source(db, 'NHDArea', [Field('SourceFC', 'String', 12), Field('FCode', 'Integer', None)],
+                    [('stale', 46006, b'\x01')])
+   outDB = str(tmp_path / 'out.sqlite')
+   StreamMerge([('NHDArea', reader)], SQLiteFeatureWriter(outDB, 'NHD_Polys'))
+   assert list(SQLiteFeatureReader(outDB, 'NHD_Polys').Rows()) == [(46006, 'NHDArea', b'\x01')]
+
+class _FailingReader(object):
+   def Fields(self):
+      return [Field('FCode', 'Integer', None)]
+
+   def Rows(self):
+      yield (46006, b'\x01')
+      raise IOError('Read failed')
+
+class _RecordingWriter(object):
+   def __init__(self):
+      self.calls = list()
+
+   def Open(self, fields):
+      self.calls.append('Open')
+
+   def Insert(self, rows):
+      self.calls.append('Insert')
+
+   def Close(self):
+      self.calls.append('Close')
+
+   def Abort(self):
+      self.calls.append('Abort')
+
+def test_failed_merge_aborts_writer():
+   writer = _RecordingWriter()
+   with pytest.raises(IOError):
+      StreamMerge([('NHDArea', _FailingReader())], writer, batchSize = 1)
+   assert writer.calls == ['Open', 'Insert', 'Abort']
+
+def test_attribute_store_path_is_named_after_gdb():
+   path = AttributeStorePath(os.path.join('data', 'Hydro.gdb', 'NHD_Polys'))
+   assert os.path.basename(path) == 'Hydro_NHD_Polys_Attributes'
+   assert os.path.dirname(path) == os.path.abspath('data')
+
+def test_list_inputs_finds_only_geodatabases(tmp_path):
+   for name in ('A.gdb', 'B.gdb', 'notes'):
+      os.mkdir(str(tmp_path / name))
+   open(str(tmp_path / 'C.sqlite'), 'w').close()
+   found = [os.path.basename(p) for p in ListNHDInputs([str(tmp_path)])]
+   assert found == ['A.gdb', 'B.gdb']
+   found = [os.path.basename(p) for p in ListNHDInputs([str(tmp_path)], extensions = ('.gdb', '.sqlite'))]
+   assert found == ['A.gdb', 'B.gdb', 'C.sqlite']
@@ -0,0 +1,66 @@
+# Tests for libProjections:  Snyder (1987) worked examples, round trips and datum shifts.
+import numpy as np
+import pytest
+
+from libProjections import (CRS, GEOGRAPHIC, UTM, USA_ALBERS, VA_LAMBERT, ChooseTransformation,
+                            ListTransformations, TransformationChain, Transform, TransformBatch, ShiftDatum)
+
+# Snyder's examples use the Clarke 1866 ellipsoid, i.e. NAD27
+@pytest.mark.parametrize('crs, lon, lat, x, y', [
+   (CRS('TM', 'NAD27', 'tmerc', lon0 = -75.0, k0 = 0.9996), -73.5, 40.5, 127106.5, 4484124.4), # p. 269
+   (CRS('AEA', 'NAD27', 'aea', lon0 = -96.0, lat0 = 23.0, lat1 = 29.5, lat2 = 45.5), -75.0, 35.0, 1885472.7, 1535925.0), # p. 292
+   (CRS('LCC', 'NAD27', 'lcc', lon0 = -96.0, lat0 = 23.0, lat1 = 33.0, lat2 = 45.0), -75.0, 35.0, 1894410.9, 1564649.5)]) # p. 296
+def test_snyder_examples(crs, lon, lat, x, y):
+   xOut, yOut = crs.Forward(lon, lat)
+   assert xOut == pytest.approx(x, abs = 0.1)
+   assert yOut == pytest.approx(y, abs = 0.1)
+   lonOut, latOut = crs.Inverse(x, y)
+   assert lonOut == pytest.approx(lon, abs = 1e-6)
+   assert latOut == pytest.approx(lat, abs = 1e-6)
+
+@pytest.mark.parametrize('crs', [UTM(17), UTM(18, 'WGS84'), USA_ALBERS, VA_LAMBERT])
+def test_projection_round_trip(crs):
+   lon, lat = np.meshgrid(np.linspace(crs.lon0 - 3, crs.lon0 + 3, 13), np.linspace(30, 45, 16))
+   x, y = crs.Forward(lon, lat)
+   lon2, lat2 = crs.Inverse(x, y)
+   np.testing.assert_allclose(lon2, lon, atol = 1e-8)
+   np.testing.assert_allclose(lat2, lat, atol = 1e-8)
+
+def test_datum_shift_round_trip():
+   lon, lat = np.array([-80.0, -77.5, -75.0]), np.array([36.5, 38.0, 39.5])
+   for fromDatum, toDatum in [('WGS84', 'NAD83'), ('NAD27', 'WGS84'), ('NAD27', 'NAD83')]:
+      x, y = Transform(lon, lat, GEOGRAPHIC[fromDatum], GEOGRAPHIC[toDatum])
+      lon2, lat2 = Transform(x, y, GEOGRAPHIC[toDatum], GEOGRAPHIC[fromDatum],
+                             ChooseTransformation(fromDatum, toDatum).Inverse())
+      np.testing.assert_allclose(lon2, lon, atol = 1e-7) # About a centimeter
+      np.testing.assert_allclose(lat2, lat, atol = 1e-7)
+
+def test_transformations_are_filed_by_direction():
+   assert [t.name for t in ListTransformations('NAD83', 'WGS84')] == [
+      'NAD_1983_To_WGS_1984_1', 'WGS_1984_(ITRF00)_To_NAD_1983 (reversed)']
+   for t in ListTransformations('WGS84', 'NAD83') + ListTransformations('NAD83', 'WGS84'):
+      assert t.fromDatum in ('WGS84', 'NAD83') and t.toDatum != t.fromDatum
+
+def test_nad27_to_nad83_chains_through_wgs84():
+   chain = ChooseTransformation('NAD27', 'NAD83')
+   assert isinstance(chain, TransformationChain)
+   assert (chain.fromDatum, chain.toDatum) == ('NAD27', 'NAD83')
+   lon, lat = np.array([-77.0]), np.array([38.0])
+   viaWGS = ShiftDatum(*ShiftDatum(lon, lat, chain.steps[0]), transformation = chain.steps[1])
+   direct = Transform(lon, lat, GEOGRAPHIC['NAD27'], GEOGRAPHIC['NAD83'])
+   np.testing.assert_allclose(direct, viaWGS, atol = 1e-9)
+   # The NAD27 to NAD83 shift in Virginia is tens of meters
+   assert 10 < abs(direct[0][0] - lon[0]) * 88000 < 60
+   assert ChooseTransformation('NAD27', 'NAD83', chain.name) is not None
+
+def test_unknown_transformation_name_raises():
+   with pytest.raises(ValueError):
+      ChooseTransformation('NAD27', 'NAD83', 'No_Such_Transformation')
+
+def test_batch_matches_single_calls():
+   layers = [(np.array([-77.0, -76.0]), np.array([37.0, 38.0])), (np.array([[-78.0]]), np.array([[39.0]]))]
+   batch = TransformBatch(layers, GEOGRAPHIC['WGS84'], UTM(18))
+   for (x, y), (xb, yb) in zip(layers, batch):
+      xs, ys = Transform(x, y, GEOGRAPHIC['WGS84'], UTM(18))
+      np.testing.assert_array_equal(xb, xs)
+      np.testing.assert_array_equal(yb, ys)
@@ -0,0 +1,85 @@
+# Tests for libScratch:  sweeping stale workspaces, the quota, and the choice of location.
+import os, json, socket, subprocess, sys
+import pytest
+
+import libScratch
+from libScratch import ScratchWorkspace, ScratchQuotaError, SweepStale, ChooseLocation, PREFIX
+
+@pytest.fixture(autouse = True)
+def _NoArcpy(monkeypatch):
+   monkeypatch.setattr(libScratch, '_HaveArcpy', lambda: False)
+
+def _DeadPID():
+   '''The process ID of a process that has finished.'''
+   proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+   proc.wait()
+   return proc.pid
+
+def _Folder(root, name, owner = None, nBytes = 100):
+   path = os.path.join(root, name)
+   os.makedirs(path)
+   with open(os.path.join(path, 'data.bin'), 'wb') as f:
+      f.write(b'\0' * nBytes)
+   if owner is not None:
+      with open(os.path.join(path, 'owner.json'), 'w') as f:
+         json.dump(owner, f)
+   return path
+
+def test_sweep_removes_only_stale_folders_of_this_tool(tmp_path):
+   root = str(tmp_path)
+   host = socket.gethostname()
+   stale = _Folder(root, PREFIX + 'stale', {'host': host, 'pid': _DeadPID()}, 1000)
+   otherHost = _Folder(root, PREFIX + 'other', {'host': host + '-elsewhere', 'pid': _DeadPID()})
+   noOwner = _Folder(root, PREFIX + 'unknown') # Not ours, or still being created
+   notScratch = _Folder(root, 'results', {'host': host, 'pid': _DeadPID()})
+   with ScratchWorkspace(root, tag = 'active') as active:
+      with open(active.Name('clipDEM'), 'wb') as f:
+         f.write(b'\0' * 10)
+      freed = SweepStale(root)
+      assert not os.path.exists(stale)
+      assert freed >= 1000
+      for path in (otherHost, noOwner, notScratch, active.folder):
+         assert os.path.exists(path)
+      assert SweepStale(root) == 0
+   assert SweepStale(str(tmp_path / 'missing')) == 0
+
+def test_quota_is_enforced(tmp_path):
+   with ScratchWorkspace(str(tmp_path), quota = 5000) as scratch:
+      with open(scratch.Name('small'), 'wb') as f:
+         f.write(b'\0' * 1000)
+      assert scratch.Check() >= 1000
+      with open(scratch.Name('large'), 'wb') as f:
+         f.write(b'\0' * 6000)
+      with pytest.raises(ScratchQuotaError):
+         scratch.Check()
+      assert scratch.peakBytes >= 7000
+
+def test_workspace_is_removed_on_error_and_units_clean_up(tmp_path):
+   with pytest.raises(ValueError):
+      with ScratchWorkspace(str(tmp_path), tag = 'job') as scratch:
+         with scratch.Unit('U1') as unit:
+            name = unit.Name('clipDEM')
+            assert 'job_U1' in os.path.basename(name)
+            with open(name, 'wb') as f:
+               f.write(b'\0')
+         assert not os.path.exists(name) # Deleted with its unit
+         folder = scratch.folder
+         raise ValueError('Step failed')
+   assert not os.path.exists(folder)
+   assert os.listdir(str(tmp_path)) == []
+
+def test_falls_back_to_disk_without_tmpfs(tmp_path, monkeypatch):
+   root = str(tmp_path / 'disk')
+   monkeypatch.setattr(libScratch, 'TMPFS_PATHS', (str(tmp_path / 'no_shm'),))
+   assert ChooseLocation(root, 1000) == root
+   with ScratchWorkspace(root, expectedBytes = 1000) as scratch:
+      assert os.path.dirname(scratch.folder) == root
+   # With a RAM-backed folder that has room, it is used; when the data will not fit, disk is used
+   shm = tmp_path / 'shm'
+   shm.mkdir()
+   monkeypatch.setattr(libScratch, 'TMPFS_PATHS', (str(shm),))
+   assert ChooseLocation(root, 1000) == str(shm)
+   assert ChooseLocation(root, 2**62) == root
+   assert ChooseLocation(root, None) == root
+   with ScratchWorkspace(root, expectedBytes = 1000) as scratch:
+      assert os.path.dirname(scratch.folder) == str(shm)
@@ -0,0 +1,66 @@
+# Tests for libUnitManifest:  which units a resumed run skips.
+import numpy as np
+
+from libUnitManifest import UnitManifest, Fingerprint
+from libBeersParallel import UnitInputs, BuildUnitJobs, RunUnits
+from libRasterWindows import RasterGrid, NpyRaster, NpyMosaicWriter
+
+def test_fingerprint_depends_on_contents():
+   a = np.arange(12, dtype = np.float32).reshape(3, 4)
+   assert Fingerprint(a, 5, 'v1') == Fingerprint(a.copy(), 5, 'v1')
+   assert Fingerprint(a, 5, 'v1') != Fingerprint(a, 6, 'v1')
+   assert Fingerprint(a, 5, 'v1') != Fingerprint(a.reshape(4, 3), 5, 'v1') # Shape counts
+   assert Fingerprint(a, 5, 'v1') != Fingerprint(a.astype(np.float64), 5, 'v1') # So does dtype
+   b = a.copy()
+   b[1, 2] += 1
+   assert Fingerprint(a, 5, 'v1') != Fingerprint(b, 5, 'v1')
+
+def test_changed_fingerprint_invalidates_unit(tmp_path):
+   path = str(tmp_path / 'manifest.jsonl')
+   manifest = UnitManifest(path)
+   manifest.Record('U1', 'aaa', limitReached = True)
+   manifest.Record('U2', 'bbb')
+   manifest.Record('U1', 'ccc') # The last record wins
+   reloaded = UnitManifest(path)
+   assert reloaded.IsCurrent('U1', 'ccc') and not reloaded.IsCurrent('U1', 'aaa')
+   assert reloaded.IsCurrent('U2', 'bbb') and not reloaded.IsCurrent('U2', 'changed')
+   assert not reloaded.IsCurrent('U3', 'bbb')
+   assert reloaded.Get('U1').get('limitReached') is None
+
+def test_truncated_last_line_is_ignored(tmp_path):
+   path = str(tmp_path / 'manifest.jsonl')
+   manifest = UnitManifest(path)
+   manifest.Record('U1', 'aaa')
+   manifest.Record('U2', 'bbb')
+   with open(path, 'a') as f:
+      f.write('{"fingerprint": "ccc", "unit": "U') # Cut short by a crash
+   manifest = UnitManifest(path)
+   assert sorted(manifest.entries) == ['U1', 'U2']
+   manifest.Record('U3', 'ddd') # Must not be lost on the partial line
+   assert sorted(UnitManifest(path).entries) == ['U1', 'U2', 'U3']
+
+def _Run(tmp_path, dem, manifest):
+   grid = RasterGrid(0.0, 200.0, 10.0, 20, 60)
+   np.save(str(tmp_path / 'dem.npy'), dem)
+   units = [('U%d' % i, (200.0 * i, 0.0, 200.0 * (i + 1), 200.0)) for i in range(3)]
+   jobs = BuildUnitJobs(units, grid, 2)
+   inputs = UnitInputs(NpyRaster(str(tmp_path / 'dem.npy'), grid), grid, 2)
+   writer = NpyMosaicWriter(str(tmp_path / 'out.npy'), grid, append = True)
+   RunUnits(jobs, inputs, writer, manifest = manifest)
+   return np.load(str(tmp_path / 'out.npy'))
+
+def test_resumed_run_skips_only_unchanged_units(tmp_path):
+   rows, cols = np.mgrid[0:20, 0:60]
+   dem = (np.sin(rows / 3.0) + np.cos(cols / 4.0)).astype(np.float32)
+   path = str(tmp_path / 'manifest.jsonl')
+   first = _Run(tmp_path, dem, UnitManifest(path))
+   before = UnitManifest(path).entries
+
+   dem[5, 50] += 3.0 # Inside unit U2, beyond the halo of U1
+   manifest = UnitManifest(path)
+   second = _Run(tmp_path, dem, manifest)
+   after = UnitManifest(path).entries
+   assert after['U0'] == before['U0'] and after['U1'] == before['U1'] # Skipped, not recorded again
+   assert after['U2']['fingerprint'] != before['U2']['fingerprint']
+   np.testing.assert_array_equal(second[:, :40], first[:, :40])
+   assert not np.array_equal(second[:, 40:], first[:, 40:])
@@ -0,0 +1,85 @@
+# Tests for libUnitPlan:  the STR-tree, and unit planning with rectangles standing in for arcpy geometry.
+import numpy as np
+import pytest
+
+import libUnitPlan
+from libUnitPlan import STRTree, GroupByUnit, BuildUnitPlan
+from libBeersParallel import PlanUnitJobs
+from libRasterWindows import RasterGrid, Window
+
+class _Extent(object):
+   def __init__(self, xMin, yMin, xMax, yMax):
+      self.XMin, self.YMin, self.XMax, self.YMax = xMin, yMin, xMax, yMax
+
+class _Box(object):
+   '''An axis-aligned rectangle with the few arcpy geometry methods the plan uses.  The union
+   of two boxes is taken as their bounding box, which is exact for the cases tested.'''
+   def __init__(self, xMin, yMin, xMax, yMax):
+      self.extent = _Extent(xMin, yMin, xMax, yMax)
+
+   def _Tuple(self):
+      e = self.extent
+      return (e.XMin, e.YMin, e.XMax, e.YMax)
+
+   @property
+   def area(self):
+      e = self.extent
+      return max(0, e.XMax - e.XMin) * max(0, e.YMax - e.YMin)
+
+   def buffer(self, d):
+      e = self.extent
+      return _Box(e.XMin - d, e.YMin - d, e.XMax + d, e.YMax + d)
+
+   def intersect(self, other, dimension):
+      a, b = self._Tuple(), other._Tuple()
+      return _Box(max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+
+   def union(self, other):
+      a, b = self._Tuple(), other._Tuple()
+      return _Box(min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def test_str_tree_matches_brute_force():
+   rng = np.random.RandomState(1)
+   xy = rng.rand(500, 2) * 1000
+   boxes = np.column_stack([xy, xy + rng.rand(500, 2) * 50])
+   tree = STRTree(boxes, nodeCapacity = 8)
+   for q in rng.rand(50, 2) * 1000:
+      query = (q[0], q[1], q[0] + 80, q[1] + 40)
+      brute = np.nonzero((boxes[:, 0] <= query[2]) & (boxes[:, 2] >= query[0]) &
+                         (boxes[:, 1] <= query[3]) & (boxes[:, 3] >= query[1]))[0]
+      np.testing.assert_array_equal(tree.Query(query), brute)
+   assert len(STRTree([]).Query((0, 0, 1, 1))) == 0
+
+def test_group_by_unit_unions_shared_ids():
+   rows = [('A', _Box(0, 0, 10, 10)), ('B', _Box(50, 50, 60, 60)), ('A', _Box(10, 0, 20, 10))]
+   grouped = GroupByUnit(rows)
+   assert [unitID for unitID, shape in grouped] == ['A', 'B']
+   assert grouped[0][1]._Tuple() == (0, 0, 20, 10)
+
+@pytest.fixture
+def plan(monkeypatch):
+   units = [('A', _Box(100, 100, 200, 200)), ('B', _Box(900, 900, 950, 950)),
+            ('A', _Box(200, 100, 300, 200)), ('C', _Box(380, 100, 480, 200))]
+   boundary = [(_Box(0, 0, 400, 400),)]
+   def ReadPolygons(fc, fields = None):
+      return units if fc == 'units' else boundary
+   monkeypatch.setattr(libUnitPlan, 'ReadPolygons', ReadPolygons)
+   grid = RasterGrid(0, 1000, 10, 100, 100)
+   return BuildUnitPlan('units', 'UnitID', 'boundary', 30, grid)
+
+def test_plan_buffers_clips_and_snaps(plan):
+   assert [unit.unitID for unit in plan] == ['A', 'B', 'C']
+   a, b, c = plan
+   assert a.extent == (70, 70, 330, 230) # Both rows of A, buffered
+   assert a.interior == Window(80, 10, 10, 20)
+   assert a.window == Window(77, 7, 16, 26)
+   assert not b.overlaps and b.window is None
+   assert c.extent == (350, 70, 400, 230) # Clipped to the boundary
+
+def test_plan_drives_array_jobs(plan):
+   a, b, c = PlanUnitJobs(plan)
+   assert (a.interior, a.window) == (Window(80, 10, 10, 20), Window(77, 7, 16, 26))
+   assert b.window is None and b.interior is None
+   # C reaches past the boundary, so its interior is cut to the clipped window
+   assert c.window == Window(77, 35, 16, 5)
+   assert c.interior == Window(80, 38, 10, 2)